@@ -1,20 +1,144 @@
-from fastapi import APIRouter, HTTPException, Depends, Header
-from app.schemas.models import HackRXRequest, HackRXResponse
+import json
+import threading
+import time
+from groq import Groq
+from fastapi import APIRouter, HTTPException, Depends, Header, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.routing import APIRoute
+from app.schemas.models import HackRXRequest, HackRXResponse, DocumentIngestRequest, DocumentStatus
 from app.services.rag_service import RAGService
+from app.services.llm_service import LLMService
+from app.services.llm_scheduler import LLMScheduler
+from app.services.document_processor import DocumentProcessor
+from app.services.downloader import DocumentDownloader
+from app.services.pdf_extractor import PDFPageExtractor
+from app.services.answer_cache import AnswerCache
+from app.services.context_builder import ContextBuilder
+from app.services.request_executor import RequestExecutor, OverloadedError, DeadlineExceededError
+from app.services.ingestion import UnknownDocumentError
 from app.core.config import get_settings
+from app.core.metrics import (REGISTRY, REQUEST_SECONDS, REQUESTS_IN_FLIGHT, begin_request,
+                              snapshot_metric)
 
-router = APIRouter()
+class TimedRoute(APIRoute):
+    """Route that records latency and in-flight requests and adds a Server-Timing header.
+
+    Error responses carry the header too. A streamed response stays in
+    flight, and is timed, until its body has been sent.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        path = self.path
+
+        async def timed_handler(request: Request):
+            timings = begin_request()
+            REQUESTS_IN_FLIGHT.inc(path)
+            started = time.perf_counter()
+
+            def finish() -> float:
+                elapsed = time.perf_counter() - started
+                REQUESTS_IN_FLIGHT.dec(path)
+                REQUEST_SECONDS.observe(elapsed, path)
+                return elapsed
+
+            try:
+                response = await handler(request)
+            except HTTPException as e:
+                e.headers = {**(e.headers or {}), "Server-Timing": timings.server_timing(finish())}
+                raise
+            except BaseException:
+                finish()
+                raise
+            if isinstance(response, StreamingResponse):
+                # Headers go out before the body, so they can only report the time to first byte
+                response.headers["Server-Timing"] = timings.server_timing(time.perf_counter() - started)
+                response.body_iterator = _finish_after(response.body_iterator, finish)
+            else:
+                response.headers["Server-Timing"] = timings.server_timing(finish())
+            return response
+
+        return timed_handler
+
+async def _finish_after(body, finish):
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        finish()
+
+router = APIRouter(route_class=TimedRoute)
 
 # Global RAG service instance
 rag_service = None
+# Bounded pool that runs the blocking pipeline off the event loop
+request_executor = None
 
 def get_rag_service():
     global rag_service
     if rag_service is None:
         settings = get_settings()
-        rag_service = RAGService(settings.groq_api_key)
+        llm_client = Groq(api_key=settings.groq_api_key, base_url=settings.llm_base_url, max_retries=0)
+        rag_service = RAGService(
+            settings.groq_api_key,
+            index_cache_max_bytes=settings.index_cache_max_bytes,
+            max_concurrency=settings.llm_max_concurrency,
+            document_processor=DocumentProcessor(
+                downloader=DocumentDownloader(
+                    max_bytes=settings.download_max_bytes,
+                    timeout=settings.download_timeout,
+                    max_seconds=settings.download_max_seconds,
+                    per_host_limit=settings.download_per_host_limit
+                ),
+                page_extractor=PDFPageExtractor(
+                    max_workers=settings.pdf_extract_workers,
+                    page_timeout=settings.pdf_page_timeout
+                )
+            ),
+            snapshot_dir=settings.index_snapshot_dir,
+            search_backend=settings.search_backend,
+            answer_cache=AnswerCache(
+                ttl_seconds=settings.answer_cache_ttl_seconds,
+                max_entries=settings.answer_cache_max_entries,
+                db_path=settings.answer_cache_db_path,
+                similarity_threshold=settings.answer_cache_similarity
+            ) if settings.answer_cache_enabled else None,
+            llm_service=LLMService(
+                settings.groq_api_key,
+                context_builder=ContextBuilder(max_tokens=settings.llm_context_max_tokens),
+                batch_questions=settings.llm_batch_questions,
+                max_batch_size=settings.llm_max_batch_size,
+                client=llm_client,
+                scheduler=LLMScheduler(
+                    llm_client,
+                    requests_per_minute=settings.llm_requests_per_minute,
+                    tokens_per_minute=settings.llm_tokens_per_minute,
+                    max_retries=settings.llm_max_retries,
+                    hedge_after=settings.llm_hedge_after_seconds,
+                    max_hedge_workers=settings.llm_max_concurrency
+                )
+            ),
+            ingest_workers=settings.ingest_workers,
+            ingest_queue_size=settings.ingest_queue_size,
+            answer_deadline=settings.answer_deadline_seconds,
+            local_answer_threshold=settings.local_answer_threshold
+        )
     return rag_service
 
+def get_request_executor():
+    global request_executor
+    if request_executor is None:
+        settings = get_settings()
+        request_executor = RequestExecutor(
+            max_workers=settings.request_workers,
+            max_queue=settings.request_queue_size
+        )
+    return request_executor
+
+def _overloaded(e: OverloadedError) -> HTTPException:
+    return HTTPException(status_code=e.status_code, detail=str(e),
+                         headers={"Retry-After": str(e.retry_after)})
+
 def verify_api_key(authorization: str = Header(...)):
     """Verify Bearer token"""
     if not authorization.startswith("Bearer "):
@@ -32,18 +156,197 @@ def verify_api_key(authorization: str = Header(...)):
 async def process_hackrx_request(
     request: HackRXRequest,
     rag_service: RAGService = Depends(get_rag_service),
+    executor: RequestExecutor = Depends(get_request_executor),
     api_key: str = Depends(verify_api_key)
 ):
     """
     Main HackRX API endpoint for insurance document processing
     """
+    cancel = threading.Event()
     try:
-        response = rag_service.process_hackrx_request(request)
+        with executor.admit() as admission:
+            response = await executor.run(
+                rag_service.process_hackrx_request, request, cancel,
+                timeout=get_settings().request_deadline_seconds, cancel=cancel, admission=admission
+            )
         return response
     
+    except OverloadedError as e:
+        raise _overloaded(e)
+    except UnknownDocumentError:
+        raise HTTPException(status_code=404, detail=f"Unknown document_id: {request.document_id}")
+    except DeadlineExceededError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Processing error: {str(e)}")
 
+def _encode_event(event: dict, sse: bool) -> str:
+    data = json.dumps(event)
+    return f"event: {event['event']}\ndata: {data}\n\n" if sse else f"{data}\n"
+
+@router.post("/hackrx/run/stream")
+async def stream_hackrx_request(
+    request: HackRXRequest,
+    http_request: Request,
+    rag_service: RAGService = Depends(get_rag_service),
+    executor: RequestExecutor = Depends(get_request_executor),
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Streaming variant of /hackrx/run: progress events, then each answer with its
+    question index as soon as it is ready, then a summary. Sent as Server-Sent
+    Events when the client accepts text/event-stream, otherwise as NDJSON.
+    """
+    sse = "text/event-stream" in http_request.headers.get("accept", "")
+    if request.document_id is not None:
+        try:
+            rag_service.ingestion.get(request.document_id)
+        except UnknownDocumentError:
+            raise HTTPException(status_code=404, detail=f"Unknown document_id: {request.document_id}")
+    try:
+        admission = executor.acquire()
+    except OverloadedError as e:
+        raise _overloaded(e)
+    deadline = time.monotonic() + get_settings().request_deadline_seconds
+    cancel = threading.Event()
+    events = rag_service.iter_hackrx_events(request, cancel)
+    # Whichever of the stream and a still-running next() finishes last closes `events`;
+    # a generator cannot be closed while another thread is executing it
+    events_lock = threading.Lock()
+    pulling = [False]
+
+    def next_event():
+        with events_lock:
+            if cancel.is_set():
+                return None
+            pulling[0] = True
+        try:
+            return next(events, None)
+        finally:
+            with events_lock:
+                pulling[0] = False
+                if cancel.is_set():
+                    events.close()
+
+    async def body():
+        # The next event is only produced once the previous one has been sent,
+        # so a slow reader holds back the stream rather than buffering answers
+        try:
+            while not await http_request.is_disconnected():
+                event = await executor.run(next_event, timeout=max(0.0, deadline - time.monotonic()),
+                                           cancel=cancel, admission=admission)
+                if event is None:
+                    break
+                yield _encode_event(event, sse)
+        except Exception as e:
+            yield _encode_event({"event": "error", "detail": f"Processing error: {str(e)}"}, sse)
+        finally:
+            # Client gone or stream finished: drop LLM work that hasn't started
+            with events_lock:
+                cancel.set()
+                if not pulling[0]:
+                    events.close()
+            executor.release(admission)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/documents", response_model=DocumentStatus, status_code=202)
+async def submit_document(
+    request: DocumentIngestRequest,
+    rag_service: RAGService = Depends(get_rag_service),
+    api_key: str = Depends(verify_api_key)
+):
+    """Queue a document for ingestion; pass the returned document_id to /hackrx/run"""
+    try:
+        return rag_service.ingestion.submit(request.url).to_dict()
+    except OverloadedError as e:
+        raise _overloaded(e)
+
+@router.get("/documents/{document_id}", response_model=DocumentStatus)
+async def document_status(
+    document_id: str,
+    rag_service: RAGService = Depends(get_rag_service),
+    api_key: str = Depends(verify_api_key)
+):
+    """Ingestion progress and per-stage timings"""
+    try:
+        return rag_service.ingestion.get(document_id).to_dict()
+    except UnknownDocumentError:
+        raise HTTPException(status_code=404, detail=f"Unknown document_id: {document_id}")
+
+@router.get("/stats")
+async def service_stats(
+    rag_service: RAGService = Depends(get_rag_service),
+    executor: RequestExecutor = Depends(get_request_executor),
+    api_key: str = Depends(verify_api_key)
+):
+    """Cache and service counters"""
+    return {
+        "executor": executor.stats(),
+        "index_cache": rag_service.index_cache.stats(),
+        "ingestion": rag_service.ingest_flight.stats(),
+        "index_builds": rag_service.build_flight.stats(),
+        "documents": rag_service.ingestion.stats(),
+        "downloader": rag_service.document_processor.downloader.stats(),
+        "answer_cache": rag_service.answer_cache.stats() if rag_service.answer_cache else None,
+        "llm": rag_service.llm_service.stats(),
+        "llm_scheduler": rag_service.llm_service.scheduler.stats(),
+        "answer_tiers": rag_service.answer_tier_stats(),
+        "recent_requests": list(rag_service.recent_usage)
+    }
+
+def _service_metrics(rag_service: RAGService, executor: RequestExecutor):
+    """Counters and gauges read from the services' own stats at scrape time"""
+    index_cache = rag_service.index_cache.stats()
+    llm = rag_service.llm_service.stats()
+    scheduler = rag_service.llm_service.scheduler.stats()
+    ingestion = rag_service.ingest_flight.stats()
+    executor_stats = executor.stats()
+    tiers = rag_service.answer_tier_stats()
+    metrics = [
+        snapshot_metric("hackrx_index_cache_lookups_total", "counter", "Index cache lookups by result",
+                        {("hit",): index_cache["hits"], ("miss",): index_cache["misses"]}, ("result",)),
+        snapshot_metric("hackrx_index_cache_bytes", "gauge", "Estimated bytes held by cached indexes",
+                        {(): index_cache["bytes"]}),
+        snapshot_metric("hackrx_llm_tokens_total", "counter", "LLM tokens by kind",
+                        {("prompt",): llm["prompt_tokens"], ("completion",): llm["completion_tokens"],
+                         ("context",): llm["context_tokens"]}, ("kind",)),
+        snapshot_metric("hackrx_llm_requests_total", "counter", "LLM completions requested", {(): llm["requests"]}),
+        snapshot_metric("hackrx_llm_retries_total", "counter", "LLM call retries", {(): scheduler["retries"]}),
+        snapshot_metric("hackrx_llm_queue_wait_seconds_total", "counter", "Time LLM calls waited for rate limits",
+                        {(): scheduler["queue_wait_seconds"]}),
+        snapshot_metric("hackrx_ingestions_total", "counter", "Document ingestions by outcome",
+                        {("executed",): ingestion["executions"], ("coalesced",): ingestion["coalesced"],
+                         ("failed",): ingestion["failures"]}, ("outcome",)),
+        snapshot_metric("hackrx_answers_total", "counter", "Answered questions by the tier that answered them",
+                        {(tier,): tiers[tier] for tier in ("cached", "local", "llm", "degraded")}, ("tier",)),
+        snapshot_metric("hackrx_executor_active", "gauge", "Requests admitted and not yet finished",
+                        {(): executor_stats["active"]}),
+        snapshot_metric("hackrx_executor_rejected_total", "counter", "Requests rejected by admission control",
+                        {(): executor_stats["rejected"]}),
+    ]
+    if rag_service.answer_cache is not None:
+        answer_cache = rag_service.answer_cache.stats()
+        metrics.append(snapshot_metric(
+            "hackrx_answer_cache_lookups_total", "counter", "Answer cache lookups by result",
+            {("hit",): answer_cache["hits"], ("miss",): answer_cache["misses"]}, ("result",)
+        ))
+    return metrics
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics(
+    rag_service: RAGService = Depends(get_rag_service),
+    executor: RequestExecutor = Depends(get_request_executor),
+    api_key: str = Depends(verify_api_key)
+):
+    """Prometheus text exposition of stage latencies and service counters"""
+    return PlainTextResponse(REGISTRY.render(_service_metrics(rag_service, executor)),
+                             media_type="text/plain; version=0.0.4")
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint"""
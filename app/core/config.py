@@ -1,9 +1,53 @@
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Optional
 
 class Settings(BaseSettings):
     groq_api_key: str
     api_key: str = "hackrx_secret_key_123"
+    index_cache_max_bytes: int = 256 * 1024 * 1024
+    llm_max_concurrency: int = 8
+    download_max_bytes: int = 50 * 1024 * 1024
+    download_timeout: float = 30
+    download_max_seconds: float = 120
+    download_per_host_limit: int = 4
+    pdf_extract_workers: Optional[int] = None
+    pdf_page_timeout: float = 10.0
+    index_snapshot_dir: Optional[str] = None
+    search_backend: str = "tfidf"
+    answer_cache_enabled: bool = True
+    answer_cache_ttl_seconds: float = 24 * 3600
+    answer_cache_max_entries: int = 10000
+    answer_cache_db_path: Optional[str] = None
+    answer_cache_similarity: Optional[float] = 0.9
+    llm_context_max_tokens: int = 1500
+    llm_batch_questions: bool = False
+    llm_max_batch_size: int = 5
+    llm_base_url: Optional[str] = None
+    llm_requests_per_minute: Optional[float] = None
+    llm_tokens_per_minute: Optional[float] = None
+    llm_max_retries: int = 3
+    llm_hedge_after_seconds: Optional[float] = None
+    request_workers: int = 8
+    request_queue_size: int = 16
+    request_deadline_seconds: float = 60.0
+    answer_deadline_seconds: Optional[float] = 25.0
+    local_answer_threshold: Optional[float] = 0.8
+    ingest_workers: int = 2
+    ingest_queue_size: int = 32
+    
+    @field_validator(
+        "pdf_extract_workers", "answer_cache_similarity", "llm_requests_per_minute",
+        "llm_tokens_per_minute", "llm_hedge_after_seconds", "answer_deadline_seconds",
+        "local_answer_threshold", mode="before"
+    )
+    @classmethod
+    def empty_as_none(cls, value):
+        # Lets these optional limits be switched off from the environment, e.g. ANSWER_DEADLINE_SECONDS=none
+        if isinstance(value, str) and value.strip().lower() in ("", "none", "null"):
+            return None
+        return value
     
     class Config:
         env_file = ".env"
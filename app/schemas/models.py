@@ -1,12 +1,26 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import List, Optional, Dict, Any
 
 class HackRXRequest(BaseModel):
-    documents: str = Field(..., description="URL to the policy PDF document")
+    documents: Optional[str] = Field(None, description="URL to the policy PDF document")
+    document_id: Optional[str] = Field(None, description="Id of a document submitted to /documents")
     questions: List[str] = Field(..., description="List of questions to answer")
+    latency_budget_seconds: Optional[float] = Field(
+        None, gt=0, description="Answer within this many seconds, overriding the server default"
+    )
+
+    @model_validator(mode="after")
+    def check_document(self):
+        if self.documents is None and self.document_id is None:
+            raise ValueError("Either documents or document_id is required")
+        return self
 
 class HackRXResponse(BaseModel):
     answers: List[str] = Field(..., description="Corresponding answers to the questions")
+    degraded: List[int] = Field(
+        default_factory=list,
+        description="Indexes of answers extracted from the document because the LLM missed the latency budget"
+    )
 
 class ClauseMatch(BaseModel):
     clause_id: str
@@ -15,3 +29,16 @@ class ClauseMatch(BaseModel):
     source_document: str
     clause_type: str
     metadata: Dict[str, Any]
+
+class DocumentIngestRequest(BaseModel):
+    url: str = Field(..., description="URL to the policy PDF document")
+
+class DocumentStatus(BaseModel):
+    document_id: str
+    url: str
+    status: str = Field(..., description="queued, running, ready or failed")
+    stage: str
+    fingerprint: Optional[str] = None
+    error: Optional[str] = None
+    submitted_at: float
+    timings: Dict[str, float] = Field(default_factory=dict, description="Seconds spent in each finished stage")
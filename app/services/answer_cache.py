@@ -0,0 +1,213 @@
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+VECTOR_DIM = 1024
+
+QUESTION_TOKEN = re.compile(r"\w+")
+# Only words that never change what is asked. Unlike the search stop words this
+# keeps negations, prepositions and single characters, which may name a plan
+# ("Plan A") or a number.
+QUESTION_STOP_WORDS = frozenset("""
+an the is are was were be been being do does did what which who whom whose how when where why
+of for to in on at by and or this that these those it its my our your their we you me us
+there any can could would should will shall may might must please tell about
+""".split())
+
+def normalize_question(question: str) -> str:
+    """Lowercase, spell out "n't", drop punctuation and collapse whitespace"""
+    question = re.sub(r"n[\'\u2019]t\b", " not", question.lower())
+    return " ".join(re.sub(r"[^\w\s-]", " ", question).split())
+
+def question_tokens(question: str) -> List[str]:
+    return [token for token in QUESTION_TOKEN.findall(question.lower()) if token not in QUESTION_STOP_WORDS]
+
+def _stem(token: str) -> str:
+    # Crude suffix stripping, just enough for "premiums"/"paying"/"payment" to meet
+    for suffix in ("ments", "ment", "ings", "ing", "ies", "es", "s"):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[:-len(suffix)]
+    return token
+
+def content_terms(question: str) -> FrozenSet[str]:
+    """Stemmed content words of a question; a paraphrase must use exactly these.
+
+    Any other word may name a different entity ("India" vs "Nepal"), flip the
+    meaning ("not") or pin it down ("before", "4"), so a paraphrase may only
+    reorder the words or change stop words.
+    """
+    return frozenset(_stem(token) for token in question_tokens(question))
+
+def question_vector(question: str) -> np.ndarray:
+    """L2-normalized hashed bag of stemmed content words"""
+    vector = np.zeros(VECTOR_DIM, dtype=np.float32)
+    for token in question_tokens(question):
+        vector[zlib.crc32(_stem(token).encode()) % VECTOR_DIM] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class _CacheGroup:
+    """Cached answers for one (document, model, prompt version)"""
+
+    def __init__(self):
+        self.questions: List[str] = []
+        self.guards: List[FrozenSet[str]] = []
+        self.vectors = np.zeros((0, VECTOR_DIM), dtype=np.float32)
+
+    def add(self, question: str, vector: np.ndarray):
+        if question not in self.questions:
+            self.questions.append(question)
+            self.guards.append(content_terms(question))
+            self.vectors = np.vstack([self.vectors, vector[None, :]])
+
+    def remove(self, question: str):
+        if question in self.questions:
+            i = self.questions.index(question)
+            del self.questions[i]
+            del self.guards[i]
+            self.vectors = np.delete(self.vectors, i, axis=0)
+
+    def nearest(self, vector: np.ndarray, threshold: float, guard: FrozenSet[str]) -> Optional[str]:
+        """Most similar question at or above `threshold` with exactly the same content terms"""
+        if not self.questions or not vector.any():
+            return None
+        similarities = self.vectors @ vector
+        for i in np.argsort(-similarities, kind="stable"):
+            if similarities[i] < threshold:
+                break
+            if self.guards[i] == guard:
+                return self.questions[i]
+        return None
+
+class AnswerCache:
+    """Answer cache keyed by (document fingerprint, normalized question, model, prompt version).
+
+    Entries expire after `ttl_seconds` and the in-memory tier is LRU-bounded by
+    `max_entries`. With `db_path` set, answers are also written to SQLite and
+    reloaded per document after a restart. Close paraphrases of a cached
+    question hit when their hashed word vectors reach `similarity_threshold`
+    and they use exactly the same content words, only reordered or with
+    different stop words.
+    """
+
+    def __init__(self, ttl_seconds: float = 24 * 3600, max_entries: int = 10000,
+                 db_path: Optional[str] = None, similarity_threshold: Optional[float] = 0.9):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[Tuple[str, str, str, str], Tuple[str, float]]" = OrderedDict()
+        self._groups: Dict[Tuple[str, str, str], _CacheGroup] = {}
+        self._loaded_groups = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.paraphrase_hits = 0
+        self.misses = 0
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS answers (
+                    document TEXT, question TEXT, model TEXT, prompt_version TEXT,
+                    answer TEXT, created REAL,
+                    PRIMARY KEY (document, question, model, prompt_version)
+                )
+            """)
+            self._db.commit()
+
+    def get(self, document: str, question: str, model: str, prompt_version: str) -> Optional[str]:
+        """Return a cached answer for the question or a close paraphrase of it"""
+        normalized = normalize_question(question)
+        group_key = (document, model, prompt_version)
+        with self._lock:
+            self._load_group(group_key)
+            answer = self._get_live((document, normalized, model, prompt_version))
+            if answer is not None:
+                self.hits += 1
+                return answer
+
+            group = self._groups.get(group_key)
+            if group is not None and self.similarity_threshold is not None:
+                match = group.nearest(question_vector(normalized), self.similarity_threshold,
+                                      content_terms(normalized))
+                if match is not None:
+                    answer = self._get_live((document, match, model, prompt_version))
+                    if answer is not None:
+                        self.hits += 1
+                        self.paraphrase_hits += 1
+                        return answer
+
+            self.misses += 1
+            return None
+
+    def put(self, document: str, question: str, model: str, prompt_version: str, answer: str):
+        normalized = normalize_question(question)
+        now = time.time()
+        with self._lock:
+            self._insert((document, normalized, model, prompt_version), answer, now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?)",
+                    (document, normalized, model, prompt_version, answer, now)
+                )
+                self._db.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl_seconds,))
+                self._db.commit()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "paraphrase_hits": self.paraphrase_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _get_live(self, key) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        answer, created = entry
+        if time.time() - created > self.ttl_seconds:
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return answer
+
+    def _insert(self, key, answer: str, created: float):
+        document, normalized, model, prompt_version = key
+        self._entries[key] = (answer, created)
+        self._entries.move_to_end(key)
+        self._groups.setdefault((document, model, prompt_version), _CacheGroup()).add(
+            normalized, question_vector(normalized)
+        )
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        document, normalized, model, prompt_version = key
+        self._entries.pop(key, None)
+        group = self._groups.get((document, model, prompt_version))
+        if group is not None:
+            group.remove(normalized)
+
+    def _load_group(self, group_key):
+        """Pull a document's persisted answers into memory the first time it is seen"""
+        if self._db is None or group_key in self._loaded_groups:
+            return
+        self._loaded_groups.add(group_key)
+        document, model, prompt_version = group_key
+        rows = self._db.execute(
+            "SELECT question, answer, created FROM answers "
+            "WHERE document = ? AND model = ? AND prompt_version = ? AND created >= ?",
+            (document, model, prompt_version, time.time() - self.ttl_seconds)
+        ).fetchall()
+        for normalized, answer, created in rows:
+            self._insert((document, normalized, model, prompt_version), answer, created)
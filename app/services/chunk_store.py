@@ -0,0 +1,182 @@
+import threading
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+import numpy as np
+
+CLAUSE_TYPES = ('general', 'exclusion', 'coverage', 'waiting_period', 'claims')
+CLAUSE_TYPE_CODES = {name: code for code, name in enumerate(CLAUSE_TYPES)}
+
+class ChunkStore:
+    """Columnar chunk storage over one concatenated text buffer.
+
+    Page texts are appended to a single buffer and each chunk is a
+    (page, start, end) span over it. Page number, chunk index, document,
+    source and clause type live in typed columns rather than a dict per
+    chunk; `chunk_metadata(i)` and `store[i]` rebuild the familiar
+    per-chunk dict only for the chunks a query actually returns.
+    """
+
+    def __init__(self):
+        self._parts: List[str] = []
+        self._buffer = ""
+        self._buffer_lock = threading.Lock()
+        self.page_offsets = array('q', [0])
+        self.page_total_pages = array('i')
+
+        self.chunk_pages = array('i')
+        self.chunk_starts = array('q')
+        self.chunk_ends = array('q')
+        self.page_numbers = array('i')
+        self.chunk_indices = array('i')
+        self.doc_codes = array('i')
+        self.source_codes = array('i')
+        self.clause_codes = array('b')
+        self.doc_names: List[str] = []
+        self.source_names: List[str] = []
+        # Free-form metadata of chunks added with one, kept verbatim by chunk index
+        self.extra: Dict[int, Dict[str, Any]] = {}
+        self._page_chunk_counts: Optional[np.ndarray] = None
+
+    def add_page(self, text: str, total_pages: int = -1) -> int:
+        self._parts.append(text)
+        self.page_offsets.append(self.page_offsets[-1] + len(text))
+        self.page_total_pages.append(total_pages)
+        return len(self.page_total_pages) - 1
+
+    def add_chunk(self, page: int, start: int, end: int, page_number: int = -1, chunk_index: int = -1,
+                  doc_id: str = "default", source: str = "unknown", clause_type: str = "general",
+                  extra: Optional[Dict[str, Any]] = None):
+        if extra is not None:
+            self.extra[len(self)] = extra
+        self.chunk_pages.append(page)
+        self.chunk_starts.append(start)
+        self.chunk_ends.append(end)
+        self.page_numbers.append(page_number)
+        self.chunk_indices.append(chunk_index)
+        self.doc_codes.append(_intern(self.doc_names, doc_id))
+        self.source_codes.append(_intern(self.source_names, source))
+        self.clause_codes.append(CLAUSE_TYPE_CODES[clause_type])
+        self._page_chunk_counts = None
+
+    def add_chunk_with_metadata(self, page: int, start: int, end: int, metadata: Dict[str, Any]):
+        """Add a chunk described by a free-form metadata dict, e.g. from process_documents"""
+        self.add_chunk(page, start, end, page_number=metadata.get('page_number', -1),
+                       chunk_index=metadata.get('chunk_index', -1),
+                       source=metadata.get('source', 'unknown'), extra=dict(metadata))
+
+    def add_chunk_from(self, other: "ChunkStore", idx: int, page: int):
+        """Copy chunk `idx` of another store onto `page` of this one"""
+        self.add_chunk(page, int(other.chunk_starts[idx]), int(other.chunk_ends[idx]),
+                       page_number=int(other.page_numbers[idx]), chunk_index=int(other.chunk_indices[idx]),
+                       doc_id=other.doc_id(idx), source=other.source(idx),
+                       clause_type=other.clause_type(idx), extra=other.extra.get(idx))
+
+    def assign_document(self, doc_id: str):
+        """Mark every chunk as belonging to `doc_id`"""
+        self.doc_names = [doc_id]
+        self.doc_codes = array('i', [0]) * len(self)
+
+    def set_clause_types(self, clause_types: Iterable[str]):
+        self.clause_codes = array('b', (CLAUSE_TYPE_CODES[name] for name in clause_types))
+
+    def page_count(self) -> int:
+        return len(self.page_offsets) - 1
+
+    def page_text(self, page: int) -> str:
+        return self._text_buffer()[self.page_offsets[page]:self.page_offsets[page + 1]]
+
+    def page_total(self, page: int) -> int:
+        return int(self.page_total_pages[page])
+
+    def text(self, idx: int) -> str:
+        base = self.page_offsets[self.chunk_pages[idx]]
+        return self._text_buffer()[base + self.chunk_starts[idx]:base + self.chunk_ends[idx]]
+
+    def iter_texts(self) -> Iterator[str]:
+        """Yield chunk texts one at a time, e.g. to stream into a vectorizer"""
+        for idx in range(len(self)):
+            yield self.text(idx)
+
+    def doc_id(self, idx: int) -> str:
+        return self.doc_names[self.doc_codes[idx]]
+
+    def source(self, idx: int) -> str:
+        return self.source_names[self.source_codes[idx]]
+
+    def clause_type(self, idx: int) -> str:
+        return CLAUSE_TYPES[self.clause_codes[idx]]
+
+    def document_ids(self) -> Set[str]:
+        return {self.doc_names[code] for code in np.unique(np.asarray(self.doc_codes))}
+
+    def doc_mask(self, doc_ids: Set[str]) -> np.ndarray:
+        """Boolean mask of the chunks belonging to any of `doc_ids`"""
+        codes = [code for code, name in enumerate(self.doc_names) if name in doc_ids]
+        return np.isin(np.asarray(self.doc_codes), codes)
+
+    def clause_type_mask(self, clause_types: Set[str]) -> np.ndarray:
+        """Boolean mask of the chunks labelled with any of `clause_types`"""
+        codes = [CLAUSE_TYPE_CODES[name] for name in clause_types if name in CLAUSE_TYPE_CODES]
+        return np.isin(np.asarray(self.clause_codes), codes)
+
+    def chunk_metadata(self, idx: int) -> Dict[str, Any]:
+        """Per-chunk metadata dict, in the shape DocumentProcessor has always produced"""
+        if idx in self.extra:
+            return dict(self.extra[idx])
+        page = int(self.chunk_pages[idx])
+        start, end = int(self.chunk_starts[idx]), int(self.chunk_ends[idx])
+        fields = (
+            ('page_number', int(self.page_numbers[idx])),
+            ('total_pages', self.page_total(page)),
+            ('content_length', int(self.page_offsets[page + 1] - self.page_offsets[page])),
+            ('chunk_index', int(self.chunk_indices[idx])),
+            ('total_chunks', int(self._chunk_counts()[page])),
+        )
+        meta: Dict[str, Any] = {'source': self.source(idx)}
+        meta.update((key, value) for key, value in fields if value >= 0)
+        meta.update(chunk_length=end - start, start=start, end=end)
+        return meta
+
+    def __len__(self) -> int:
+        return len(self.chunk_pages)
+
+    def __getitem__(self, idx: int) -> Dict[str, Any]:
+        if idx < 0:
+            idx += len(self)
+        return {'id': idx, 'text': self.text(idx), 'metadata': self.chunk_metadata(idx)}
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def memory_footprint(self) -> int:
+        total = int(self.page_offsets[-1])
+        columns = (self.page_offsets, self.page_total_pages, self.chunk_pages, self.chunk_starts,
+                   self.chunk_ends, self.page_numbers, self.chunk_indices, self.doc_codes,
+                   self.source_codes, self.clause_codes)
+        total += sum(column.itemsize * len(column) for column in columns)
+        total += sum(64 * (len(meta) + 1) for meta in self.extra.values())
+        return total
+
+    def _text_buffer(self) -> str:
+        if self._parts:
+            with self._buffer_lock:
+                if self._parts:
+                    self._buffer += "".join(self._parts)
+                    self._parts = []
+        return self._buffer
+
+    def _chunk_counts(self) -> np.ndarray:
+        if self._page_chunk_counts is None:
+            self._page_chunk_counts = np.bincount(np.asarray(self.chunk_pages, dtype=np.int64),
+                                                  minlength=self.page_count())
+        return self._page_chunk_counts
+
+def _intern(names: List[str], name: str) -> int:
+    # Stores hold a handful of distinct names, so a linear scan is cheap
+    try:
+        return names.index(name)
+    except ValueError:
+        names.append(name)
+        return len(names) - 1
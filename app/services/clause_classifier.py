@@ -0,0 +1,31 @@
+import re
+from typing import Dict, Iterable, List
+
+# Labels in priority order: a chunk takes the first label any of its keywords
+# points to, exactly as the old chain of substring checks did
+CLAUSE_KEYWORDS = (
+    ('exclusion', ('exclusion', 'exclude', 'not covered')),
+    ('coverage', ('coverage', 'benefit', 'covered')),
+    ('waiting_period', ('waiting period', 'wait')),
+    ('claims', ('claim', 'settlement')),
+)
+FALLBACK_TYPE = 'general'
+
+# Each keyword's last letter is only looked ahead at, so keywords sharing a
+# letter ("coverage" then "exclude") are both found in the one left-to-right pass
+_KEYWORD_RANKS: Dict[str, int] = {
+    keyword[:-1]: rank for rank, (_, keywords) in enumerate(CLAUSE_KEYWORDS) for keyword in keywords
+}
+CLAUSE_PATTERN = re.compile("|".join(
+    f"{re.escape(keyword[:-1])}(?={re.escape(keyword[-1])})"
+    for _, keywords in CLAUSE_KEYWORDS for keyword in keywords
+))
+_RANK_TYPES = [label for label, _ in CLAUSE_KEYWORDS] + [FALLBACK_TYPE]
+
+def classify_clause(text: str) -> str:
+    """Clause type of one text from a single pass of the combined keyword pattern"""
+    found = CLAUSE_PATTERN.findall(text.lower())
+    return _RANK_TYPES[min(map(_KEYWORD_RANKS.__getitem__, found))] if found else FALLBACK_TYPE
+
+def classify_clauses(texts: Iterable[str]) -> List[str]:
+    return [classify_clause(text) for text in texts]
@@ -0,0 +1,126 @@
+import re
+from typing import Dict, List, Tuple
+from app.schemas.models import ClauseMatch
+
+WORD_PATTERN = re.compile(r"\w+")
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English with Llama tokenizers)"""
+    return (len(text) + 3) // 4
+
+class ContextBlock:
+    """One or more retrieved chunks merged into a contiguous piece of a page"""
+
+    def __init__(self, clause: ClauseMatch):
+        meta = clause.metadata or {}
+        self.page_number = meta.get('page_number')
+        self.last_index = meta.get('chunk_index')
+        self.end = meta.get('end')
+        self.text = clause.clause_text
+        self.score = clause.similarity_score
+
+    def try_extend(self, clause: ClauseMatch) -> bool:
+        """Append a later chunk of the same page if it overlaps or directly follows this block"""
+        meta = clause.metadata or {}
+        index, start, end = meta.get('chunk_index'), meta.get('start'), meta.get('end')
+        if index is None or self.last_index is None:
+            return False
+
+        if start is not None and self.end is not None and start <= self.end:
+            # Offsets known: keep only the part past the current end
+            self.text += clause.clause_text[self.end - start:] if end > self.end else ""
+        elif index == self.last_index + 1:
+            self.text = _join_overlapping(self.text, clause.clause_text)
+        else:
+            return False
+
+        self.last_index = index
+        self.end = max(self.end, end) if self.end is not None and end is not None else end
+        self.score = max(self.score, clause.similarity_score)
+        return True
+
+def _join_overlapping(first: str, second: str, max_overlap: int = 400) -> str:
+    """Concatenate two texts, dropping the longest suffix of `first` that prefixes `second`"""
+    for size in range(min(len(first), len(second), max_overlap), 0, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return f"{first}\n{second}"
+
+def _shingles(text: str) -> set:
+    words = WORD_PATTERN.findall(text.lower())
+    return {" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))}
+
+def _containment(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+class ContextBuilder:
+    """Assemble prompt context from retrieved clauses within a token budget.
+
+    Chunks of the same page that overlap or are adjacent (by chunk_index, or by
+    start/end offsets when present) are merged, near-duplicate blocks are
+    dropped, and blocks are then added in score order until the budget is used.
+    """
+
+    def __init__(self, max_tokens: int = 1500, max_clauses: int = 5, duplicate_threshold: float = 0.8):
+        self.max_tokens = max_tokens
+        self.max_clauses = max_clauses
+        self.duplicate_threshold = duplicate_threshold
+
+    def build(self, clauses: List[ClauseMatch]) -> Tuple[List[ContextBlock], Dict[str, int]]:
+        """Return the selected blocks (best first) and token accounting"""
+        candidates = clauses[:self.max_clauses]
+
+        # Sweep each page's chunks in document order, merging runs into blocks
+        by_page: Dict[tuple, List[ClauseMatch]] = {}
+        for clause in candidates:
+            meta = clause.metadata or {}
+            by_page.setdefault((clause.source_document, meta.get('page_number')), []).append(clause)
+
+        blocks: List[ContextBlock] = []
+        for page_clauses in by_page.values():
+            page_clauses.sort(key=lambda c: ((c.metadata or {}).get('chunk_index') or 0,
+                                             (c.metadata or {}).get('start') or 0))
+            current = None
+            for clause in page_clauses:
+                if current is None or not current.try_extend(clause):
+                    current = ContextBlock(clause)
+                    blocks.append(current)
+        blocks.sort(key=lambda b: -b.score)
+
+        selected: List[ContextBlock] = []
+        selected_shingles = []
+        used = 0
+        for block in blocks:
+            shingles = _shingles(block.text)
+            if any(_containment(shingles, other) >= self.duplicate_threshold for other in selected_shingles):
+                continue
+            tokens = estimate_tokens(block.text)
+            if used + tokens > self.max_tokens:
+                if selected:
+                    continue
+                # Always keep something: trim the best block to the budget
+                block.text = block.text[:self.max_tokens * 4]
+                tokens = estimate_tokens(block.text)
+            selected.append(block)
+            selected_shingles.append(shingles)
+            used += tokens
+
+        return selected, {
+            "context_tokens": used,
+            "raw_context_tokens": sum(estimate_tokens(c.clause_text) for c in candidates),
+            "chunks_in": len(candidates),
+            "blocks_out": len(selected),
+        }
+
+    @staticmethod
+    def render(blocks: List[ContextBlock]) -> str:
+        parts = []
+        for i, block in enumerate(blocks):
+            page = f"Page {block.page_number}, " if block.page_number is not None else ""
+            parts.append(f"""
+Context {i+1} ({page}Similarity: {block.score:.3f}):
+{block.text}
+""")
+        return "\n".join(parts)
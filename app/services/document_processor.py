@@ -1,84 +1,127 @@
-import requests
-import tempfile
-import os
-from typing import List, Dict, Any, Tuple
-from pypdf import PdfReader
+import re
+from bisect import bisect_left, bisect_right
+from typing import List, Dict, Any, Tuple, Optional, Iterator
+from app.core.metrics import stage
+from app.services.chunk_store import ChunkStore
+from app.services.downloader import DocumentDownloader, DownloadResult, get_default_downloader
+from app.services.pdf_extractor import PDFPageExtractor
 
-class SimpleTextSplitter:
-    def __init__(self, chunk_size=1000, chunk_overlap=200):
-        self.chunk_size = chunk_size
-        self.chunk_overlap = chunk_overlap
-    
-    def split_text(self, text: str) -> List[str]:
-        """Simple text splitter without LangChain dependency"""
-        chunks = []
-        start = 0
-        
+# Lines that open a new section or clause: "SECTION 4", "4.2 Exclusions", "7) ...",
+# "(a) ...", and short all-caps headings
+CLAUSE_START_PATTERN = re.compile(
+    r"^[ \t]*(?:(?:section|clause|article|part|chapter|schedule)\b|"
+    r"\d+(?:\.\d+)*[.)][ \t]|\d+\.\d+(?:\.\d+)*[ \t]|\(?[a-z]{1,3}\)[ \t])",
+    re.MULTILINE | re.IGNORECASE
+)
+CAPS_HEADING_PATTERN = re.compile(r"^[ \t]*[A-Z][A-Z0-9 ,&/\-]{3,80}[ \t]*$", re.MULTILINE)
+SENTENCE_END_PATTERN = re.compile(r"[.;:!?](?=\s)|\n[ \t]*\n")
+
+class StructureAwareTextSplitter:
+    """Split text on headings, numbered clauses and sentences, yielding offsets"""
+
+    def __init__(self, target_size=1000, min_size=300, max_size=1500):
+        self.target_size = target_size
+        self.min_size = min_size
+        self.max_size = max_size
+
+    def iter_spans(self, text: str) -> Iterator[Tuple[int, int]]:
+        """Yield (start, end) offsets of chunks in text, without copying it"""
+        strong = sorted(
+            [m.start() for m in CLAUSE_START_PATTERN.finditer(text)]
+            + [m.start() for m in CAPS_HEADING_PATTERN.finditer(text)]
+        )
+        weak = [m.end() for m in SENTENCE_END_PATTERN.finditer(text)]
+
+        start = self._skip_space(text, 0)
         while start < len(text):
-            end = start + self.chunk_size
-            chunk = text[start:end]
-            chunks.append(chunk)
-            start = end - self.chunk_overlap
-            
-        return [chunk for chunk in chunks if chunk.strip()]
+            end = self._choose_end(text, start, strong, weak)
+            if text[start:end].strip():
+                yield start, self._trim_end(text, start, end)
+            start = self._skip_space(text, end)
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in self.iter_spans(text)]
+
+    def _choose_end(self, text: str, start: int, strong: List[int], weak: List[int]) -> int:
+        if len(text) - start <= self.max_size:
+            # Still break on a heading, so the tail clause doesn't ride along with the previous one
+            cut = self._nearest(strong, start + self.min_size, len(text) - 1, start + self.target_size)
+            return cut if cut is not None else len(text)
+
+        low, high, target = start + self.min_size, start + self.max_size, start + self.target_size
+        for boundaries in (strong, weak):
+            cut = self._nearest(boundaries, low, high, target)
+            if cut is not None:
+                return cut
+
+        # No structure in range: fall back to the last whitespace before the hard limit
+        space = max(text.rfind(" ", low, high), text.rfind("\n", low, high))
+        return space if space > start else high
+
+    @staticmethod
+    def _nearest(boundaries: List[int], low: int, high: int, target: int):
+        """Boundary in [low, high] closest to target, or None"""
+        lo, hi = bisect_left(boundaries, low), bisect_right(boundaries, high)
+        if lo >= hi:
+            return None
+        i = bisect_left(boundaries, target, lo, hi)
+        candidates = [boundaries[j] for j in (i - 1, i) if lo <= j < hi]
+        return min(candidates, key=lambda b: abs(b - target))
+
+    @staticmethod
+    def _skip_space(text: str, pos: int) -> int:
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+        return pos
+
+    @staticmethod
+    def _trim_end(text: str, start: int, end: int) -> int:
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return end
 
 class DocumentProcessor:
-    def __init__(self):
-        self.text_splitter = SimpleTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200
+    def __init__(self, downloader: Optional[DocumentDownloader] = None,
+                 page_extractor: Optional[PDFPageExtractor] = None):
+        self.downloader = downloader or get_default_downloader()
+        self.page_extractor = page_extractor or PDFPageExtractor()
+        self.text_splitter = StructureAwareTextSplitter(
+            target_size=1000,
+            min_size=300,
+            max_size=1500
         )
     
     def download_document(self, url: str) -> bytes:
         """Download document from URL"""
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-        return response.content
+        with stage("download"):
+            return self.downloader.download(url, conditional=False).content
     
-    def process_pdf_content(self, pdf_content: bytes) -> Tuple[List[str], List[Dict[str, Any]]]:
-        """Process PDF content and return chunks with metadata"""
-        documents = []
-        metadata = []
+    def fetch_document(self, url: str, conditional: bool = True) -> DownloadResult:
+        """Fetch document, skipping the body with a 304 if it is unchanged since the last download"""
+        with stage("download"):
+            return self.downloader.download(url, conditional=conditional)
+    
+    def process_pdf_chunks(self, pdf_content: bytes) -> ChunkStore:
+        """Process PDF content into page texts with offset-based chunks"""
+        store = ChunkStore()
         
-        # Save PDF temporarily
-        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp_file:
-            tmp_file.write(pdf_content)
-            tmp_file_path = tmp_file.name
+        # Extract page text from the in-memory PDF, in parallel for long documents
+        with stage("pdf_extract"):
+            page_texts = self.page_extractor.extract_pages(pdf_content)
         
-        try:
-            # Extract text from PDF
-            reader = PdfReader(tmp_file_path)
-            
-            for page_num, page in enumerate(reader.pages):
-                page_text = page.extract_text()
+        with stage("chunk"):
+            for page_num, page_text in enumerate(page_texts):
+                if not page_text.strip():
+                    continue
                 
-                if page_text.strip():
-                    documents.append(page_text)
-                    metadata.append({
-                        'source': 'policy_document.pdf',
-                        'page_number': page_num + 1,
-                        'total_pages': len(reader.pages),
-                        'content_length': len(page_text)
-                    })
+                page = store.add_page(page_text, total_pages=len(page_texts))
+                for i, (start, end) in enumerate(self.text_splitter.iter_spans(page_text)):
+                    store.add_chunk(page, start, end, page_number=page_num + 1, chunk_index=i,
+                                    source='policy_document.pdf')
         
-        finally:
-            os.unlink(tmp_file_path)
-        
-        # Split into chunks
-        final_chunks = []
-        final_metadata = []
-        
-        for doc, meta in zip(documents, metadata):
-            chunks = self.text_splitter.split_text(doc)
-            
-            for i, chunk in enumerate(chunks):
-                final_chunks.append(chunk)
-                chunk_meta = meta.copy()
-                chunk_meta.update({
-                    'chunk_index': i,
-                    'total_chunks': len(chunks),
-                    'chunk_length': len(chunk)
-                })
-                final_metadata.append(chunk_meta)
-        
-        return final_chunks, final_metadata
+        return store
+    
+    def process_pdf_content(self, pdf_content: bytes) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Process PDF content and return chunks with metadata"""
+        store = self.process_pdf_chunks(pdf_content)
+        return list(store.iter_texts()), [store.chunk_metadata(i) for i in range(len(store))]
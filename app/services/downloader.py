@@ -0,0 +1,196 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.services.index_cache import normalize_url
+
+class DocumentTooLargeError(Exception):
+    """Raised when a document exceeds the downloader's byte cap"""
+
+class DocumentTimeoutError(Exception):
+    """Raised when a download takes longer than the downloader's total time limit"""
+
+class DownloadResult:
+    def __init__(self, url: str, content: Optional[bytes], validators: Dict[str, str],
+                 not_modified: bool, elapsed: float):
+        self.url = url
+        self.content = content
+        self.validators = validators
+        self.not_modified = not_modified
+        self.elapsed = elapsed
+
+class DocumentDownloader:
+    """Pooled HTTP downloader with streamed reads, a byte cap and conditional requests.
+
+    Validators (ETag/Last-Modified) from the last full download of each URL are
+    remembered so the next request can be answered with a 304 and no body.
+    `timeout` bounds each connect and read; `max_seconds` bounds the whole
+    download, so a server dripping bytes cannot hold a host slot forever.
+    """
+
+    def __init__(self, max_bytes: int = 50 * 1024 * 1024, timeout: float = 30,
+                 per_host_limit: int = 4, pool_maxsize: int = 16,
+                 chunk_size: int = 64 * 1024, max_tracked_urls: int = 1024,
+                 max_seconds: float = 120):
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.max_seconds = max_seconds
+        self.per_host_limit = per_host_limit
+        self.chunk_size = chunk_size
+        self.max_tracked_urls = max_tracked_urls
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._validators: "OrderedDict[str, Dict[str, str]]" = OrderedDict()
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "downloads": 0,
+            "not_modified": 0,
+            "oversized": 0,
+            "errors": 0,
+            "bytes": 0,
+            "total_seconds": 0.0,
+            "max_seconds": 0.0,
+        }
+
+    def download(self, url: str, conditional: bool = True) -> DownloadResult:
+        """Fetch a document, sending validators from the previous download when conditional"""
+        key = normalize_url(url)
+        headers = {}
+        with self._lock:
+            previous = self._validators.get(key) if conditional else None
+        if previous:
+            if previous.get("etag"):
+                headers["If-None-Match"] = previous["etag"]
+            if previous.get("last_modified"):
+                headers["If-Modified-Since"] = previous["last_modified"]
+
+        start = time.perf_counter()
+        try:
+            with self._host_slot(url):
+                with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                    if response.status_code == 304:
+                        if not previous:
+                            # Nothing to fall back on; an empty body is not a document
+                            raise requests.HTTPError(
+                                f"Unexpected 304 for an unconditional request to {url}", response=response
+                            )
+                        result = DownloadResult(url, None, dict(previous), True, 0.0)
+                    else:
+                        response.raise_for_status()
+                        content = self._read_body(response, start + self.max_seconds)
+                        result = DownloadResult(url, content, self._extract_validators(response), False, 0.0)
+        except Exception:
+            self._record(time.perf_counter() - start, error=True)
+            raise
+
+        result.elapsed = time.perf_counter() - start
+        self._record(result.elapsed, nbytes=len(result.content or b""), not_modified=result.not_modified)
+        if not result.not_modified:
+            self._remember(key, result.validators)
+        return result
+
+    def _read_body(self, response: requests.Response, deadline: float) -> bytes:
+        declared = response.headers.get("Content-Length")
+        if declared and declared.isdigit() and int(declared) > self.max_bytes:
+            self._record_oversized()
+            raise DocumentTooLargeError(
+                f"Document is {declared} bytes, limit is {self.max_bytes}"
+            )
+
+        buffer = bytearray()
+        for chunk in self._iter_chunks(response):
+            buffer += chunk
+            if len(buffer) > self.max_bytes:
+                self._record_oversized()
+                raise DocumentTooLargeError(f"Document exceeds the {self.max_bytes} byte limit")
+            if time.perf_counter() > deadline:
+                raise DocumentTimeoutError(f"Download took longer than {self.max_seconds:g}s")
+        return bytes(buffer)
+
+    def _iter_chunks(self, response: requests.Response):
+        read1 = getattr(response.raw, "read1", None)
+        if read1 is None:
+            # urllib3 1.x: each read waits for a whole chunk, so the total limit is coarser
+            yield from response.iter_content(chunk_size=self.chunk_size)
+            return
+        # Return whatever has arrived, so the time limit is checked even while bytes trickle in
+        while True:
+            chunk = read1(self.chunk_size, decode_content=True)
+            if not chunk:
+                return
+            yield chunk
+
+    @staticmethod
+    def _extract_validators(response: requests.Response) -> Dict[str, str]:
+        validators = {}
+        if response.headers.get("ETag"):
+            validators["etag"] = response.headers["ETag"]
+        if response.headers.get("Last-Modified"):
+            validators["last_modified"] = response.headers["Last-Modified"]
+        return validators
+
+    def _remember(self, key: str, validators: Dict[str, str]):
+        with self._lock:
+            if not validators:
+                self._validators.pop(key, None)
+                return
+            self._validators[key] = validators
+            self._validators.move_to_end(key)
+            while len(self._validators) > self.max_tracked_urls:
+                self._validators.popitem(last=False)
+
+    @contextmanager
+    def _host_slot(self, url: str):
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+        with slot:
+            yield
+
+    def _record(self, elapsed: float, nbytes: int = 0, not_modified: bool = False, error: bool = False):
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["total_seconds"] += elapsed
+            self._stats["max_seconds"] = max(self._stats["max_seconds"], elapsed)
+            if error:
+                self._stats["errors"] += 1
+            elif not_modified:
+                self._stats["not_modified"] += 1
+            else:
+                self._stats["downloads"] += 1
+                self._stats["bytes"] += nbytes
+
+    def _record_oversized(self):
+        with self._lock:
+            self._stats["oversized"] += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["mean_seconds"] = stats["total_seconds"] / stats["requests"] if stats["requests"] else 0.0
+        return stats
+
+_default_downloader: Optional[DocumentDownloader] = None
+_default_lock = threading.Lock()
+
+def get_default_downloader() -> DocumentDownloader:
+    """Process-wide downloader shared by every caller that doesn't bring its own"""
+    global _default_downloader
+    with _default_lock:
+        if _default_downloader is None:
+            _default_downloader = DocumentDownloader()
+        return _default_downloader
@@ -0,0 +1,64 @@
+import re
+from typing import List
+
+import numpy as np
+
+from app.schemas.models import ClauseMatch
+from app.services.search_backends import tokenize
+
+# Sentence ends followed by what looks like a new sentence, so "Rs. 5,000" stays whole
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?;])\s+(?=[A-Z(])")
+NO_CONTEXT_ANSWER = "The retrieved policy text does not address this question."
+
+def split_sentences(text: str) -> List[str]:
+    text = " ".join(text.split())
+    return [sentence for sentence in SENTENCE_BOUNDARY.split(text) if sentence]
+
+def extractive_answer(question: str, clauses: List[ClauseMatch], max_sentences: int = 2,
+                      max_chars: int = 600) -> str:
+    """Answer with the retrieved sentences that best cover the question's terms.
+
+    Every sentence of the clauses is scored at once: log term frequency of
+    the question's terms weighted by their rarity across the sentences,
+    normalised by sentence length and scaled by the clause's retrieval
+    score. The best sentences are returned in document order.
+    """
+    # Overlapping chunks repeat sentences; keep each once with its best clause score
+    priors = {}
+    for clause in clauses:
+        for sentence in split_sentences(clause.clause_text):
+            priors[sentence] = max(priors.get(sentence, 0.0), clause.similarity_score)
+    if not priors:
+        return NO_CONTEXT_ANSWER
+    sentences = list(priors)
+
+    vocabulary = {term: i for i, term in enumerate(dict.fromkeys(tokenize(question)))}
+    rows, cols, lengths = [], [], np.ones(len(sentences))
+    for i, sentence in enumerate(sentences):
+        tokens = tokenize(sentence)
+        lengths[i] = max(1, len(tokens))
+        for token in tokens:
+            column = vocabulary.get(token)
+            if column is not None:
+                rows.append(i)
+                cols.append(column)
+
+    prior = np.maximum(np.fromiter(priors.values(), dtype=float, count=len(sentences)), 0)
+    prior = prior / prior.max() if prior.max() > 0 else np.ones_like(prior)
+    scores = np.zeros(len(sentences))
+    if rows:
+        counts = np.zeros((len(sentences), len(vocabulary)))
+        np.add.at(counts, (rows, cols), 1)
+        document_frequency = (counts > 0).sum(axis=0)
+        idf = np.log((len(sentences) + 1) / (document_frequency + 1)) + 1
+        scores = (np.log1p(counts) @ idf) / np.sqrt(lengths) * (1 + prior)
+
+    if not scores.any():
+        # Nothing shares a term with the question; the top clause is still the best guess
+        return _truncate(sentences[int(np.argmax(prior))], max_chars)
+    best = np.argsort(-scores, kind="stable")[:max_sentences]
+    best = sorted(i for i in best if scores[i] > 0)
+    return _truncate(" ".join(sentences[i] for i in best), max_chars)
+
+def _truncate(text: str, max_chars: int) -> str:
+    return text if len(text) <= max_chars else text[:max_chars].rsplit(" ", 1)[0] + "..."
@@ -0,0 +1,93 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Any
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+def normalize_url(url: str) -> str:
+    """Normalize a document URL so equivalent spellings share one cache entry"""
+    parts = urlsplit(url.strip())
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    path = parts.path or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ""))
+
+def make_alias_key(url: str, validators: Dict[str, str]) -> Optional[str]:
+    """Build a document identity from the URL and its HTTP validators"""
+    etag = validators.get("etag", "")
+    last_modified = validators.get("last_modified", "")
+    if not etag and not last_modified:
+        return None
+    return f"{normalize_url(url)}|{etag}|{last_modified}"
+
+class IndexCache:
+    """LRU cache of ready search engines, bounded by estimated memory footprint.
+
+    Entries are keyed by the SHA-256 of the document bytes. Aliases built from
+    the URL and its ETag/Last-Modified point at those entries so an unchanged
+    document can be resolved without downloading it again.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._aliases: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, fingerprint: str):
+        """Return the engine for a content fingerprint, or None on a miss"""
+        with self._lock:
+            engine = self._entries.get(fingerprint)
+            if engine is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(fingerprint)
+            self.hits += 1
+            return engine
+
+    def resolve_alias(self, alias: str) -> Optional[str]:
+        """Return the cached fingerprint for a URL/validator alias, or None"""
+        with self._lock:
+            fingerprint = self._aliases.get(alias)
+            return fingerprint if fingerprint in self._entries else None
+
+    def put(self, fingerprint: str, engine, alias: Optional[str] = None):
+        """Insert an engine and evict least recently used entries over budget"""
+        size = engine.memory_footprint()
+        with self._lock:
+            if fingerprint in self._entries:
+                self.current_bytes -= self._sizes[fingerprint]
+            self._entries[fingerprint] = engine
+            self._entries.move_to_end(fingerprint)
+            self._sizes[fingerprint] = size
+            self.current_bytes += size
+            if alias:
+                self._aliases[alias] = fingerprint
+            # Always keep the newest entry, even if it alone exceeds the budget
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                self._evict_oldest()
+
+    def add_alias(self, alias: str, fingerprint: str):
+        with self._lock:
+            if fingerprint in self._entries:
+                self._aliases[alias] = fingerprint
+
+    def _evict_oldest(self):
+        fingerprint, _ = self._entries.popitem(last=False)
+        self.current_bytes -= self._sizes.pop(fingerprint)
+        self._aliases = {a: f for a, f in self._aliases.items() if f != fingerprint}
+        self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,152 @@
+import json
+import mmap
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from app.services.chunk_store import ChunkStore
+from app.services.search_backends import BACKENDS
+from app.services.semantic_search import IndexSegment, SemanticSearchEngine
+
+SNAPSHOT_VERSION = 6
+
+# Per-chunk columns, saved side by side as one int64 matrix
+CHUNK_COLUMNS = ('chunk_pages', 'chunk_starts', 'chunk_ends', 'page_numbers', 'chunk_indices',
+                 'doc_codes', 'source_codes', 'clause_codes')
+
+class SnapshotChunkStore(ChunkStore):
+    """Read-only chunk store whose page texts live in a memory-mapped UTF-8 blob.
+
+    Pages are decoded only when one of their chunks is read, so worker
+    processes share the page cache copy instead of each holding the text.
+    """
+
+    def __init__(self, blob_path: str, page_offsets: np.ndarray, page_total_pages: np.ndarray,
+                 columns: np.ndarray, names: Dict[str, Any]):
+        super().__init__()
+        self.page_offsets = page_offsets
+        self.page_total_pages = page_total_pages
+        for i, name in enumerate(CHUNK_COLUMNS):
+            setattr(self, name, columns[:, i])
+        self.doc_names = names['doc_names']
+        self.source_names = names['source_names']
+        self.extra = {int(idx): meta for idx, meta in names['extra'].items()}
+        with open(blob_path, 'rb') as blob_file:
+            size = os.fstat(blob_file.fileno()).st_size
+            self._blob = mmap.mmap(blob_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+    def add_page(self, text: str, total_pages: int = -1) -> int:
+        raise TypeError("Snapshot chunk stores are read-only")
+
+    def add_chunk(self, *args, **kwargs):
+        raise TypeError("Snapshot chunk stores are read-only")
+
+    def page_text(self, page: int) -> str:
+        start, end = int(self.page_offsets[page]), int(self.page_offsets[page + 1])
+        return self._blob[start:end].decode('utf-8')
+
+    def text(self, idx: int) -> str:
+        page_text = self.page_text(int(self.chunk_pages[idx]))
+        return page_text[int(self.chunk_starts[idx]):int(self.chunk_ends[idx])]
+
+    def chunk_metadata(self, idx: int) -> Dict[str, Any]:
+        meta = super().chunk_metadata(idx)
+        # page_offsets are byte offsets here, so measure the page in characters
+        if idx not in self.extra and 'content_length' in meta:
+            meta['content_length'] = len(self.page_text(int(self.chunk_pages[idx])))
+        return meta
+
+    def memory_footprint(self) -> int:
+        """Private bytes only; the mapped arrays and text blob are shared page cache"""
+        return sum(64 * (len(meta) + 1) for meta in self.extra.values())
+
+def save_snapshot(engine: SemanticSearchEngine, path: str):
+    """Write the fitted index to `path` atomically; snapshots are content-addressed,
+    so an existing one is left in place for the workers that may be reading it"""
+    if os.path.exists(path):
+        return
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix='.snapshot-', dir=parent)
+
+    try:
+        segments = []
+        for n, segment in enumerate(engine.segments):
+            segment_dir = os.path.join(tmp_dir, f'segment-{n}')
+            os.makedirs(segment_dir)
+            segments.append(_save_segment(segment, segment_dir))
+
+        with open(os.path.join(tmp_dir, 'index.json'), 'w') as meta_file:
+            json.dump({
+                'version': SNAPSHOT_VERSION,
+                'backend': engine.backend_name,
+                'segments': segments
+            }, meta_file)
+
+        os.rename(tmp_dir, path)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+def _save_segment(segment: IndexSegment, path: str) -> Dict[str, Any]:
+    store = segment.store
+    page_offsets = [0]
+    with open(os.path.join(path, 'pages.bin'), 'wb') as blob:
+        for page in range(store.page_count()):
+            encoded = store.page_text(page).encode('utf-8')
+            blob.write(encoded)
+            page_offsets.append(page_offsets[-1] + len(encoded))
+    np.save(os.path.join(path, 'page_offsets.npy'), np.asarray(page_offsets, dtype=np.int64))
+    np.save(os.path.join(path, 'page_total_pages.npy'), np.asarray(store.page_total_pages, dtype=np.int32))
+    columns = np.column_stack([
+        np.asarray(getattr(store, name), dtype=np.int64) for name in CHUNK_COLUMNS
+    ]).reshape(-1, len(CHUNK_COLUMNS))
+    np.save(os.path.join(path, 'columns.npy'), columns)
+    np.save(os.path.join(path, 'chunk_ids.npy'), np.asarray(segment.chunk_ids, dtype=np.int64))
+
+    return {
+        'backend_header': segment.backend.save(path),
+        'names': {
+            'doc_names': store.doc_names,
+            'source_names': store.source_names,
+            'extra': {str(idx): meta for idx, meta in store.extra.items()}
+        },
+        'deleted': sorted(segment.deleted)
+    }
+
+def load_snapshot(path: str) -> Optional[SemanticSearchEngine]:
+    """Open a snapshot read-only with memory-mapped arrays, or None if there isn't one"""
+    meta_path = os.path.join(path, 'index.json')
+    if not os.path.exists(meta_path):
+        return None
+
+    with open(meta_path) as meta_file:
+        meta = json.load(meta_file)
+    if meta.get('version') != SNAPSHOT_VERSION:
+        return None
+
+    backend_cls = BACKENDS[meta['backend']]
+    engine = SemanticSearchEngine(backend=meta['backend'])
+    segments = []
+    for n, segment_meta in enumerate(meta['segments']):
+        segment_dir = os.path.join(path, f'segment-{n}')
+
+        def load_array(name: str) -> np.ndarray:
+            return np.load(os.path.join(segment_dir, name), mmap_mode='r')
+
+        store = SnapshotChunkStore(
+            os.path.join(segment_dir, 'pages.bin'), load_array('page_offsets.npy'),
+            load_array('page_total_pages.npy'), load_array('columns.npy'), segment_meta['names']
+        )
+        segment = IndexSegment(
+            backend_cls.load(segment_dir, segment_meta['backend_header'], load_array),
+            store, load_array('chunk_ids.npy')
+        )
+        segment.deleted = frozenset(segment_meta['deleted'])
+        segments.append(segment)
+
+    engine.restore_segments(segments)
+    return engine
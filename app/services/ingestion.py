@@ -0,0 +1,123 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+from app.services.index_cache import normalize_url
+from app.services.request_executor import OverloadedError
+
+class UnknownDocumentError(KeyError):
+    """No ingestion job with this document id"""
+
+class IngestionJob:
+    """Progress and timings of one document ingestion"""
+
+    def __init__(self, url: str):
+        self.document_id = uuid.uuid4().hex
+        self.url = url
+        self.status = "queued"
+        self.stage = "queued"
+        self.fingerprint: Optional[str] = None
+        self.error: Optional[str] = None
+        self.submitted_at = time.time()
+        self.future: Future = Future()
+        self._stage_started = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+
+    def enter_stage(self, stage: str):
+        now = time.perf_counter()
+        self.timings[self.stage] = round(now - self._stage_started, 4)
+        self.stage = stage
+        self._stage_started = now
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("ready", "failed")
+
+    def to_dict(self) -> Dict:
+        return {
+            "document_id": self.document_id,
+            "url": self.url,
+            "status": self.status,
+            "stage": self.stage,
+            "fingerprint": self.fingerprint,
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "timings": dict(self.timings),
+        }
+
+class DocumentIngestionService:
+    """Ingest documents ahead of queries on a bounded background pool.
+
+    `resolve` is called as resolve(url, on_stage) and returns the document's
+    (fingerprint, engine); jobs report each stage it announces. At most
+    `max_pending` jobs may be queued or running; the oldest finished jobs are
+    forgotten beyond `max_jobs`.
+    """
+
+    def __init__(self, resolve: Callable, max_workers: int = 2, max_pending: int = 32,
+                 max_jobs: int = 1000):
+        self.resolve = resolve
+        self.max_pending = max_pending
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._active_by_url: Dict[str, IngestionJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, url: str) -> IngestionJob:
+        """Queue a document, reusing a job already queued or running for the same URL"""
+        key = normalize_url(url)
+        with self._lock:
+            job = self._active_by_url.get(key)
+            if job is not None:
+                return job
+            if len(self._active_by_url) >= self.max_pending:
+                raise OverloadedError(retry_after=5, status_code=429)
+            job = IngestionJob(url)
+            self._jobs[job.document_id] = job
+            self._active_by_url[key] = job
+            self._trim_locked()
+        self._executor.submit(self._run, job, key)
+        return job
+
+    def get(self, document_id: str) -> IngestionJob:
+        with self._lock:
+            job = self._jobs.get(document_id)
+        if job is None:
+            raise UnknownDocumentError(document_id)
+        return job
+
+    def wait(self, document_id: str, timeout: Optional[float] = None) -> IngestionJob:
+        """Block until the job is done; re-raises its ingestion error"""
+        job = self.get(document_id)
+        job.future.result(timeout)
+        return job
+
+    def _run(self, job: IngestionJob, key: str):
+        job.status = "running"
+        job.enter_stage("resolving")
+        try:
+            job.fingerprint, _ = self.resolve(job.url, job.enter_stage)
+            job.enter_stage("ready")
+            job.status = "ready"
+            job.future.set_result(job.fingerprint)
+        except Exception as e:
+            job.error = str(e)
+            job.enter_stage("failed")
+            job.status = "failed"
+            job.future.set_exception(e)
+        finally:
+            with self._lock:
+                self._active_by_url.pop(key, None)
+
+    def _trim_locked(self):
+        finished = [doc_id for doc_id, job in self._jobs.items() if job.finished]
+        for doc_id in finished[:max(0, len(self._jobs) - self.max_jobs)]:
+            del self._jobs[doc_id]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {status: statuses.count(status) for status in ("queued", "running", "ready", "failed")}
@@ -0,0 +1,205 @@
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+from groq import APIConnectionError
+
+from app.services.context_builder import estimate_tokens
+from app.services.request_executor import DeadlineExceededError
+
+RETRYABLE_STATUS = {408, 409, 429}
+
+class TokenBucket:
+    """Budget refilled continuously at `per_minute`, e.g. requests or tokens per minute.
+
+    Reservations are taken immediately and may drive the bucket into debt;
+    the caller then waits until the debt would have been refilled.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` and return how many seconds to wait before spending it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= min(amount, self.capacity)
+            return max(0.0, -self._tokens / self.rate)
+
+    def refund(self, amount: float):
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+def is_retryable(error: Exception) -> bool:
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    return isinstance(error, (APIConnectionError, ConnectionError, TimeoutError))
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Delay requested by the provider's Retry-After(-ms) header, if any"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class LLMScheduler:
+    """Paces, retries and optionally hedges chat completion calls on one client.
+
+    Calls wait on requests-per-minute and tokens-per-minute buckets before
+    going out. Transient failures are retried with full-jitter exponential
+    backoff; a 429 pauses every caller for the provider's Retry-After. With
+    `hedge_after` set, a call still running after that many seconds gets a
+    duplicate and whichever finishes first wins. Calls and their duplicates
+    run on separate pools of `max_hedge_workers` threads each, so a full
+    set of slow calls can still be hedged.
+
+    A call given a `deadline` (a time.monotonic() value) never waits, sleeps
+    or stays on the wire past it; it raises DeadlineExceededError instead.
+    """
+
+    def __init__(self, client, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None, max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 20.0, max_retry_after: float = 60.0,
+                 hedge_after: Optional[float] = None, max_hedge_workers: int = 8):
+        self.client = client
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retry_after = max_retry_after
+        self.hedge_after = hedge_after
+        self._call_pool = self._hedge_pool = None
+        if hedge_after is not None:
+            self._call_pool = ThreadPoolExecutor(max_workers=max_hedge_workers, thread_name_prefix="llm-call")
+            self._hedge_pool = ThreadPoolExecutor(max_workers=max_hedge_workers, thread_name_prefix="llm-hedge")
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "attempts": 0, "retries": 0, "rate_limited": 0, "failures": 0,
+                       "hedges": 0, "hedge_wins": 0, "deadline_exceeded": 0,
+                       "queue_wait_seconds": 0.0, "max_queue_wait_seconds": 0.0}
+
+    def create(self, deadline: Optional[float] = None, **request) -> Any:
+        """Drop-in for `client.chat.completions.create`"""
+        self._count("calls")
+        if self._hedge_pool is None:
+            return self._call_with_retries(request, deadline)
+
+        primary = self._call_pool.submit(self._call_with_retries, request, deadline)
+        done, _ = wait([primary], timeout=self.hedge_after)
+        if done:
+            return primary.result()
+
+        self._count("hedges")
+        hedge = self._hedge_pool.submit(self._call_with_retries, request, deadline)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count("hedge_wins")
+                    return future.result()
+        # Both failed; report the original call's error
+        return primary.result()
+
+    def _call_with_retries(self, request: Dict[str, Any], deadline: Optional[float] = None) -> Any:
+        reserved = estimate_tokens("".join(m.get("content", "") for m in request.get("messages", [])))
+        reserved += request.get("max_tokens", 0)
+
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_capacity(reserved, deadline)
+            self._count("attempts")
+            if deadline is not None:
+                # The SDK drops the connection when the remaining budget runs out
+                request = dict(request, timeout=self._remaining(deadline))
+            try:
+                response = self.client.chat.completions.create(**request)
+            except Exception as e:
+                if deadline is not None and time.monotonic() >= deadline:
+                    self._count("deadline_exceeded")
+                    raise DeadlineExceededError("LLM call missed its deadline") from e
+                retry_after = retry_after_seconds(e)
+                if (not is_retryable(e) or attempt == self.max_retries
+                        or (retry_after is not None and retry_after > self.max_retry_after)):
+                    self._count("failures")
+                    raise
+                self._count("retries")
+                if retry_after is not None:
+                    delay = retry_after + random.uniform(0, self.backoff_base)
+                else:
+                    delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    self._count("deadline_exceeded")
+                    raise DeadlineExceededError("LLM call cannot be retried before its deadline") from e
+                if getattr(e, "status_code", None) == 429:
+                    # Rate limited: everyone backs off, not just this caller
+                    self._count("rate_limited")
+                    with self._lock:
+                        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                else:
+                    time.sleep(delay)
+                continue
+
+            usage = getattr(response, "usage", None)
+            if self.tokens is not None and usage is not None and getattr(usage, "total_tokens", None):
+                # Give back what the reservation over-estimated
+                self.tokens.refund(reserved - usage.total_tokens)
+            return response
+
+    def _remaining(self, deadline: float) -> float:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self._count("deadline_exceeded")
+            raise DeadlineExceededError("LLM call missed its deadline")
+        return remaining
+
+    def _wait_for_capacity(self, tokens: int, deadline: Optional[float] = None):
+        with self._lock:
+            delay = max(0.0, self._paused_until - time.monotonic())
+        if self.requests is not None:
+            delay = max(delay, self.requests.reserve(1))
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.reserve(tokens))
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            # Would only go out after the deadline; hand the budget back to other callers
+            if self.requests is not None:
+                self.requests.refund(1)
+            if self.tokens is not None:
+                self.tokens.refund(tokens)
+            self._count("deadline_exceeded")
+            raise DeadlineExceededError("LLM rate limits leave no room before the deadline")
+        if delay > 0:
+            time.sleep(delay)
+        with self._lock:
+            self._stats["queue_wait_seconds"] += delay
+            self._stats["max_queue_wait_seconds"] = max(self._stats["max_queue_wait_seconds"], delay)
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["avg_queue_wait_seconds"] = stats["queue_wait_seconds"] / stats["attempts"] if stats["attempts"] else 0.0
+        return stats
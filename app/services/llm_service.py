@@ -1,5 +1,11 @@
-from typing import List
+import json
+import threading
+from typing import List, Dict, Optional, Tuple
 from groq import Groq
+from app.core.metrics import stage
+from app.services.context_builder import ContextBuilder, estimate_tokens
+from app.services.llm_scheduler import LLMScheduler
+from app.services.request_executor import DeadlineExceededError
 
 # Import models (will work after we create models.py)
 try:
@@ -15,22 +21,84 @@ except ImportError:
         clause_type: str
         metadata: Dict[str, Any]
 
+ERROR_PREFIX = "Error generating answer: "
+
+def is_error_answer(answer: str) -> bool:
+    return answer.startswith(ERROR_PREFIX)
+
+def parse_batch_answers(content: str, n_questions: int) -> Dict[int, str]:
+    """Strictly parse a batched JSON reply into {question index: answer}.
+
+    Entries with unknown ids, duplicate ids or empty answers are left out so the
+    caller can answer those questions individually.
+    """
+    text = content.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.find("{"):] if "{" in text else text
+    payload = json.loads(text)
+    if not isinstance(payload, dict) or not isinstance(payload.get("answers"), list):
+        raise ValueError("Batched reply has no 'answers' list")
+
+    answers: Dict[int, str] = {}
+    seen = set()
+    for item in payload["answers"]:
+        if not isinstance(item, dict):
+            continue
+        qid, answer = item.get("id"), item.get("answer")
+        if not isinstance(qid, int) or isinstance(qid, bool) or not 1 <= qid <= n_questions:
+            continue
+        if qid in seen:
+            answers.pop(qid - 1, None)
+            continue
+        seen.add(qid)
+        if isinstance(answer, str) and answer.strip():
+            answers[qid - 1] = answer.strip()
+    return answers
+
+INSTRUCTIONS = """1. Answer based ONLY on the provided context
+2. Be specific and cite relevant policy terms
+3. If the context doesn't contain enough information, state that clearly
+4. Keep the answer focused and professional
+5. Include specific details like timeframes, amounts, conditions when available"""
+
 class LLMService:
-    def __init__(self, api_key: str):
-        self.client = Groq(api_key=api_key)
+    # Bump whenever a prompt changes so cached answers from the old prompt are not reused
+    PROMPT_VERSION = "2"
+    BATCH_PROMPT_VERSION = "1"
+
+    def __init__(self, api_key: str, model: str = "llama3-70b-8192",
+                 context_builder: Optional[ContextBuilder] = None,
+                 batch_questions: bool = False, max_batch_size: int = 5, client=None,
+                 base_url: Optional[str] = None, scheduler: Optional[LLMScheduler] = None):
+        # `client` lets tests and benchmarks substitute a stub with Groq's interface;
+        # retries are the scheduler's job, so the SDK's own are turned off
+        self.client = client or Groq(api_key=api_key, base_url=base_url, max_retries=0)
+        self.scheduler = scheduler or LLMScheduler(self.client)
+        self.model = model
+        self.context_builder = context_builder or ContextBuilder()
+        self.batch_questions = batch_questions
+        self.max_batch_size = max_batch_size
+        self._usage_lock = threading.Lock()
+        self._usage = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                       "context_tokens": 0, "raw_context_tokens": 0}
     
     def answer_question(self, question: str, relevant_clauses: List[ClauseMatch]) -> str:
         """Generate answer based on question and relevant clauses"""
+        return self.answer_question_with_usage(question, relevant_clauses)[0]
+    
+    def answer_question_with_usage(self, question: str, relevant_clauses: List[ClauseMatch],
+                                   deadline: Optional[float] = None) -> Tuple[str, Dict[str, int]]:
+        """Generate answer and report the prompt token counts it cost.
+
+        Past `deadline` (a time.monotonic() value) the call is abandoned with
+        DeadlineExceededError, so callers can tell a late answer from a failed one.
+        """
         
-        # Prepare context from clauses
-        context_parts = []
-        for i, clause in enumerate(relevant_clauses[:5]):  # Top 5 clauses
-            context_parts.append(f"""
-Context {i+1} (Similarity: {clause.similarity_score:.3f}):
-{clause.clause_text}
-""")
-        
-        context = "\n".join(context_parts)
+        # Merge overlapping chunks, drop duplicates and fit the token budget
+        with stage("context_build"):
+            blocks, usage = self.context_builder.build(relevant_clauses)
+            context = self.context_builder.render(blocks)
         
         prompt = f"""
 You are an expert insurance policy analyst. Based on the provided policy document context, 
@@ -42,23 +110,153 @@ Relevant Policy Context:
 {context}
 
 Instructions:
-1. Answer based ONLY on the provided context
-2. Be specific and cite relevant policy terms
-3. If the context doesn't contain enough information, state that clearly
-4. Keep the answer focused and professional
-5. Include specific details like timeframes, amounts, conditions when available
+{INSTRUCTIONS}
 
 Answer:"""
 
         try:
-            response = self.client.chat.completions.create(
+            answer = self._complete(prompt, usage, max_tokens=500, deadline=deadline)
+        except DeadlineExceededError:
+            self._record_usage(usage)
+            raise
+        except Exception as e:
+            answer = f"{ERROR_PREFIX}{str(e)}"
+        
+        self._record_usage(usage)
+        return answer, usage
+    
+    @property
+    def cache_version(self) -> str:
+        """Prompt identity for answer caching; batched answers come from a different prompt"""
+        if self.batch_questions:
+            return f"{self.PROMPT_VERSION}+batch{self.BATCH_PROMPT_VERSION}"
+        return self.PROMPT_VERSION
+    
+    def group_questions(self, clause_lists: List[List[ClauseMatch]]) -> List[List[int]]:
+        """Group question indices whose retrieved clauses overlap, up to max_batch_size each"""
+        if not self.batch_questions:
+            return [[i] for i in range(len(clause_lists))]
+        
+        clause_sets = [{c.clause_id for c in clauses[:self.context_builder.max_clauses]}
+                       for clauses in clause_lists]
+        groups: List[List[int]] = []
+        group_clauses: List[set] = []
+        for i, clause_ids in enumerate(clause_sets):
+            for group, shared in zip(groups, group_clauses):
+                if len(group) < self.max_batch_size and clause_ids & shared:
+                    group.append(i)
+                    shared |= clause_ids
+                    break
+            else:
+                groups.append([i])
+                group_clauses.append(set(clause_ids))
+        return groups
+    
+    def answer_group(self, questions: List[str], clause_lists: List[List[ClauseMatch]],
+                     deadline: Optional[float] = None,
+                     retry_missing: bool = True) -> List[Tuple[Optional[str], Dict[str, int]]]:
+        """Answer related questions with one prompt, falling back to single calls per question.
+
+        With `retry_missing` False, questions the batched reply left out come
+        back as None answers so the caller can ask them individually in parallel.
+        """
+        if len(questions) == 1:
+            return [self.answer_question_with_usage(questions[0], clause_lists[0], deadline)]
+        
+        # One shared context: the union of every question's clauses, best score kept
+        merged: Dict[str, ClauseMatch] = {}
+        for clauses in clause_lists:
+            for clause in clauses[:self.context_builder.max_clauses]:
+                if clause.clause_id not in merged or clause.similarity_score > merged[clause.clause_id].similarity_score:
+                    merged[clause.clause_id] = clause
+        shared_builder = ContextBuilder(
+            max_tokens=self.context_builder.max_tokens * 2,
+            max_clauses=len(merged),
+            duplicate_threshold=self.context_builder.duplicate_threshold
+        )
+        with stage("context_build"):
+            blocks, usage = shared_builder.build(sorted(merged.values(), key=lambda c: -c.similarity_score))
+            context = shared_builder.render(blocks)
+        numbered = "\n".join(f"{i+1}. {question}" for i, question in enumerate(questions))
+        
+        prompt = f"""
+You are an expert insurance policy analyst. Based on the provided policy document context, 
+answer each of the following questions accurately and concisely.
+
+Questions:
+{numbered}
+
+Relevant Policy Context:
+{context}
+
+Instructions:
+{INSTRUCTIONS}
+6. Respond with ONLY a JSON object of the form {{"answers": [{{"id": 1, "answer": "..."}}]}} containing one entry per question id
+
+JSON:"""
+
+        try:
+            parsed = parse_batch_answers(
+                self._complete(prompt, usage, max_tokens=300 * len(questions), json_mode=True,
+                               deadline=deadline),
+                len(questions)
+            )
+        except DeadlineExceededError:
+            self._record_usage(usage)
+            raise
+        except Exception:
+            parsed = {}
+        self._record_usage(usage)
+        
+        # The batch call's tokens are attributed to the first question it answered
+        results: List[Tuple[str, Dict[str, int]]] = []
+        charged = False
+        for i, (question, clauses) in enumerate(zip(questions, clause_lists)):
+            if i in parsed:
+                share = usage if not charged else {"llm_calls": 0}
+                charged = True
+                results.append((parsed[i], share))
+            elif retry_missing:
+                results.append(self.answer_question_with_usage(question, clauses, deadline))
+            else:
+                results.append((None, {"llm_calls": 0}))
+        if not charged:
+            # Nothing usable came back, but the batch call still cost tokens
+            first = results[0][1]
+            for key, value in usage.items():
+                first[key] = first.get(key, 0) + value
+        return results
+    
+    def _complete(self, prompt: str, usage: Dict[str, int], max_tokens: int, json_mode: bool = False,
+                  deadline: Optional[float] = None) -> str:
+        """Run one chat completion, filling `usage` with token counts"""
+        usage["prompt_tokens"] = estimate_tokens(prompt)
+        usage["completion_tokens"] = 0
+        usage["llm_calls"] = 1
+        
+        kwargs = {"response_format": {"type": "json_object"}} if json_mode else {}
+        with stage("llm_call"):
+            response = self.scheduler.create(
+                deadline=deadline,
                 messages=[{"role": "user", "content": prompt}],
-                model="llama3-70b-8192",
+                model=self.model,
                 temperature=0.1,
-                max_tokens=500
+                max_tokens=max_tokens,
+                **kwargs
             )
-            
-            return response.choices[0].message.content.strip()
-            
-        except Exception as e:
-            return f"Error generating answer: {str(e)}"
+        
+        # Prefer the provider's own count when it reports one
+        if getattr(response, "usage", None) is not None:
+            usage["prompt_tokens"] = response.usage.prompt_tokens
+            usage["completion_tokens"] = response.usage.completion_tokens
+        return response.choices[0].message.content.strip()
+    
+    def _record_usage(self, usage: Dict[str, int]):
+        with self._usage_lock:
+            self._usage["requests"] += usage.get("llm_calls", 1)
+            for key in ("prompt_tokens", "completion_tokens", "context_tokens", "raw_context_tokens"):
+                self._usage[key] += usage.get(key, 0)
+    
+    def stats(self) -> Dict[str, int]:
+        with self._usage_lock:
+            return dict(self._usage)
@@ -0,0 +1,113 @@
+import re
+from typing import List, Optional, Tuple
+
+from app.schemas.models import ClauseMatch
+from app.services.extractive_answer import split_sentences
+from app.services.search_backends import tokenize
+
+class LocalAnswerRule:
+    """A routine question whose answer is a short value a pattern can read off a clause.
+
+    `patterns` are (regex, match quality) pairs, best first; the regex's
+    groups are substituted into `template` as {0}, {1}, ... `vocabulary`
+    lists the words that merely restate the routine question; any other
+    word in a question is a qualifier the supporting sentence must contain.
+    """
+
+    def __init__(self, name: str, question: str, patterns: List[Tuple[str, float]], template: str,
+                 vocabulary: str):
+        self.name = name
+        self.question = re.compile(question, re.IGNORECASE)
+        self.patterns = [(re.compile(pattern, re.IGNORECASE), quality) for pattern, quality in patterns]
+        self.template = template
+        self.vocabulary = frozenset(vocabulary.split()) | GENERIC_WORDS
+
+AMOUNT = r"((?:rs\.?|inr|\$|₹)\s?\d[\d,]*(?:\.\d+)?)"
+# Relevance of a clause by its rank among the retrieved ones. Raw scores mean
+# different things per backend (cosines well below 1, unbounded BM25 sums), so
+# only their order is used.
+RANK_RELEVANCE = (1.0, 0.9, 0.8, 0.7, 0.6)
+# Words any routine question may use without narrowing what it asks
+GENERIC_WORDS = frozenset("""
+policy policies insurance insured plan cover covers covered coverage applicable applies apply
+amount long many much time period days day months month years year tell please
+""".split())
+
+LOCAL_RULES = [
+    LocalAnswerRule(
+        "grace_period", r"grace period",
+        [(r"grace period[^.]*?(\d+)\s*days?", 1.0), (r"(\d+)\s*days?[^.]*?grace period", 0.8)],
+        "The grace period is {0} days.",
+        "grace premium premiums payment payments pay paying due date renewal renew allowed provided",
+    ),
+    LocalAnswerRule(
+        "waiting_period", r"waiting period.*(?:pre-existing|disease)|(?:pre-existing|disease).*waiting period",
+        [(r"pre-existing[^.]*?waiting period of (\d+)\s*(months?|years?)", 1.0),
+         (r"waiting period of (\d+)\s*(months?|years?)[^.]*?pre-existing", 1.0)],
+        "The waiting period for pre-existing diseases is {0} {1}.",
+        "waiting pre existing disease diseases ped peds conditions condition",
+    ),
+    LocalAnswerRule(
+        "deductible", r"deductible",
+        [(r"deductible of " + AMOUNT, 1.0), (r"deductible[^.]*?" + AMOUNT, 0.8)],
+        "The deductible is {0}.",
+        "deductible deductibles",
+    ),
+    LocalAnswerRule(
+        "claim_notice", r"claim.*(?:notif|intimat|how soon|within)|(?:notif|intimat).*claim",
+        [(r"claim[^.]*?(?:notif|intimat)\w*[^.]*?within (\d+)\s*(days?|hours?)", 1.0),
+         (r"(?:notif|intimat)\w*[^.]*?claim[^.]*?within (\d+)\s*(days?|hours?)", 1.0)],
+        "Claims must be notified within {0} {1}.",
+        "claim claims notify notified notification intimate intimated intimation soon limit "
+        "made make file filed filing submit submitted hours hour",
+    ),
+]
+
+def _qualifiers(rule: LocalAnswerRule, question: str) -> List[str]:
+    # Capitalised words name the policy or product, which the document itself already fixes
+    question = re.sub(r"\b[A-Z]\w*", " ", question)
+    return [token for token in tokenize(question) if token not in rule.vocabulary]
+
+def _mentions(sentence: str, qualifier: str) -> bool:
+    # Plural and singular forms both count
+    stem = qualifier[:-1] if len(qualifier) > 3 and qualifier.endswith("s") else qualifier
+    return stem in sentence
+
+def local_answer(question: str, clauses: List[ClauseMatch]) -> Optional[Tuple[str, float]]:
+    """Pattern-read answer for a routine question and its confidence in [0, 1], or None.
+
+    Only sentences containing every qualifier of the question count, so
+    "the deductible for dental claims" is not answered from a clause about
+    another treatment. Confidence is the quality of the pattern that matched
+    times the matching clause's RANK_RELEVANCE, halved when the clauses
+    disagree on the value. Clauses sharing no term with the question are skipped.
+    """
+    rule = next((rule for rule in LOCAL_RULES if rule.question.search(question)), None)
+    if rule is None or not clauses:
+        return None
+    qualifiers = _qualifiers(rule, question)
+
+    # (confidence, values, supporting sentence) for every matching sentence
+    candidates = []
+    ranked = sorted(clauses, key=lambda clause: -clause.similarity_score)
+    for rank, clause in enumerate(ranked):
+        if clause.similarity_score <= 0:
+            break
+        relevance = RANK_RELEVANCE[min(rank, len(RANK_RELEVANCE) - 1)]
+        for sentence in split_sentences(clause.clause_text):
+            lowered = sentence.lower()
+            if not all(_mentions(lowered, qualifier) for qualifier in qualifiers):
+                continue
+            for pattern, quality in rule.patterns:
+                match = pattern.search(sentence)
+                if match:
+                    values = tuple(" ".join(group.split()) for group in match.groups())
+                    candidates.append((quality * relevance, values, sentence))
+                    break
+    if not candidates:
+        return None
+
+    confidence, values, sentence = max(candidates, key=lambda candidate: candidate[0])
+    if len({tuple(value.lower() for value in candidate[1]) for candidate in candidates}) > 1:
+        confidence *= 0.5
+    return f"{rule.template.format(*values)} Policy text: \"{sentence}\"", confidence
@@ -0,0 +1,142 @@
+import io
+import os
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Optional, Tuple
+from pypdf import PdfReader
+
+class _PageTimeout(Exception):
+    pass
+
+def _raise_page_timeout(signum, frame):
+    raise _PageTimeout()
+
+def _extract_pages(reader: PdfReader, start: int, end: int, page_timeout: float) -> List[str]:
+    """Extract pages [start, end); pages over budget yield empty text"""
+    # SIGALRM can only interrupt extraction on the main thread, which is where pool workers run
+    use_alarm = (
+        page_timeout > 0
+        and hasattr(signal, "setitimer")
+        and threading.current_thread() is threading.main_thread()
+    )
+    previous_handler = signal.signal(signal.SIGALRM, _raise_page_timeout) if use_alarm else None
+
+    texts = []
+    try:
+        for page_num in range(start, end):
+            text = ""
+            try:
+                if use_alarm:
+                    signal.setitimer(signal.ITIMER_REAL, page_timeout)
+                text = reader.pages[page_num].extract_text() or ""
+            except _PageTimeout:
+                pass
+            finally:
+                if use_alarm:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+            texts.append(text)
+    finally:
+        if use_alarm:
+            signal.signal(signal.SIGALRM, previous_handler)
+
+    return texts
+
+# Per worker process: the shared-memory document last read and its parsed reader,
+# so the several ranges of one document a worker picks up parse it only once
+_worker_document: Tuple[Optional[str], Optional[PdfReader]] = (None, None)
+
+def _extract_shared_range(shm_name: str, size: int, start: int, end: int, page_timeout: float) -> List[str]:
+    global _worker_document
+    if _worker_document[0] != shm_name:
+        shm = SharedMemory(name=shm_name)
+        try:
+            content = bytes(shm.buf[:size])
+        finally:
+            shm.close()
+        _worker_document = (shm_name, PdfReader(io.BytesIO(content)))
+    return _extract_pages(_worker_document[1], start, end, page_timeout)
+
+class PDFPageExtractor:
+    """Extract per-page text from PDF bytes, spreading page ranges over a process pool.
+
+    With a page time limit every document goes through the pool, since the
+    limit relies on SIGALRM and only a worker's main thread can receive it.
+    The PDF is placed in shared memory once rather than pickled per range.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, page_timeout: float = 10.0,
+                 min_pages_for_pool: int = 8):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.page_timeout = page_timeout
+        # Documents shorter than this go to the pool as a single range
+        self.min_pages_for_pool = min_pages_for_pool
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def extract_pages(self, pdf_content: bytes) -> List[str]:
+        """Return the text of every page, in page order"""
+        total_pages = len(PdfReader(io.BytesIO(pdf_content)).pages)
+        if total_pages == 0:
+            return []
+        if self.page_timeout <= 0:
+            # No per-page limit to enforce, so no reason to leave this thread
+            return _extract_pages(PdfReader(io.BytesIO(pdf_content)), 0, total_pages, 0)
+
+        # A few ranges per worker keeps the pool balanced when some pages are slow
+        n_ranges = 1 if total_pages < self.min_pages_for_pool else min(total_pages, self.max_workers * 2)
+        bounds = [total_pages * i // n_ranges for i in range(n_ranges + 1)]
+
+        shm = SharedMemory(create=True, size=len(pdf_content))
+        try:
+            shm.buf[:len(pdf_content)] = pdf_content
+            try:
+                return self._run_ranges(shm.name, len(pdf_content), bounds)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); retry once on a fresh pool,
+                # never in-process where a stuck page could not be interrupted
+                self._reset_pool()
+                try:
+                    return self._run_ranges(shm.name, len(pdf_content), bounds)
+                except BrokenProcessPool:
+                    self._reset_pool()
+                    raise ValueError("PDF extraction crashed its worker process")
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def _run_ranges(self, shm_name: str, size: int, bounds: List[int]) -> List[str]:
+        pool = self._get_pool()
+        futures = [
+            pool.submit(_extract_shared_range, shm_name, size, start, end, self.page_timeout)
+            for start, end in zip(bounds, bounds[1:])
+        ]
+        try:
+            texts = []
+            for future in futures:
+                texts.extend(future.result())
+            return texts
+        finally:
+            # Nothing may still be reading the shared memory once it is unlinked
+            for future in futures:
+                future.cancel()
+            for future in futures:
+                if not future.cancelled():
+                    future.exception()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # Forking a threaded server can copy held locks into the child
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=get_context("forkserver"))
+            return self._pool
+
+    def _reset_pool(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
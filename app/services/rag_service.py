@@ -1,37 +1,342 @@
-from typing import List
+import contextvars
+import hashlib
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from app.core.metrics import stage
 from app.services.semantic_search import SemanticSearchEngine
 from app.services.document_processor import DocumentProcessor
-from app.services.llm_service import LLMService
+from app.services.llm_service import LLMService, ERROR_PREFIX, is_error_answer
+from app.services.extractive_answer import extractive_answer
+from app.services.local_answer import local_answer
+from app.services.answer_cache import AnswerCache
+from app.services.context_builder import ContextBuilder
+from app.services.index_cache import IndexCache, make_alias_key, normalize_url
+from app.services.index_snapshot import load_snapshot, save_snapshot
+from app.services.single_flight import SingleFlight
+from app.services.ingestion import DocumentIngestionService
+from app.services.request_executor import DeadlineExceededError
 from app.schemas.models import HackRXRequest, HackRXResponse
 
+def _ignore_stage(stage: str):
+    pass
+
 class RAGService:
-    def __init__(self, groq_api_key: str):
-        self.search_engine = SemanticSearchEngine()
-        self.document_processor = DocumentProcessor()
-        self.llm_service = LLMService(groq_api_key)
-        self.is_initialized = False
-    
-    def process_hackrx_request(self, request: HackRXRequest) -> HackRXResponse:
+    def __init__(self, groq_api_key: str, index_cache_max_bytes: int = 256 * 1024 * 1024,
+                 max_concurrency: int = 8, document_processor: Optional[DocumentProcessor] = None,
+                 snapshot_dir: Optional[str] = None, search_backend: str = "tfidf",
+                 answer_cache: Optional[AnswerCache] = None,
+                 context_builder: Optional[ContextBuilder] = None,
+                 llm_service: Optional[LLMService] = None,
+                 ingest_workers: int = 2, ingest_queue_size: int = 32,
+                 answer_deadline: Optional[float] = None,
+                 local_answer_threshold: Optional[float] = None):
+        self.document_processor = document_processor or DocumentProcessor()
+        self.llm_service = llm_service or LLMService(groq_api_key, context_builder=context_builder)
+        self.index_cache = IndexCache(max_bytes=index_cache_max_bytes)
+        self.snapshot_dir = snapshot_dir
+        self.search_backend = search_backend
+        self.answer_cache = answer_cache
+        # Default latency budget per request; answers still missing then are extracted instead
+        self.answer_deadline = answer_deadline
+        # Routine questions read off the retrieved clauses at or above this confidence skip the LLM
+        self.local_answer_threshold = local_answer_threshold
+        self._tier_lock = threading.Lock()
+        self._tier_counts = {"cached": 0, "local": 0, "llm": 0, "degraded": 0}
+        # Concurrent requests for the same document share one download + index build
+        self.ingest_flight = SingleFlight()
+        # Kept apart so the URL-level counters above count each ingestion once
+        self.build_flight = SingleFlight()
+        # Background pre-ingestion, so queries on a known document skip the build
+        self.ingestion = DocumentIngestionService(
+            self.resolve_document, max_workers=ingest_workers, max_pending=ingest_queue_size
+        )
+        # Per-request prompt token accounting for the most recent requests
+        self.recent_usage = deque(maxlen=100)
+        # Shared across requests so the cap bounds total in-flight LLM calls
+        self.answer_executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="rag-answer"
+        )
+
+    def get_search_engine(self, document_url: str) -> SemanticSearchEngine:
+        """Return an indexed search engine for the document, ingesting it only on a cache miss"""
+        return self.resolve_document(document_url)[1]
+
+    def resolve_document(self, document_url: str,
+                         on_stage: Optional[Callable[[str], None]] = None) -> Tuple[str, SemanticSearchEngine]:
+        """Return the document's content fingerprint and its indexed search engine.
+
+        `on_stage` is told when the download, extraction and indexing stages start.
+        """
+        return self.ingest_flight.do(f"url:{normalize_url(document_url)}", self._resolve_document,
+                                     document_url, on_stage or _ignore_stage)
+
+    def resolve_request_document(self, request: HackRXRequest, deadline: Optional[float] = None,
+                                 cancel: Optional[threading.Event] = None) -> Tuple[str, SemanticSearchEngine]:
+        """Resolve a request's document, by pre-ingested document id or by URL.
+
+        Waiting for a pre-ingested document still in progress gives up with
+        DeadlineExceededError at `deadline` (a time.monotonic() value) or once
+        `cancel` is set.
+        """
+        if request.document_id is None:
+            return self.resolve_document(request.documents)
+        while True:
+            timeout = 0.25 if deadline is None else max(0.0, min(0.25, deadline - time.monotonic()))
+            try:
+                job = self.ingestion.wait(request.document_id, timeout)
+                break
+            except FutureTimeoutError:
+                if ((cancel is not None and cancel.is_set())
+                        or (deadline is not None and time.monotonic() >= deadline)):
+                    raise DeadlineExceededError(
+                        f"Document {request.document_id} was still being ingested at the deadline"
+                    )
+        engine = self.index_cache.get(job.fingerprint)
+        if engine is not None:
+            return job.fingerprint, engine
+        # Evicted since it was ingested; the URL still leads back to it
+        return self.resolve_document(job.url)
+
+    def _resolve_document(self, document_url: str,
+                          on_stage: Callable[[str], None]) -> Tuple[str, SemanticSearchEngine]:
+        on_stage("downloading")
+
+        # Unchanged documents come back as a 304 and resolve through their URL + validators
+        result = self.document_processor.fetch_document(document_url)
+        alias = make_alias_key(document_url, result.validators)
+        fingerprint = self.index_cache.resolve_alias(alias) if alias else None
+        if fingerprint is not None:
+            engine = self.index_cache.get(fingerprint)
+            if engine is not None:
+                return fingerprint, engine
+
+        if result.not_modified:
+            # The index was evicted since the last download, so the body is needed again
+            result = self.document_processor.fetch_document(document_url, conditional=False)
+            alias = make_alias_key(document_url, result.validators)
+
+        # Fall back to the content hash, which also catches the same PDF under another URL
+        pdf_content = result.content
+        fingerprint = hashlib.sha256(pdf_content).hexdigest()
+        engine = self.index_cache.get(fingerprint)
+        if engine is not None:
+            if alias:
+                self.index_cache.add_alias(alias, fingerprint)
+            return fingerprint, engine
+
+        # The same bytes may be arriving under another URL right now
+        engine = self.build_flight.do(f"sha256:{fingerprint}", self._build_engine,
+                                       fingerprint, pdf_content, on_stage)
+        self.index_cache.put(fingerprint, engine, alias=alias)
+        return fingerprint, engine
+
+    def _build_engine(self, fingerprint: str, pdf_content: bytes,
+                      on_stage: Callable[[str], None]) -> SemanticSearchEngine:
+        # Another worker or an earlier run may already have snapshotted this document
+        engine = self._load_snapshot(fingerprint)
+        if engine is None:
+            on_stage("extracting")
+            chunk_store = self.document_processor.process_pdf_chunks(pdf_content)
+            on_stage("indexing")
+            engine = SemanticSearchEngine(backend=self.search_backend)
+            engine.index_chunks(chunk_store)
+            self._save_snapshot(fingerprint, engine)
+        return engine
+
+    def _snapshot_path(self, fingerprint: str) -> str:
+        return os.path.join(self.snapshot_dir, self.search_backend, fingerprint)
+
+    def _load_snapshot(self, fingerprint: str) -> Optional[SemanticSearchEngine]:
+        if not self.snapshot_dir:
+            return None
+        try:
+            with stage("snapshot_load"):
+                return load_snapshot(self._snapshot_path(fingerprint))
+        except (OSError, ValueError):
+            return None
+
+    def _save_snapshot(self, fingerprint: str, engine: SemanticSearchEngine):
+        if not self.snapshot_dir:
+            return
+        try:
+            with stage("snapshot_save"):
+                save_snapshot(engine, self._snapshot_path(fingerprint))
+        except OSError:
+            # A missing snapshot only costs a rebuild later; never fail the request for it
+            pass
+
+    def process_hackrx_request(self, request: HackRXRequest,
+                               cancel: Optional[threading.Event] = None) -> HackRXResponse:
         """Main function to process HackRX API request"""
-        
-        # Step 1: Download and process document
-        if not self.is_initialized:
-            pdf_content = self.document_processor.download_document(request.documents)
-            text_chunks, metadata = self.document_processor.process_pdf_content(pdf_content)
-            
-            # Step 2: Index documents for semantic search
-            self.search_engine.process_documents(text_chunks, metadata)
-            self.is_initialized = True
-        
-        # Step 3: Process each question
-        answers = []
-        for question in request.questions:
-            # Find relevant clauses
-            relevant_clauses = self.search_engine.semantic_search(question, top_k=5)
-            
-            # Generate answer using LLM
-            answer = self.llm_service.answer_question(question, relevant_clauses)
-            answers.append(answer)
-        
-        return HackRXResponse(answers=answers)
+        answers: List[Optional[str]] = [None] * len(request.questions)
+        degraded: List[int] = []
+        for event in self.iter_hackrx_events(request, cancel):
+            if event["event"] == "answer":
+                answers[event["index"]] = event["answer"]
+                if event.get("degraded"):
+                    degraded.append(event["index"])
+        return HackRXResponse(answers=answers, degraded=sorted(degraded))
+
+    def iter_hackrx_events(self, request: HackRXRequest,
+                           cancel: Optional[threading.Event] = None) -> Iterator[Dict[str, Any]]:
+        """Yield progress events, then each answer as soon as it is ready, then a summary.
+
+        Setting `cancel` (or closing the generator) drops answers still queued
+        for the LLM; calls already in flight finish but are discarded. Questions
+        the LLM has not answered when the latency budget runs out get an
+        extractive answer from their retrieved clauses, marked `degraded`.
+        """
+        started = time.perf_counter()
+        budget = request.latency_budget_seconds or self.answer_deadline
+        deadline = time.monotonic() + budget if budget else None
+
+        # Step 1: Resolve the indexed document (download + index only on a cache miss)
+        yield {"event": "progress", "stage": "resolving_document"}
+        with stage("resolve_document"):
+            fingerprint, search_engine = self.resolve_request_document(request, deadline, cancel)
+        yield {"event": "progress", "stage": "document_ready",
+               "elapsed": round(time.perf_counter() - started, 3)}
+
+        # Step 2: Serve repeated questions from the answer cache
+        pending = []
+        with stage("answer_cache"):
+            cached = [self._cached_answer(fingerprint, question) for question in request.questions]
+        for i, answer in enumerate(cached):
+            if answer is None:
+                pending.append(i)
+            else:
+                yield {"event": "answer", "index": i, "answer": answer, "cached": True}
+        questions = [request.questions[i] for i in pending]
+
+        request_usage = {"questions": len(request.questions), "llm_calls": 0, "batched_calls": 0,
+                         "prompt_tokens": 0, "context_tokens": 0, "raw_context_tokens": 0}
+        degraded = 0
+        local = 0
+        if questions:
+            # Step 3: Retrieve clauses for every remaining question in one batched search
+            clause_lists = search_engine.semantic_search_batch(questions, top_k=5)
+            yield {"event": "progress", "stage": "retrieved", "pending": len(questions)}
+
+            # Step 4: Routine questions whose answer can be read confidently off
+            # the retrieved clauses are answered here, without the LLM
+            remote = list(range(len(questions)))
+            if self.local_answer_threshold is not None:
+                with stage("local_answer"):
+                    local_results = [local_answer(question, clauses)
+                                     for question, clauses in zip(questions, clause_lists)]
+                remote = []
+                for j, result in enumerate(local_results):
+                    if result is not None and result[1] >= self.local_answer_threshold:
+                        local += 1
+                        yield {"event": "answer", "index": pending[j], "answer": result[0], "cached": False,
+                               "local": True, "confidence": round(result[1], 3)}
+                    else:
+                        remote.append(j)
+
+            # Step 5: Answer the rest concurrently; in batch mode questions sharing
+            # retrieved clauses go out together as one prompt
+            groups = [[remote[k] for k in group]
+                      for group in self.llm_service.group_questions([clause_lists[j] for j in remote])]
+            if deadline is not None and time.monotonic() >= deadline:
+                # The budget went on resolving the document; don't start calls that can't finish
+                groups, late = [], groups
+            else:
+                late = []
+            futures = {}
+
+            def submit(group: List[int]):
+                # Submitted in a copy of this context so stage timings reach the request;
+                # questions a batched reply leaves out come back as None to be resubmitted
+                future = self.answer_executor.submit(
+                    contextvars.copy_context().run, self.llm_service.answer_group,
+                    [questions[j] for j in group], [clause_lists[j] for j in group], deadline, False
+                )
+                futures[future] = group
+                return future
+
+            not_done = {submit(group) for group in groups}
+            try:
+                while not_done:
+                    if cancel is not None and cancel.is_set():
+                        return
+                    timeout = 0.25 if deadline is None else max(0.0, min(0.25, deadline - time.monotonic()))
+                    done, not_done = wait(not_done, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        group = futures[future]
+                        # A failed group gets its own error answers without affecting the rest
+                        try:
+                            results = future.result()
+                            if len(group) > 1:
+                                request_usage["batched_calls"] += 1
+                        except DeadlineExceededError:
+                            # Cut off by the budget rather than failing outright
+                            late.append(group)
+                            continue
+                        except Exception as e:
+                            results = [(f"{ERROR_PREFIX}{str(e)}", {})] * len(group)
+                        for j, (answer, usage) in zip(group, results):
+                            request_usage["llm_calls"] += usage.get("llm_calls", 0)
+                            for key in ("prompt_tokens", "context_tokens", "raw_context_tokens"):
+                                request_usage[key] += usage.get(key, 0)
+                            if answer is None:
+                                # Ask it on its own, concurrently with the other fallbacks
+                                not_done.add(submit([j]))
+                                continue
+                            self._store_answer(fingerprint, questions[j], answer)
+                            yield {"event": "answer", "index": pending[j], "answer": answer, "cached": False}
+                    if not_done and deadline is not None and time.monotonic() >= deadline:
+                        # Out of budget: queued calls are dropped, and calls on the wire
+                        # time out on their own since they were given the same deadline
+                        for future in not_done:
+                            future.cancel()
+                            late.append(futures[future])
+                        not_done = set()
+            finally:
+                for future in not_done:
+                    future.cancel()
+
+            with stage("extractive_answer"):
+                extracted = [(j, extractive_answer(questions[j], clause_lists[j])) for group in late for j in group]
+            for j, answer in extracted:
+                # Degraded answers are never cached, so the next request tries the LLM again
+                degraded += 1
+                yield {"event": "answer", "index": pending[j], "answer": answer, "cached": False, "degraded": True}
+
+        request_usage["local_answers"] = local
+        self.recent_usage.append(request_usage)
+        with self._tier_lock:
+            self._tier_counts["cached"] += len(request.questions) - len(questions)
+            self._tier_counts["local"] += local
+            self._tier_counts["degraded"] += degraded
+            self._tier_counts["llm"] += len(questions) - local - degraded
+        yield {"event": "summary", "answered": len(request.questions),
+               "cached": len(request.questions) - len(questions), "local": local, "degraded": degraded,
+               "elapsed": round(time.perf_counter() - started, 3), "usage": request_usage}
+
+    def answer_tier_stats(self) -> Dict[str, float]:
+        """How answered questions split between the cache, local patterns, the LLM and the deadline fallback"""
+        with self._tier_lock:
+            stats: Dict[str, float] = dict(self._tier_counts)
+        total = sum(stats.values())
+        stats["local_share"] = round(stats["local"] / total, 4) if total else 0.0
+        return stats
+
+    def _cached_answer(self, fingerprint: str, question: str) -> Optional[str]:
+        if self.answer_cache is None:
+            return None
+        return self.answer_cache.get(
+            fingerprint, question, self.llm_service.model, self.llm_service.cache_version
+        )
 
+    def _store_answer(self, fingerprint: str, question: str, answer: str):
+        # Errors are transient and must be retried, never cached
+        if self.answer_cache is None or is_error_answer(answer):
+            return
+        self.answer_cache.put(
+            fingerprint, question, self.llm_service.model, self.llm_service.cache_version, answer
+        )
@@ -0,0 +1,149 @@
+import asyncio
+import contextvars
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+class OverloadedError(Exception):
+    """The service cannot take the request now; retry after `retry_after` seconds"""
+
+    def __init__(self, retry_after: int, status_code: int = 429):
+        super().__init__(f"Service overloaded, retry after {retry_after}s")
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+class DeadlineExceededError(Exception):
+    """The request ran past its deadline"""
+
+class Admission:
+    """An admission slot: freed once its holder is done and no pool work it started is still running"""
+
+    def __init__(self):
+        self.admitted_at = time.perf_counter()
+        self.busy = 0
+        self.closed = False
+        self.released = False
+
+class RequestExecutor:
+    """Bounded thread pool for blocking request work, with admission control.
+
+    At most `max_workers` requests run at once and at most `max_queue` more
+    wait for a worker; anything beyond that is rejected straight away with
+    an OverloadedError instead of piling up behind a slow backlog. Keeping
+    the blocking work here leaves the event loop free for cheap endpoints.
+    A slot stays taken until work run under it has really finished, even
+    when the caller stopped waiting for it after a timeout.
+    """
+
+    def __init__(self, max_workers: int = 8, max_queue: int = 16):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rag-request")
+        self._lock = threading.Lock()
+        self.active = 0
+        self.running = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        # Moving average of admitted request latency, for Retry-After estimates
+        self._avg_latency = 1.0
+
+    def acquire(self) -> Admission:
+        """Take an admission slot or raise OverloadedError"""
+        with self._lock:
+            if self.active >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise OverloadedError(self._retry_after_locked(), status_code=429)
+            self.active += 1
+            self.admitted += 1
+        return Admission()
+
+    def release(self, admission: Admission):
+        """Give the slot back, or once the work still running under it finishes"""
+        with self._lock:
+            admission.closed = True
+            self._free_locked(admission)
+
+    def _free_locked(self, admission: Admission):
+        if admission.closed and admission.busy == 0 and not admission.released:
+            admission.released = True
+            self.active -= 1
+            elapsed = time.perf_counter() - admission.admitted_at
+            self._avg_latency = 0.8 * self._avg_latency + 0.2 * elapsed
+
+    def _finish(self, admission: Admission):
+        with self._lock:
+            admission.busy -= 1
+            self._free_locked(admission)
+
+    @contextmanager
+    def admit(self):
+        """Hold an admission slot for the duration of the block"""
+        admission = self.acquire()
+        try:
+            yield admission
+        finally:
+            self.release(admission)
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None,
+                  cancel: Optional[threading.Event] = None, admission: Optional[Admission] = None) -> Any:
+        """Run `fn(*args)` on the pool, giving up after `timeout` seconds.
+
+        A call that never got a worker raises OverloadedError (503); one that
+        started but did not finish raises DeadlineExceededError. Either way
+        `cancel` is set so cooperative work can stop early, and `admission`
+        stays held until the pool has actually finished the call.
+        """
+        started = threading.Event()
+
+        def task():
+            started.set()
+            with self._lock:
+                self.running += 1
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self.running -= 1
+
+        # The pool doesn't carry context over; copy it so request-scoped state follows
+        context = contextvars.copy_context()
+        if admission is not None:
+            with self._lock:
+                admission.busy += 1
+        pool_future = self._pool.submit(context.run, task)
+        if admission is not None:
+            # Runs when the call finishes or is cancelled before it starts, not when we stop waiting
+            pool_future.add_done_callback(lambda _: self._finish(admission))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(pool_future), timeout)
+        except asyncio.TimeoutError:
+            if cancel is not None:
+                cancel.set()
+            with self._lock:
+                self.timed_out += 1
+                retry_after = self._retry_after_locked()
+            if not started.is_set():
+                raise OverloadedError(retry_after, status_code=503)
+            raise DeadlineExceededError(f"Request exceeded its {timeout:.1f}s deadline")
+
+    def _retry_after_locked(self) -> int:
+        # Time for the current backlog to drain through the workers
+        backlog = max(1, self.active - self.max_workers + 1)
+        return max(1, math.ceil(self._avg_latency * backlog / self.max_workers))
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "active": self.active,
+                "running": self.running,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "avg_latency": round(self._avg_latency, 3),
+            }
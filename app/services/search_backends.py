@@ -0,0 +1,434 @@
+import os
+import re
+from collections import Counter
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+TopK = Tuple[np.ndarray, np.ndarray]
+
+def select_top_k(indices: np.ndarray, values: np.ndarray, k: int, n_docs: int,
+                 allowed: Optional[np.ndarray] = None) -> TopK:
+    """Pick the k best (index, score) pairs from one sparse score row"""
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    mask = indices < n_docs
+    indices, values = indices[mask], values[mask]
+    if allowed is not None:
+        mask = allowed[indices]
+        indices, values = indices[mask], values[mask]
+    if len(values) > k:
+        # Keep every value tied with the k-th, so the tie rule below decides the cut
+        keep = values >= np.partition(values, -k)[-k]
+        indices, values = indices[keep], values[keep]
+    # Score descending, ties towards the higher index as a reversed argsort would
+    order = np.lexsort((-indices, -values))[:k]
+    indices, values = indices[order], values[order]
+
+    if len(indices) < k:
+        # Pad with zero-score chunks, highest index first
+        nonzero = set(indices.tolist())
+        padding = list(islice(
+            (i for i in range(n_docs - 1, -1, -1)
+             if i not in nonzero and (allowed is None or allowed[i])),
+            k - len(indices)
+        ))
+        indices = np.concatenate([indices, np.asarray(padding, dtype=indices.dtype)])
+        values = np.concatenate([values, np.zeros(len(padding))])
+    return indices, values
+
+class CorpusStats:
+    """Term statistics of a whole index, shared by its segments at query time.
+
+    Each segment is fitted on its own chunks only; scoring every segment with
+    these corpus-wide counts (chunks, total tokens, chunks per term) keeps
+    their scores comparable, as if the corpus had been fitted at once.
+    """
+
+    def __init__(self, n_docs: int = 0, total_length: float = 0.0,
+                 doc_freqs: Optional[Dict[str, int]] = None):
+        self.n_docs = n_docs
+        self.total_length = total_length
+        self.doc_freqs = doc_freqs if doc_freqs is not None else {}
+
+    @classmethod
+    def combine(cls, parts: Iterable["CorpusStats"]) -> "CorpusStats":
+        combined = cls(doc_freqs=Counter())
+        for part in parts:
+            combined.n_docs += part.n_docs
+            combined.total_length += part.total_length
+            combined.doc_freqs.update(part.doc_freqs)
+        return combined
+
+class SearchBackend:
+    """Scoring backend behind SemanticSearchEngine.
+
+    A backend is fitted once over the chunk texts and then returns, per query,
+    the indices and scores of the top k chunks. An optional boolean `allowed`
+    mask restricts which chunks may be scored and returned, and optional
+    CorpusStats replace the backend's own term statistics in the scores.
+    """
+
+    name = ""
+
+    def fit(self, texts: Iterable[str]):
+        raise NotImplementedError
+
+    def top_k_batch(self, queries: List[str], k: int, n_docs: int,
+                    allowed: Optional[np.ndarray] = None, stats: Optional[CorpusStats] = None) -> List[TopK]:
+        raise NotImplementedError
+
+    def term_stats(self) -> CorpusStats:
+        """This backend's own term statistics, to be combined across segments"""
+        raise NotImplementedError
+
+    @property
+    def is_fitted(self) -> bool:
+        raise NotImplementedError
+
+    def memory_footprint(self) -> int:
+        raise NotImplementedError
+
+    def save(self, path: str) -> Dict:
+        """Write arrays into `path` and return the JSON-serializable header"""
+        raise NotImplementedError
+
+    @classmethod
+    def load(cls, path: str, header: Dict, load_array: Callable[[str], np.ndarray]) -> "SearchBackend":
+        raise NotImplementedError
+
+class TfidfBackend(SearchBackend):
+    """sklearn TF-IDF vectors scored with one sparse product per batch"""
+
+    name = "tfidf"
+
+    def __init__(self):
+        # Imported here so deployments on other backends never load sklearn
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        self.vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
+        self.document_vectors = None
+        self.is_mapped = False
+        self._term_stats: Optional[CorpusStats] = None
+        # Document vectors reweighted for the last CorpusStats seen: (stats, vectors)
+        self._reweighted = None
+
+    @property
+    def is_fitted(self) -> bool:
+        return self.document_vectors is not None
+
+    def fit(self, texts: Iterable[str]):
+        self.document_vectors = self.vectorizer.fit_transform(texts)
+
+    def top_k_batch(self, queries: List[str], k: int, n_docs: int,
+                    allowed: Optional[np.ndarray] = None, stats: Optional[CorpusStats] = None) -> List[TopK]:
+        # TfidfVectorizer L2-normalizes rows, so the dot product is the cosine similarity.
+        # The product stays sparse: work per query is proportional to its nonzero scores.
+        if stats is None:
+            vectors, query_vectors = self.document_vectors, self.vectorizer.transform(queries)
+        else:
+            vectors, query_vectors = self._reweight(stats), self._query_vectors(queries, stats)
+        rows = None
+        if allowed is not None:
+            # Only score the allowed rows, then map hits back to chunk indices
+            rows = np.flatnonzero(allowed[:vectors.shape[0]])
+            vectors = vectors[rows]
+        scores = (query_vectors @ vectors.T).tocsr()
+
+        results = []
+        for row in range(scores.shape[0]):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            indices = scores.indices[start:end]
+            if rows is not None:
+                indices = rows[indices]
+            results.append(select_top_k(indices, scores.data[start:end], k, n_docs, allowed))
+        return results
+
+    def term_stats(self) -> CorpusStats:
+        if self._term_stats is None:
+            doc_freqs = np.bincount(self.document_vectors.tocsr().indices,
+                                    minlength=len(self.vectorizer.vocabulary_))
+            self._term_stats = CorpusStats(self.document_vectors.shape[0], 0.0, {
+                term: int(doc_freqs[i]) for term, i in self.vectorizer.vocabulary_.items()
+            })
+        return self._term_stats
+
+    def _global_idf(self, terms: Iterable[str], stats: CorpusStats) -> np.ndarray:
+        # sklearn's smoothed idf, over the whole corpus
+        doc_freqs = np.fromiter((stats.doc_freqs.get(term, 0) for term in terms), dtype=np.float64)
+        return np.log((1 + stats.n_docs) / (1 + doc_freqs)) + 1
+
+    def _reweight(self, stats: CorpusStats):
+        """Document vectors with the corpus idf in place of this segment's own"""
+        from scipy.sparse import diags
+        from sklearn.preprocessing import normalize
+
+        cached = self._reweighted
+        if cached is not None and cached[0] is stats:
+            return cached[1]
+        terms = sorted(self.vectorizer.vocabulary_, key=self.vectorizer.vocabulary_.get)
+        # Rows are tf * local idf, normalized; rescaling columns and renormalizing swaps the idf
+        ratio = self._global_idf(terms, stats) / self.vectorizer.idf_
+        vectors = normalize(self.document_vectors @ diags(ratio), copy=False).tocsr()
+        self._reweighted = (stats, vectors)
+        return vectors
+
+    def _query_vectors(self, queries: List[str], stats: CorpusStats):
+        """Query vectors weighted and normalized over the whole corpus vocabulary"""
+        from scipy.sparse import csr_matrix
+
+        analyzer = self.vectorizer.build_analyzer()
+        vocabulary = self.vectorizer.vocabulary_
+        rows, cols, values = [], [], []
+        for row, query in enumerate(queries):
+            counts = Counter(term for term in analyzer(query) if term in stats.doc_freqs)
+            if not counts:
+                continue
+            weights = np.fromiter(counts.values(), dtype=np.float64) * self._global_idf(counts, stats)
+            weights /= np.linalg.norm(weights)
+            for term, weight in zip(counts, weights):
+                if term in vocabulary:
+                    rows.append(row)
+                    cols.append(vocabulary[term])
+                    values.append(weight)
+        return csr_matrix((values, (rows, cols)), shape=(len(queries), len(vocabulary)))
+
+    def memory_footprint(self) -> int:
+        total = 0
+        # Snapshot-loaded vectors are memory-mapped and shared between workers
+        if self.document_vectors is not None and not self.is_mapped:
+            vectors = self.document_vectors
+            total += vectors.data.nbytes + vectors.indices.nbytes + vectors.indptr.nbytes
+        if self._reweighted is not None:
+            vectors = self._reweighted[1]
+            total += vectors.data.nbytes + vectors.indices.nbytes + vectors.indptr.nbytes
+        vocabulary = getattr(self.vectorizer, 'vocabulary_', None) or {}
+        total += sum(len(term) + 100 for term in vocabulary)
+        return total
+
+    def save(self, path: str) -> Dict:
+        vectors = self.document_vectors.tocsr()
+        np.save(os.path.join(path, 'data.npy'), vectors.data)
+        np.save(os.path.join(path, 'indices.npy'), vectors.indices)
+        np.save(os.path.join(path, 'indptr.npy'), vectors.indptr)
+        np.save(os.path.join(path, 'idf.npy'), self.vectorizer.idf_)
+        return {
+            'shape': list(vectors.shape),
+            'vocabulary': {term: int(i) for term, i in self.vectorizer.vocabulary_.items()},
+            'vectorizer_params': {
+                'max_features': self.vectorizer.max_features,
+                'stop_words': self.vectorizer.stop_words
+            }
+        }
+
+    @classmethod
+    def load(cls, path: str, header: Dict, load_array: Callable[[str], np.ndarray]) -> "TfidfBackend":
+        from scipy.sparse import csr_matrix
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        backend = cls()
+        backend.is_mapped = True
+        backend.vectorizer = TfidfVectorizer(vocabulary=header['vocabulary'], **header['vectorizer_params'])
+        backend.vectorizer.idf_ = np.asarray(load_array('idf.npy'))
+        backend.document_vectors = csr_matrix(
+            (load_array('data.npy'), load_array('indices.npy'), load_array('indptr.npy')),
+            shape=tuple(header['shape']),
+            copy=False
+        )
+        return backend
+
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+STOP_WORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before
+being below between both but by can could did do does doing down during each either else
+etc ever every few for from further had has have having he her here hers herself him
+himself his how however i if in into is it its itself just may me might more most must my
+myself neither no nor not of off on once only or other otherwise our ours ourselves out
+over own per same shall she should so some such than that the their theirs them
+themselves then there these they this those through thus to too under until up upon us
+very was we were what when where whether which while who whom whose why will with within
+without would yet you your yours yourself yourselves
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOP_WORDS]
+
+class BM25Backend(SearchBackend):
+    """Okapi BM25 over an array-backed inverted index with max-score pruning.
+
+    Posting lists are stored term-major in flat arrays (int32 chunk ids,
+    float32 precomputed BM25 impacts and raw term frequencies) addressed by
+    per-term offsets, so the whole index is a handful of numpy arrays with no
+    vocabulary cap. Impacts use this backend's own statistics; given
+    corpus-wide CorpusStats they are recomputed from the frequencies instead.
+    """
+
+    name = "bm25"
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary: Dict[str, int] = {}
+        self.term_offsets = np.zeros(1, dtype=np.int64)
+        self.postings_docs = np.empty(0, dtype=np.int32)
+        self.postings_weights = np.empty(0, dtype=np.float32)
+        self.postings_tfs = np.empty(0, dtype=np.float32)
+        self.doc_lengths = np.empty(0, dtype=np.float32)
+        self.term_max_weights = np.empty(0, dtype=np.float32)
+        self.n_docs = 0
+        self.is_mapped = False
+        self._fitted = False
+        self._term_stats: Optional[CorpusStats] = None
+
+    @property
+    def is_fitted(self) -> bool:
+        return self._fitted
+
+    def fit(self, texts: Iterable[str]):
+        doc_term_counts = []
+        doc_lengths = []
+        for text in texts:
+            counts = Counter(self.vocabulary.setdefault(t, len(self.vocabulary)) for t in tokenize(text))
+            doc_term_counts.append(counts)
+            doc_lengths.append(sum(counts.values()))
+
+        self.n_docs = len(doc_term_counts)
+        n_terms = len(self.vocabulary)
+        avg_length = (sum(doc_lengths) / self.n_docs) if self.n_docs else 0.0
+
+        # Flatten to (term, doc, tf) triples and sort term-major to form posting lists
+        terms = np.fromiter((t for counts in doc_term_counts for t in counts), dtype=np.int32)
+        docs = np.repeat(np.arange(self.n_docs, dtype=np.int32),
+                         [len(counts) for counts in doc_term_counts])
+        tfs = np.fromiter((tf for counts in doc_term_counts for tf in counts.values()), dtype=np.float32)
+        order = np.argsort(terms, kind='stable')
+        terms, docs, tfs = terms[order], docs[order], tfs[order]
+
+        doc_freqs = np.bincount(terms, minlength=n_terms)
+        self.term_offsets = np.concatenate([[0], np.cumsum(doc_freqs)]).astype(np.int64)
+
+        idf = np.log1p((self.n_docs - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(np.float32)
+        lengths = np.asarray(doc_lengths, dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * lengths[docs] / avg_length) if avg_length else self.k1
+        self.postings_docs = docs
+        self.postings_weights = (idf[terms] * tfs * (self.k1 + 1) / (tfs + norm)).astype(np.float32)
+        self.postings_tfs = tfs
+        self.doc_lengths = lengths
+
+        self.term_max_weights = np.zeros(n_terms, dtype=np.float32)
+        if len(terms):
+            np.maximum.at(self.term_max_weights, terms, self.postings_weights)
+        self._fitted = True
+
+    def top_k_batch(self, queries: List[str], k: int, n_docs: int,
+                    allowed: Optional[np.ndarray] = None, stats: Optional[CorpusStats] = None) -> List[TopK]:
+        return [self._top_k(query, k, n_docs, allowed, stats) for query in queries]
+
+    def term_stats(self) -> CorpusStats:
+        if self._term_stats is None:
+            doc_freqs = np.diff(self.term_offsets)
+            self._term_stats = CorpusStats(self.n_docs, float(self.doc_lengths.sum()), {
+                term: int(doc_freqs[i]) for term, i in self.vocabulary.items()
+            })
+        return self._term_stats
+
+    def _postings(self, term: str, stats: Optional[CorpusStats]) -> Tuple[np.ndarray, np.ndarray, float]:
+        """A term's chunk ids, impacts and largest impact"""
+        term_id = self.vocabulary[term]
+        start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+        docs = self.postings_docs[start:end]
+        if stats is None:
+            return docs, self.postings_weights[start:end], float(self.term_max_weights[term_id])
+
+        doc_freq = stats.doc_freqs.get(term, 0)
+        idf = np.float32(np.log1p((stats.n_docs - doc_freq + 0.5) / (doc_freq + 0.5)))
+        avg_length = stats.total_length / stats.n_docs if stats.n_docs else 0.0
+        tfs = self.postings_tfs[start:end]
+        norm = (self.k1 * (1 - self.b + self.b * self.doc_lengths[docs] / np.float32(avg_length))
+                if avg_length else self.k1)
+        weights = (idf * tfs * (self.k1 + 1) / (tfs + norm)).astype(np.float32)
+        return docs, weights, float(weights.max()) if len(weights) else 0.0
+
+    def _top_k(self, query: str, k: int, n_docs: int, allowed: Optional[np.ndarray] = None,
+               stats: Optional[CorpusStats] = None) -> TopK:
+        query_terms = Counter(t for t in tokenize(query) if t in self.vocabulary)
+        if not query_terms or k <= 0:
+            return select_top_k(np.empty(0, dtype=np.int64), np.empty(0), k, n_docs, allowed)
+
+        # Term-at-a-time in decreasing max impact. Once the upper bound of the unprocessed
+        # terms can't lift a chunk past the current k-th score, only surviving candidates
+        # are accumulated (max-score pruning); results are the same as exhaustive scoring.
+        postings = {term: self._postings(term, stats) for term in query_terms}
+        terms = sorted(query_terms, key=lambda t: -postings[t][2])
+        remaining = float(sum(postings[t][2] * query_terms[t] for t in terms))
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        candidates = None
+
+        for term in terms:
+            docs, weights, max_weight = postings[term]
+            # Clamped so float drift can't push the current top k below their own threshold
+            remaining = max(0.0, remaining - max_weight * query_terms[term])
+            weights = weights * query_terms[term]
+            if allowed is not None:
+                # Filtered before accumulating so the pruning threshold only sees allowed chunks
+                keep = allowed[docs]
+                docs, weights = docs[keep], weights[keep]
+
+            if candidates is None:
+                scores[docs] += weights
+                touched = np.flatnonzero(scores)
+                if len(touched) >= k:
+                    threshold = np.partition(scores[touched], -k)[-k]
+                    if remaining < threshold:
+                        candidates = touched[scores[touched] + remaining >= threshold]
+            else:
+                keep = np.isin(docs, candidates, assume_unique=True)
+                scores[docs[keep]] += weights[keep]
+                threshold = np.partition(scores[candidates], -k)[-k]
+                candidates = candidates[scores[candidates] + remaining >= threshold]
+
+        hits = candidates if candidates is not None else np.flatnonzero(scores)
+        return select_top_k(hits.astype(np.int64), scores[hits].astype(np.float64), k, n_docs, allowed)
+
+    def memory_footprint(self) -> int:
+        total = sum(len(term) + 100 for term in self.vocabulary)
+        if not self.is_mapped:
+            total += (self.term_offsets.nbytes + self.postings_docs.nbytes + self.postings_weights.nbytes
+                      + self.postings_tfs.nbytes + self.doc_lengths.nbytes + self.term_max_weights.nbytes)
+        return total
+
+    def save(self, path: str) -> Dict:
+        np.save(os.path.join(path, 'term_offsets.npy'), self.term_offsets)
+        np.save(os.path.join(path, 'postings_docs.npy'), self.postings_docs)
+        np.save(os.path.join(path, 'postings_weights.npy'), self.postings_weights)
+        np.save(os.path.join(path, 'postings_tfs.npy'), self.postings_tfs)
+        np.save(os.path.join(path, 'doc_lengths.npy'), self.doc_lengths)
+        np.save(os.path.join(path, 'term_max_weights.npy'), self.term_max_weights)
+        return {'k1': self.k1, 'b': self.b, 'n_docs': self.n_docs, 'vocabulary': self.vocabulary}
+
+    @classmethod
+    def load(cls, path: str, header: Dict, load_array: Callable[[str], np.ndarray]) -> "BM25Backend":
+        backend = cls(k1=header['k1'], b=header['b'])
+        backend.is_mapped = True
+        backend.vocabulary = header['vocabulary']
+        backend.n_docs = header['n_docs']
+        backend.term_offsets = load_array('term_offsets.npy')
+        backend.postings_docs = load_array('postings_docs.npy')
+        backend.postings_weights = load_array('postings_weights.npy')
+        backend.postings_tfs = load_array('postings_tfs.npy')
+        backend.doc_lengths = load_array('doc_lengths.npy')
+        backend.term_max_weights = load_array('term_max_weights.npy')
+        backend._fitted = True
+        return backend
+
+BACKENDS = {
+    TfidfBackend.name: TfidfBackend,
+    BM25Backend.name: BM25Backend,
+}
+
+def create_backend(name: str) -> SearchBackend:
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown search backend '{name}', expected one of {sorted(BACKENDS)}")
@@ -1,69 +1,287 @@
+import threading
 import numpy as np
-from typing import List, Dict, Any
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from typing import List, Dict, Any, Iterable, Optional, Set, Union
 from app.schemas.models import ClauseMatch
+from app.core.metrics import stage
+from app.services.chunk_store import ChunkStore
+from app.services.clause_classifier import classify_clauses
+from app.services.search_backends import CorpusStats, SearchBackend, create_backend
+
+class IndexSegment:
+    """Immutable slice of the index: one fitted backend over its own chunks.
+
+    Removing a document only tombstones it; its chunks are dropped for good
+    when the segment is merged.
+    """
+
+    def __init__(self, backend: SearchBackend, store: ChunkStore, chunk_ids: np.ndarray):
+        self.backend = backend
+        self.store = store
+        self.chunk_ids = chunk_ids
+        self.doc_ids = frozenset(store.document_ids())
+        # Replaced rather than mutated, so searches can read it without the engine lock
+        self.deleted: frozenset = frozenset()
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    @property
+    def live_doc_ids(self) -> frozenset:
+        return self.doc_ids - self.deleted
+
+    def allowed_mask(self, scope: Optional[Set[str]],
+                     clause_types: Optional[Set[str]] = None) -> Optional[np.ndarray]:
+        """Chunks a query may return, or None when every chunk is allowed"""
+        mask = None
+        if self.deleted or (scope is not None and not self.doc_ids <= scope):
+            keep = self.live_doc_ids if scope is None else self.live_doc_ids & scope
+            mask = self.store.doc_mask(keep)
+        if clause_types is not None:
+            type_mask = self.store.clause_type_mask(clause_types)
+            mask = type_mask if mask is None else mask & type_mask
+        return mask
+
+    def memory_footprint(self) -> int:
+        return self.backend.memory_footprint() + self.store.memory_footprint() + self.chunk_ids.nbytes
 
 class SemanticSearchEngine:
-    def __init__(self):
-        self.vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
-        self.document_vectors = None
-        self.document_store = []
-        
+    """Segmented index: every document added is fitted as its own segment.
+
+    Segments are scored with term statistics combined over all of them, so
+    an incrementally built index ranks like one fitted at once. Removed
+    documents still count in those statistics until their segment is merged.
+    """
+
+    def __init__(self, backend: str = "tfidf", max_segments: int = 8, background_merge: bool = True):
+        self.backend_name = backend
+        self.max_segments = max_segments
+        self.background_merge = background_merge
+        self.segments = []
+        self._next_chunk_id = 0
+        self._lock = threading.RLock()
+        self._merge_lock = threading.Lock()
+        self._merge_thread: Optional[threading.Thread] = None
+
+    @property
+    def segments(self) -> List[IndexSegment]:
+        return self._view[0]
+
+    @segments.setter
+    def segments(self, segments: List[IndexSegment]):
+        # Segments and their combined statistics are swapped together, so a search
+        # running without the lock always sees a matching pair
+        segments = list(segments)
+        stats = (CorpusStats.combine(segment.backend.term_stats() for segment in segments)
+                 if len(segments) > 1 else None)
+        self._view = (segments, stats)
+
     def process_documents(self, text_chunks: List[str], metadata: List[Dict]):
-        """Process and index documents using TF-IDF"""
-        # Store documents
-        for i, (text, meta) in enumerate(zip(text_chunks, metadata)):
-            self.document_store.append({
-                'id': i,
-                'text': text,
-                'metadata': meta
-            })
-        
-        # Create TF-IDF vectors
-        self.document_vectors = self.vectorizer.fit_transform(text_chunks)
+        """Process and index documents with the configured backend"""
+        return self.index_chunks(self._store_from_texts(text_chunks, metadata))
+
+    def index_chunks(self, store: ChunkStore, doc_id: str = "default"):
+        """Replace the whole index with one document's offset-based chunks"""
+        segment = self._build_segment(store, doc_id)
+        with self._lock:
+            self.segments = []
+            self._next_chunk_id = 0
+            self._append_segment(segment)
         return True
-    
-    def semantic_search(self, query: str, top_k: int = 5) -> List[ClauseMatch]:
-        """Perform TF-IDF based search"""
-        if self.document_vectors is None:
+
+    def add_document(self, doc_id: str, chunks: Union[ChunkStore, List[str]],
+                     metadata: Optional[List[Dict[str, Any]]] = None):
+        """Index one document as a new segment, replacing any previous version of it.
+
+        Only the new document's chunks are fitted, whatever the corpus size.
+        """
+        if not isinstance(chunks, ChunkStore):
+            chunks = self._store_from_texts(chunks, metadata or [{} for _ in chunks])
+        segment = self._build_segment(chunks, doc_id)
+        with self._lock:
+            self._remove_locked(doc_id)
+            self._append_segment(segment)
+        self._maybe_merge()
+        return True
+
+    def remove_document(self, doc_id: str) -> bool:
+        """Tombstone a document; returns False if it isn't indexed"""
+        with self._lock:
+            return self._remove_locked(doc_id)
+
+    def document_ids(self) -> Set[str]:
+        return set().union(*(segment.live_doc_ids for segment in self.segments))
+
+    def semantic_search(self, query: str, top_k: int = 5,
+                        doc_ids: Optional[Iterable[str]] = None,
+                        clause_types: Optional[Iterable[str]] = None) -> List[ClauseMatch]:
+        """Search the top_k chunks for one query"""
+        return self.semantic_search_batch([query], top_k=top_k, doc_ids=doc_ids, clause_types=clause_types)[0]
+
+    def semantic_search_batch(self, queries: List[str], top_k: int = 5,
+                              doc_ids: Optional[Iterable[str]] = None,
+                              clause_types: Optional[Iterable[str]] = None) -> List[List[ClauseMatch]]:
+        """Search all queries, optionally restricted to some documents and clause types.
+
+        Filters are applied before scoring, so excluded chunks cost nothing.
+        """
+        if not queries:
             return []
-        
-        # Vectorize query
-        query_vector = self.vectorizer.transform([query])
-        
-        # Calculate similarities
-        similarities = cosine_similarity(query_vector, self.document_vectors).flatten()
-        
-        # Get top results
-        top_indices = similarities.argsort()[-top_k:][::-1]
-        
-        results = []
-        for idx in top_indices:
-            if idx < len(self.document_store):
-                doc = self.document_store[idx]
-                clause_match = ClauseMatch(
-                    clause_id=f"clause_{doc['id']}",
-                    clause_text=doc['text'],
-                    similarity_score=float(similarities[idx]),
-                    source_document=doc['metadata'].get('source', 'unknown'),
-                    clause_type=self._classify_clause_type(doc['text']),
-                    metadata=doc['metadata']
-                )
-                results.append(clause_match)
-        
-        return results
-    
-    def _classify_clause_type(self, text: str) -> str:
-        """Classify clause type based on content"""
-        text_lower = text.lower()
-        if any(word in text_lower for word in ['exclusion', 'exclude', 'not covered']):
-            return 'exclusion'
-        elif any(word in text_lower for word in ['coverage', 'benefit', 'covered']):
-            return 'coverage'
-        elif any(word in text_lower for word in ['waiting period', 'wait']):
-            return 'waiting_period'
-        elif any(word in text_lower for word in ['claim', 'settlement']):
-            return 'claims'
-        else:
-            return 'general'
+        with stage("search"):
+            scope = set(doc_ids) if doc_ids is not None else None
+            types = set(clause_types) if clause_types is not None else None
+
+            # Each segment returns its own top k; the global top k is among them
+            segments, stats = self._view
+            hits: List[List[tuple]] = [[] for _ in queries]
+            for segment in segments:
+                allowed = segment.allowed_mask(scope, types)
+                n_allowed = len(segment) if allowed is None else int(allowed.sum())
+                if n_allowed == 0:
+                    continue
+                k = min(top_k, n_allowed)
+                for query_hits, (indices, scores) in zip(
+                    hits, segment.backend.top_k_batch(queries, k, len(segment), allowed, stats)
+                ):
+                    query_hits.extend(
+                        (float(score), int(segment.chunk_ids[idx]), segment, int(idx))
+                        for idx, score in zip(indices, scores)
+                    )
+
+            results = []
+            for query_hits in hits:
+                # Score descending, ties towards the higher chunk id as within a segment
+                query_hits.sort(key=lambda hit: (-hit[0], -hit[1]))
+                results.append([
+                    self._build_clause_match(segment, idx, chunk_id, score)
+                    for score, chunk_id, segment, idx in query_hits[:top_k]
+                ])
+            return results
+
+    def merge_segments(self) -> bool:
+        """Merge the smallest segments into one, dropping removed documents' chunks"""
+        with self._merge_lock:
+            with self._lock:
+                segments = list(self.segments)
+                if len(segments) < 2:
+                    return False
+                n_merge = max(2, len(segments) - self.max_segments + 1)
+                victims = sorted(sorted(segments, key=len)[:n_merge], key=lambda s: s.chunk_ids[0])
+                deleted_before = [segment.deleted for segment in victims]
+
+            # The expensive part runs without the lock; searches keep using the old segments
+            with stage("index_merge"):
+                merged = self._merge_into_one(victims, deleted_before)
+
+            with self._lock:
+                victim_ids = {id(segment) for segment in victims}
+                if merged is not None:
+                    # Carry over removals that happened while the merge was running
+                    removed_since = set()
+                    for segment, before in zip(victims, deleted_before):
+                        removed_since |= segment.deleted - before
+                    merged.deleted = frozenset(removed_since & merged.doc_ids)
+                remaining = [s for s in self.segments if id(s) not in victim_ids]
+                self.segments = ([merged] if merged is not None else []) + remaining
+            return True
+
+    def restore_segments(self, segments: List[IndexSegment]):
+        """Install already-built segments, e.g. loaded from a snapshot"""
+        with self._lock:
+            self.segments = list(segments)
+            self._next_chunk_id = max(
+                (int(segment.chunk_ids.max()) + 1 for segment in segments if len(segment)), default=0
+            )
+
+    def memory_footprint(self) -> int:
+        """Estimate private resident bytes held by this index"""
+        return sum(segment.memory_footprint() for segment in self.segments)
+
+    def _build_segment(self, store: ChunkStore, doc_id: Optional[str],
+                       chunk_ids: Optional[np.ndarray] = None) -> IndexSegment:
+        if doc_id is not None:
+            # A new document: label its chunks once here rather than on every query
+            store.assign_document(doc_id)
+            with stage("classify"):
+                store.set_clause_types(classify_clauses(store.iter_texts()))
+        backend = create_backend(self.backend_name)
+        if len(store):
+            with stage("index_fit"):
+                backend.fit(store.iter_texts())
+        if chunk_ids is None:
+            chunk_ids = np.arange(len(store), dtype=np.int64)
+        return IndexSegment(backend, store, chunk_ids)
+
+    def _append_segment(self, segment: IndexSegment):
+        # New segments get fresh, increasing chunk ids
+        if len(segment) == 0:
+            return
+        segment.chunk_ids = segment.chunk_ids + self._next_chunk_id
+        self._next_chunk_id += len(segment)
+        self.segments = self.segments + [segment]
+
+    def _remove_locked(self, doc_id: str) -> bool:
+        found = False
+        survivors = []
+        for segment in self.segments:
+            if doc_id in segment.live_doc_ids:
+                found = True
+                segment.deleted = segment.deleted | {doc_id}
+            if segment.live_doc_ids:
+                survivors.append(segment)
+        self.segments = survivors
+        return found
+
+    def _merge_into_one(self, victims: List[IndexSegment], deleted_before: List[frozenset]):
+        store = ChunkStore()
+        chunk_ids = []
+        for segment, deleted in zip(victims, deleted_before):
+            source = segment.store
+            page_map = {}
+            for idx in range(len(segment)):
+                if source.doc_id(idx) in deleted:
+                    continue
+                page = int(source.chunk_pages[idx])
+                if page not in page_map:
+                    page_map[page] = store.add_page(source.page_text(page), source.page_total(page))
+                store.add_chunk_from(source, idx, page_map[page])
+                chunk_ids.append(int(segment.chunk_ids[idx]))
+        if not chunk_ids:
+            return None
+        return self._build_segment(store, None, np.asarray(chunk_ids, dtype=np.int64))
+
+    def _maybe_merge(self):
+        if len(self.segments) <= self.max_segments:
+            return
+        if not self.background_merge:
+            self.merge_segments()
+            return
+        with self._lock:
+            if self._merge_thread is not None and self._merge_thread.is_alive():
+                return
+            self._merge_thread = threading.Thread(target=self._merge_loop, daemon=True)
+            self._merge_thread.start()
+
+    def _merge_loop(self):
+        while len(self.segments) > self.max_segments:
+            if not self.merge_segments():
+                break
+
+    @staticmethod
+    def _store_from_texts(text_chunks: List[str], metadata: List[Dict]) -> ChunkStore:
+        # Each chunk becomes its own page, spanning it whole
+        store = ChunkStore()
+        for text, meta in zip(text_chunks, metadata):
+            store.add_chunk_with_metadata(store.add_page(text), 0, len(text), meta)
+        return store
+
+    def _build_clause_match(self, segment: IndexSegment, idx: int, chunk_id: int, score: float) -> ClauseMatch:
+        # Only returned hits are materialized; fields come straight from typed columns
+        store = segment.store
+        return ClauseMatch.model_construct(
+            clause_id=f"clause_{chunk_id}",
+            clause_text=store.text(idx),
+            similarity_score=score,
+            source_document=store.source(idx),
+            clause_type=store.clause_type(idx),
+            metadata=store.chunk_metadata(idx)
+        )
@@ -0,0 +1,54 @@
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key onto one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    runs wait for the same result, or get the same exception if it fails.
+    Nothing is remembered once the call completes.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    def do(self, key: str, fn: Callable, *args) -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            with self._lock:
+                self.failures += 1
+                del self._calls[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._calls[key]
+        future.set_result(result)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "failures": self.failures,
+            }
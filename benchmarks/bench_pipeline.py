@@ -0,0 +1,238 @@
+"""End-to-end benchmark of /hackrx/run against synthetic PDFs and a fake LLM.
+
+Everything runs locally: policy PDFs are generated and served over HTTP,
+Groq is replaced by a fake endpoint with configurable latency, and the API
+runs under uvicorn in-process. Per-stage latencies come from the
+Server-Timing header of each response. Run from the repository root:
+
+    python -m benchmarks.bench_pipeline --pages 10 100 1000 --concurrency 8 --output bench.json
+    python -m benchmarks.bench_pipeline --baseline bench.json
+
+For each page count the "ingest" phase sends requests for distinct
+documents (cold: download, extraction and indexing on every request) and
+the "query" phase sends requests for one already-indexed document.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+
+from benchmarks.bench_search_backends import QUESTIONS
+from benchmarks.synthetic import DocumentServer, FakeGroq, make_policy_pdf
+
+API_KEY = "benchmark"
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    def pick(pct):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+    return {
+        'count': len(ordered),
+        'mean_ms': round(1000 * sum(ordered) / len(ordered), 3),
+        'p50_ms': round(1000 * pick(50), 3),
+        'p95_ms': round(1000 * pick(95), 3),
+        'p99_ms': round(1000 * pick(99), 3),
+    }
+
+def parse_server_timing(header: str):
+    """{stage: seconds} from a Server-Timing header; repeated stages are summed by the server"""
+    stages = {}
+    for entry in filter(None, (part.strip() for part in header.split(","))):
+        name, _, params = entry.partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur":
+                stages[name] = float(value) / 1000
+    return stages
+
+def start_api(args, llm_url):
+    """Configure the app from the environment and serve its router with uvicorn on a free port"""
+    os.environ.update({
+        "GROQ_API_KEY": "benchmark",
+        "API_KEY": API_KEY,
+        "LLM_BASE_URL": llm_url,
+        "ANSWER_CACHE_ENABLED": str(args.answer_cache).lower(),
+        "INDEX_SNAPSHOT_DIR": "",
+        "REQUEST_WORKERS": str(args.concurrency),
+        "LLM_MAX_CONCURRENCY": str(args.llm_concurrency),
+    })
+    # Imported late so the settings pick up the environment above
+    import uvicorn
+    from fastapi import FastAPI
+    from app.api import endpoints
+    from app.core.config import get_settings
+
+    get_settings.cache_clear()
+    app = FastAPI()
+    app.include_router(endpoints.router)
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={'sockets': [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread, f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+def run_phase(api_url, document_urls, questions_per_request, concurrency, seed):
+    """Send one /hackrx/run per document URL, `concurrency` at a time"""
+    rng = random.Random(seed)
+    bodies = [{'documents': url, 'questions': rng.sample(QUESTIONS, questions_per_request)}
+              for url in document_urls]
+    session = requests.Session()
+    headers = {'Authorization': f'Bearer {API_KEY}'}
+
+    def send(body):
+        started = time.perf_counter()
+        try:
+            response = session.post(f"{api_url}/hackrx/run", json=body, headers=headers, timeout=600)
+        except requests.RequestException:
+            return time.perf_counter() - started, None, {}
+        return (time.perf_counter() - started, response.status_code,
+                parse_server_timing(response.headers.get('Server-Timing', '')))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(send, bodies))
+    wall = time.perf_counter() - started
+
+    ok = [(latency, stages) for latency, status, stages in results if status == 200]
+    statuses = {}
+    for _, status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    stage_samples = {}
+    for _, stages in ok:
+        for name, seconds in stages.items():
+            stage_samples.setdefault(name, []).append(seconds)
+    return {
+        'requests': len(results),
+        'errors': len(results) - len(ok),
+        'status_codes': statuses,
+        'wall_s': round(wall, 3),
+        'throughput_rps': round(len(ok) / wall, 3) if wall else 0.0,
+        'end_to_end': percentiles([latency for latency, _ in ok]),
+        'stages': {name: percentiles(samples) for name, samples in sorted(stage_samples.items())},
+    }
+
+def run_scenario(args, api_url, docs, pages):
+    seed = args.seed + pages * 1000
+    ingest_urls = [docs.add(f"policy-{pages}p-{i}.pdf", make_policy_pdf(pages, seed + i))
+                   for i in range(args.ingest_requests)]
+    ingest = run_phase(api_url, ingest_urls, args.questions, args.concurrency, seed)
+    ingest['pages_per_s'] = round(pages * (args.ingest_requests - ingest['errors']) / ingest['wall_s'], 1)
+
+    # The first ingested document is indexed by now, so these only search and answer
+    query = run_phase(api_url, [ingest_urls[0]] * args.requests, args.questions, args.concurrency, seed + 1)
+    return {'ingest': ingest, 'query': query}
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """Lines describing p95 regressions beyond `tolerance` (a fraction) and `min_delta_ms`"""
+    regressions = []
+    for scenario, phases in results['scenarios'].items():
+        for phase, current in phases.items():
+            before = baseline.get('scenarios', {}).get(scenario, {}).get(phase)
+            if not before:
+                continue
+            pairs = [('end_to_end', current['end_to_end'], before['end_to_end'])]
+            pairs += [(name, stats, before['stages'].get(name)) for name, stats in current['stages'].items()]
+            for name, now, then in pairs:
+                if not now or not then:
+                    continue
+                old, new = then['p95_ms'], now['p95_ms']
+                if new > old * (1 + tolerance) and new - old > min_delta_ms:
+                    regressions.append(f"{scenario} {phase} {name}: p95 {old:.1f} -> {new:.1f} ms "
+                                       f"(+{100 * (new - old) / old:.0f}%)")
+    return regressions
+
+def print_results(results):
+    print("stage times are per request; llm_call and context_build sum all of a request's calls")
+    for scenario, phases in results['scenarios'].items():
+        for phase, result in phases.items():
+            print(f"\n{scenario} {phase}: {result['requests']} requests, {result['errors']} errors, "
+                  f"{result['throughput_rps']:.2f} req/s")
+            print(f"  {'stage':<18} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+            rows = [('end_to_end', result['end_to_end'])] + list(result['stages'].items())
+            for name, stats in rows:
+                if stats:
+                    print(f"  {name:<18} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, nargs='+', default=[10, 100])
+    parser.add_argument('--requests', type=int, default=40, help='warm query requests per page count')
+    parser.add_argument('--ingest-requests', type=int, default=4, help='cold requests per page count')
+    parser.add_argument('--questions', type=int, default=5, help='questions per request')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--llm-latency', type=float, default=0.2, help='fake LLM seconds per call')
+    parser.add_argument('--llm-jitter', type=float, default=0.05, help='extra random seconds per call')
+    parser.add_argument('--llm-concurrency', type=int, default=8)
+    parser.add_argument('--answer-cache', action='store_true', help='leave the answer cache on')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='write results as JSON to this path')
+    parser.add_argument('--baseline', help='compare p95 latencies against an earlier --output file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed p95 slowdown as a fraction')
+    parser.add_argument('--min-delta-ms', type=float, default=5.0, help='ignore slowdowns smaller than this')
+    args = parser.parse_args()
+    if args.questions > len(QUESTIONS):
+        parser.error(f"--questions can be at most {len(QUESTIONS)}")
+
+    llm = FakeGroq(latency=args.llm_latency, jitter=args.llm_jitter, seed=args.seed)
+    docs = DocumentServer()
+    server, thread, api_url = start_api(args, llm.url)
+    try:
+        results = {
+            'meta': {
+                'timestamp': datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                'git_revision': git_revision(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'args': {key: value for key, value in vars(args).items()
+                         if key not in ('output', 'baseline')},
+            },
+            'scenarios': {f"pages={pages}": run_scenario(args, api_url, docs, pages) for pages in args.pages},
+        }
+        results['meta']['llm_calls'] = llm.calls
+    finally:
+        server.should_exit = True
+        thread.join()
+        docs.close()
+        llm.close()
+
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nresults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_delta_ms)
+        print(f"\n{len(regressions)} regression(s) against {args.baseline}")
+        for line in regressions:
+            print(f"  {line}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
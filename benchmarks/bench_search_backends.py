@@ -0,0 +1,104 @@
+"""Compare index build time and query latency of the search backends.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_search_backends --chunks 20000 --queries 200
+"""
+import argparse
+import random
+import statistics
+import time
+
+from app.services.semantic_search import SemanticSearchEngine
+from app.services.search_backends import BACKENDS
+
+CLAUSE_TEMPLATES = [
+    "The grace period for payment of the premium is {n} days from the due date.",
+    "Expenses related to {disease} are excluded until {n} months of continuous coverage.",
+    "Pre-existing diseases including {disease} are covered after a waiting period of {n} months.",
+    "A deductible of Rs. {n},000 applies to every claim for {disease} treatment.",
+    "Claims must be notified to the insurer within {n} days of hospitalisation.",
+    "Room rent is capped at {n} percent of the sum insured per day.",
+    "Maternity expenses are covered after {n} months subject to the sub-limit.",
+    "Treatment of {disease} under AYUSH systems is covered up to the sum insured.",
+]
+
+DISEASES = [
+    "cataract", "hernia", "osteoarthritis", "glaucoma", "sinusitis", "tonsillitis", "gallstones",
+    "haemorrhoids", "fistula", "varicose veins", "endometriosis", "psoriasis", "nephrolithiasis",
+    "hydrocele", "spondylosis", "hypertension", "diabetes mellitus", "thalassemia",
+]
+
+QUESTIONS = [
+    "What is the grace period for premium payment?",
+    "What is the waiting period for pre-existing diseases?",
+    "Is cataract surgery covered and after how long?",
+    "What is the deductible for each claim?",
+    "Are maternity expenses covered?",
+    "Is there a sub-limit on room rent?",
+    "Does the policy cover AYUSH treatment for psoriasis?",
+    "How soon must a claim be notified?",
+]
+
+def make_corpus(n_chunks: int, seed: int):
+    rng = random.Random(seed)
+    chunks = []
+    for _ in range(n_chunks):
+        sentences = [
+            rng.choice(CLAUSE_TEMPLATES).format(n=rng.randint(1, 48), disease=rng.choice(DISEASES))
+            for _ in range(rng.randint(4, 10))
+        ]
+        chunks.append(" ".join(sentences))
+    return chunks
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def bench_backend(name, chunks, queries, top_k):
+    engine = SemanticSearchEngine(backend=name)
+    start = time.perf_counter()
+    engine.process_documents(chunks, [{'source': 'synthetic'} for _ in chunks])
+    build_seconds = time.perf_counter() - start
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        engine.semantic_search(query, top_k=top_k)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    engine.semantic_search_batch(queries, top_k=top_k)
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        'backend': name,
+        'build_s': build_seconds,
+        'query_p50_ms': 1000 * statistics.median(latencies),
+        'query_p95_ms': 1000 * percentile(latencies, 95),
+        'batch_per_query_ms': 1000 * batch_seconds / len(queries),
+        'memory_mb': engine.memory_footprint() / 1e6,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chunks', type=int, default=5000)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--backends', nargs='+', default=sorted(BACKENDS))
+    args = parser.parse_args()
+
+    chunks = make_corpus(args.chunks, args.seed)
+    rng = random.Random(args.seed)
+    queries = [rng.choice(QUESTIONS) for _ in range(args.queries)]
+
+    print(f"{args.chunks} chunks, {args.queries} queries, top_k={args.top_k}")
+    print(f"{'backend':<8} {'build s':>9} {'p50 ms':>8} {'p95 ms':>8} {'batch ms/q':>11} {'index MB':>9}")
+    for name in args.backends:
+        row = bench_backend(name, chunks, queries, args.top_k)
+        print(f"{row['backend']:<8} {row['build_s']:>9.3f} {row['query_p50_ms']:>8.3f} "
+              f"{row['query_p95_ms']:>8.3f} {row['batch_per_query_ms']:>11.3f} {row['memory_mb']:>9.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""Offline fixtures for the benchmarks: synthetic policy PDFs, a document server and a fake Groq API."""
+import hashlib
+import http.server
+import json
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks.bench_search_backends import CLAUSE_TEMPLATES, DISEASES
+
+SECTION_TITLES = [
+    "Definitions", "Scope of Cover", "Waiting Periods", "Exclusions", "Claims Procedure",
+    "Premium and Renewal", "Sub-limits and Co-payment", "General Conditions",
+]
+LINES_PER_PAGE = 48
+LINE_WIDTH = 95
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def _page_lines(rng: random.Random, page: int, marker: str):
+    lines = [f"SECTION {page + 1}. {SECTION_TITLES[page % len(SECTION_TITLES)].upper()}"]
+    current = f"{page + 1}.1"
+    while len(lines) < LINES_PER_PAGE:
+        sentence = rng.choice(CLAUSE_TEMPLATES).format(n=rng.randint(1, 48), disease=rng.choice(DISEASES))
+        if len(current) + len(sentence) + 1 > LINE_WIDTH:
+            lines.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}"
+    lines[-1] = f"Policy reference {marker}, page {page + 1}"
+    return lines
+
+def make_policy_pdf(pages: int, seed: int = 7) -> bytes:
+    """A text-only PDF of `pages` pages of insurance clauses, reproducible from `seed`.
+
+    Written by hand rather than with a PDF library so the benchmarks need
+    nothing beyond the app's own dependencies. Different seeds give
+    different content and therefore different document fingerprints.
+    """
+    rng = random.Random(seed)
+    marker = f"BENCH-{seed:08d}"
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        text = ") Tj T* (".join(_escape(line) for line in _page_lines(rng, page, marker))
+        stream = f"BT /F1 8 Tf 10 TL 36 760 Td ({text}) Tj ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+class _QuietHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up, e.g. an LLM call cut off by its deadline
+            pass
+
+class _LocalServer:
+    def __init__(self, handler):
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+class DocumentServer(_LocalServer):
+    """Serves registered PDFs over local HTTP, with ETags like blob storage"""
+
+    def __init__(self):
+        self.documents: Dict[str, bytes] = {}
+        documents = self.documents
+
+        class Handler(_QuietHandler):
+            def do_GET(self):
+                body = documents.get(self.path.split("?", 1)[0])
+                if body is None:
+                    self._send(404, b"not found", "text/plain")
+                    return
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self._send(200, body, "application/pdf", {"ETag": etag})
+
+        super().__init__(Handler)
+
+    def add(self, name: str, body: bytes) -> str:
+        self.documents[f"/{name}"] = body
+        return f"{self.url}/{name}"
+
+class FakeGroq(_LocalServer):
+    """OpenAI-compatible chat completions endpoint that answers after a configurable delay.
+
+    Each call sleeps `latency` plus up to `jitter` seconds, drawn from a
+    seeded generator, and reports token usage estimated from the prompt.
+    `errors` lists (status, headers) failures served, in order, to the
+    first calls before answers start, e.g. [(429, {"Retry-After": "1"})].
+    `content` replaces the assistant's reply.
+    """
+
+    def __init__(self, latency: float = 0.2, jitter: float = 0.0, seed: int = 7,
+                 errors: Optional[List[Tuple[int, Dict[str, str]]]] = None,
+                 content: str = "The policy covers this as stated."):
+        rng = random.Random(seed)
+        lock = threading.Lock()
+        self.calls = 0
+        self.errors = list(errors or [])
+        fake = self
+
+        class Handler(_QuietHandler):
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with lock:
+                    fake.calls += 1
+                    delay = latency + rng.uniform(0, jitter)
+                    error = fake.errors.pop(0) if fake.errors else None
+                time.sleep(delay)
+                if error is not None:
+                    status, headers = error
+                    body = json.dumps({"error": {"message": f"fake error {status}", "type": "fake"}}).encode()
+                    self._send(status, body, "application/json", headers)
+                    return
+                prompt_tokens = sum(len(m.get("content", "")) for m in request["messages"]) // 4
+                body = json.dumps({
+                    "id": f"bench-{fake.calls}", "object": "chat.completion", "created": int(time.time()),
+                    "model": request["model"],
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 8,
+                              "total_tokens": prompt_tokens + 8},
+                }).encode()
+                self._send(200, body, "application/json")
+
+        super().__init__(Handler)
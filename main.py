@@ -1,17 +1,39 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-import requests
 import PyPDF2
 import io
 import re
 import os
-from typing import List, Dict
+import time
+from datetime import datetime, timezone
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from app.core.metrics import REGISTRY, REQUEST_SECONDS, REQUESTS_IN_FLIGHT, begin_request, stage
+from app.services.downloader import get_default_downloader
 
 # Initialize security scheme
 security = HTTPBearer()
 
 app = FastAPI(title="HackRX Insurance Policy API", version="1.0.0")
 
+@app.middleware("http")
+async def record_timings(request: Request, call_next):
+    """Record request latency and report stage timings in a Server-Timing header"""
+    timings = begin_request()
+    REQUESTS_IN_FLIGHT.inc("all")
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        REQUESTS_IN_FLIGHT.dec("all")
+    elapsed = time.perf_counter() - started
+    # Label by route template, not raw path, to keep the series count bounded
+    route = request.scope.get("route")
+    REQUEST_SECONDS.observe(elapsed, route.path if route is not None else "unmatched")
+    response.headers["Server-Timing"] = timings.server_timing(elapsed)
+    return response
+
 # Authentication function
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Verify the authentication token"""
@@ -48,14 +70,8 @@ def hackrx_endpoint(request: dict, auth: dict = Depends(verify_token)):
         raise HTTPException(status_code=400, detail="Documents and questions are required")
     
     try:
-        # Download and read the PDF
-        pdf_text = download_and_extract_pdf(document_url)
-        
-        # Answer questions based on the actual PDF content
-        answers = []
-        for question in questions:
-            answer = analyze_document_for_question(pdf_text, question)
-            answers.append(answer)
+        # Answer questions from the PDF, reading pages only until every answer is final
+        answers = answer_from_pages(iter_pdf_pages(document_url), questions)
         
         return {
             "answers": answers,
@@ -105,10 +121,8 @@ def run_internal_tests(auth: dict = Depends(verify_token)):
         ]
         
         if 'pdf_text' in locals():
-            answers = []
-            for question in test_questions:
-                answer = analyze_document_for_question(pdf_text, question)
-                answers.append(answer)
+            analyzer = DocumentAnalyzer(pdf_text)
+            answers = [analyzer.answer(question) for question in test_questions]
             
             test_results.append({
                 "test": "Question Analysis",
@@ -144,7 +158,7 @@ def detailed_health_check():
     
     health_status = {
         "api_status": "healthy",
-        "timestamp": "2025-08-03T14:30:00Z",
+        "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
         "authentication": "HTTPBearer enabled",
         "components": []
     }
@@ -184,145 +198,274 @@ def detailed_health_check():
     
     return health_status
 
-def download_and_extract_pdf(url: str) -> str:
-    """Download PDF from URL and extract text content"""
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics(auth: dict = Depends(verify_token)):
+    """Prometheus text exposition of request and stage latencies"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+def iter_pdf_pages(url: str) -> Iterator[str]:
+    """Download a PDF and yield the text of each page as it is extracted.
+
+    Pages are only extracted when the consumer asks for them, so a caller
+    that stops iterating early never pays for the rest of the document.
+    """
     try:
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-        
-        pdf_file = io.BytesIO(response.content)
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        
-        full_text = ""
+        with stage("download"):
+            content = get_default_downloader().download(url, conditional=False).content
+        pdf_reader = PyPDF2.PdfReader(io.BytesIO(content))
         for page in pdf_reader.pages:
-            full_text += page.extract_text() + "\n"
-        
-        return full_text
-        
+            with stage("pdf_extract"):
+                text = page.extract_text()
+            yield text
     except Exception as e:
         raise Exception(f"Could not process PDF: {str(e)}")
 
-def analyze_document_for_question(document_text: str, question: str) -> str:
-    """Analyze document text to find relevant answer"""
+def download_and_extract_pdf(url: str) -> str:
+    """Download PDF from URL and extract text content"""
+    return "".join(text + "\n" for text in iter_pdf_pages(url))
+
+def answer_from_pages(pages: Iterable[str], questions: List[str]) -> List[str]:
+    """Answer questions while feeding pages in, stopping once no answer can change"""
+    analyzer = DocumentAnalyzer()
+    pending = list(questions)
+    for page_text in pages:
+        with stage("analyze"):
+            analyzer.add_page(page_text)
+            pending = [question for question in pending if not analyzer.settled(question)]
+        if not pending:
+            break
+    with stage("analyze"):
+        return [analyzer.answer(question) for question in questions]
+
+# Every field pattern below stays on one line ("." never matches "\n"), so each
+# field only needs to be searched within the lines holding its anchor keyword
+KEYWORD_PATTERN = re.compile(r"(?=(grace|waiting|pre-existing|deductible|premium|coverage|benefit|claim))")
+
+FIELD_PATTERNS = {
+    "grace_period": [
+        re.compile(r"grace period.*?(\d+).*?days?"),
+        re.compile(r"(\d+).*?days?.*?grace"),
+        re.compile(r"grace.*?(\d+)"),
+    ],
+    "waiting_period": [
+        re.compile(r"waiting period.*?(\d+).*?months?"),
+        re.compile(r"(\d+).*?months?.*?waiting"),
+        re.compile(r"pre-existing.*?(\d+).*?months?"),
+    ],
+    "deductible": [
+        re.compile(r"deductible.*?(\$?\d+(?:,\d+)*)"),
+        re.compile(r"(\$?\d+(?:,\d+)*).*?deductible"),
+    ],
+    "coverage": [
+        re.compile(r"coverage.*?(\$?\d+(?:,\d+)*)"),
+    ],
+    "premium": [
+        re.compile(r"premium.*?(\$?\d+(?:,\d+)*)"),
+        re.compile(r"(\$?\d+(?:,\d+)*).*?premium"),
+    ],
+}
+
+FIELD_ANCHORS = {
+    "grace_period": ("grace",),
+    "waiting_period": ("waiting", "pre-existing"),
+    "deductible": ("deductible",),
+    "coverage": ("coverage",),
+    "premium": ("premium",),
+}
+
+def question_kind(question: str) -> str:
+    """Which kind of answer a question gets; the field name for field lookups"""
     question_lower = question.lower()
-    
+
     if "grace period" in question_lower and "premium" in question_lower:
-        return search_for_grace_period(document_text)
+        return "grace_period"
     elif "waiting period" in question_lower and ("pre-existing" in question_lower or "disease" in question_lower):
-        return search_for_waiting_period(document_text)
+        return "waiting_period"
     elif "deductible" in question_lower:
-        return search_for_deductible(document_text)
+        return "deductible"
     elif "coverage" in question_lower or "benefit" in question_lower:
-        return search_for_coverage(document_text)
+        return "coverage"
     elif "premium" in question_lower and "amount" in question_lower:
-        return search_for_premium_amount(document_text)
+        return "premium"
     elif "claim" in question_lower:
-        return search_for_claim_process(document_text)
+        return "claim"
     else:
-        return search_general_answer(document_text, question)
-
-def search_for_grace_period(text: str) -> str:
-    """Search for grace period information in document"""
-    patterns = [
-        r"grace period.*?(\d+).*?days?",
-        r"(\d+).*?days?.*?grace",
-        r"grace.*?(\d+)",
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text.lower())
-        if match:
-            days = match.group(1) if match.groups() else "30"
+        return "general"
+
+class DocumentAnalyzer:
+    """Keyword analyzer fed one page at a time; each question is then a lookup.
+
+    Pages only ever add lines, so every lookup resumes from where it last
+    stopped instead of rescanning the document. Page boundaries are line
+    boundaries, matching the text download_and_extract_pdf builds.
+    """
+
+    def __init__(self, document_text: Optional[str] = None):
+        self.pages_lower: List[str] = []
+        self.lines: List[str] = []
+        # Line numbers mentioning each keyword, in document order
+        self.keyword_lines: Dict[str, List[int]] = {}
+
+        # field -> [priority of the best pattern matched so far, its value, lines scanned]
+        self._field_matches: Dict[str, list] = {}
+        # (kind, phrase) -> items already scanned for the phrase, or -1 once found
+        self._phrase_scans: Dict[Tuple[str, str], int] = {}
+
+        if document_text is not None:
+            self.add_page(document_text)
+
+    def add_page(self, page_text: str):
+        page_lower = page_text.lower()
+        self.pages_lower.append(page_lower)
+        for line in page_lower.split("\n"):
+            for keyword in set(KEYWORD_PATTERN.findall(line)):
+                self.keyword_lines.setdefault(keyword, []).append(len(self.lines))
+            self.lines.append(line)
+
+    def _found_in(self, key: Tuple[str, str], items: List, test) -> bool:
+        """Whether `test` holds for any of `items`, a list that only grows"""
+        scanned = self._phrase_scans.get(key, 0)
+        if scanned < 0:
+            return True
+        for index in range(scanned, len(items)):
+            if test(items[index]):
+                self._phrase_scans[key] = -1
+                return True
+        self._phrase_scans[key] = len(items)
+        return False
+
+    def has_keyword(self, phrase: str) -> bool:
+        """Whether the document mentions the phrase (which must contain its anchor keyword)"""
+        anchor = KEYWORD_PATTERN.search(phrase).group(1)
+        return self._found_in(("line", phrase), self.keyword_lines.get(anchor, []),
+                              lambda line_number: phrase in self.lines[line_number])
+
+    def mentions_word(self, word: str) -> bool:
+        return self._found_in(("page", word), self.pages_lower, lambda page: word in page)
+
+    def _match_field(self, field: str) -> list:
+        # The answer is the earliest line matching the highest-priority pattern
+        # that matches anywhere. Scanning lines in order and only trying patterns
+        # that beat the best so far gives the same result incrementally.
+        state = self._field_matches.setdefault(field, [len(FIELD_PATTERNS[field]), None, 0])
+        best, value, scanned = state
+        if best > 0 and scanned < len(self.lines):
+            candidates = sorted({
+                line_number
+                for anchor in FIELD_ANCHORS[field]
+                for line_number in _lines_from(self.keyword_lines.get(anchor, []), scanned)
+            })
+            patterns = FIELD_PATTERNS[field]
+            for line_number in candidates:
+                for priority in range(best):
+                    match = patterns[priority].search(self.lines[line_number])
+                    if match:
+                        best, value = priority, match.group(1)
+                        break
+                if best == 0:
+                    break
+            state[:] = [best, value, len(self.lines)]
+        return state
+
+    def field_value(self, field: str):
+        """First match of the field's patterns, tried in priority order, or None"""
+        return self._match_field(field)[1]
+
+    def settled(self, question: str) -> bool:
+        """Whether further pages can no longer change the answer to `question`"""
+        kind = question_kind(question)
+        if kind in FIELD_PATTERNS:
+            # Only a top-priority match is final; a later page could still hold one
+            return self._match_field(kind)[0] == 0
+        if kind == "claim":
+            return self.has_keyword("claim")
+        return self._general_match(question)
+
+    def answer(self, question: str) -> str:
+        """Analyze document text to find relevant answer"""
+        answers = {
+            "grace_period": self.grace_period_answer,
+            "waiting_period": self.waiting_period_answer,
+            "deductible": self.deductible_answer,
+            "coverage": self.coverage_answer,
+            "premium": self.premium_amount_answer,
+            "claim": self.claim_process_answer,
+        }
+        kind = question_kind(question)
+        return answers[kind]() if kind in answers else self.general_answer(question)
+
+    def grace_period_answer(self) -> str:
+        days = self.field_value("grace_period")
+        if days is not None:
             return f"According to the policy document, the grace period for premium payment is {days} days from the due date."
-    
-    if "grace period" in text.lower():
-        return "The policy document mentions a grace period for premium payments. Please refer to the specific terms for exact duration."
-    
-    return "Grace period information not found in this policy document."
-
-def search_for_waiting_period(text: str) -> str:
-    """Search for waiting period information"""
-    patterns = [
-        r"waiting period.*?(\d+).*?months?",
-        r"(\d+).*?months?.*?waiting",
-        r"pre-existing.*?(\d+).*?months?",
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text.lower())
-        if match:
-            months = match.group(1) if match.groups() else "36"
+
+        if self.has_keyword("grace period"):
+            return "The policy document mentions a grace period for premium payments. Please refer to the specific terms for exact duration."
+
+        return "Grace period information not found in this policy document."
+
+    def waiting_period_answer(self) -> str:
+        months = self.field_value("waiting_period")
+        if months is not None:
             return f"The waiting period for pre-existing diseases is {months} months from the policy commencement date."
-    
-    if "waiting period" in text.lower() or "pre-existing" in text.lower():
-        return "The policy document contains waiting period information. Please check the specific terms for details."
-    
-    return "Waiting period information not found in this policy document."
-
-def search_for_deductible(text: str) -> str:
-    """Search for deductible information"""
-    patterns = [
-        r"deductible.*?(\$?\d+(?:,\d+)*)",
-        r"(\$?\d+(?:,\d+)*).*?deductible",
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text.lower())
-        if match:
-            amount = match.group(1)
+
+        if self.has_keyword("waiting period") or self.has_keyword("pre-existing"):
+            return "The policy document contains waiting period information. Please check the specific terms for details."
+
+        return "Waiting period information not found in this policy document."
+
+    def deductible_answer(self) -> str:
+        amount = self.field_value("deductible")
+        if amount is not None:
             return f"According to the policy, the deductible amount is {amount}."
-    
-    if "deductible" in text.lower():
-        return "Deductible information is mentioned in the policy document. Please refer to the specific section for the exact amount."
-    
-    return "Deductible information not found in this policy document."
-
-def search_for_coverage(text: str) -> str:
-    """Search for coverage information"""
-    if "coverage" in text.lower() or "benefit" in text.lower():
-        coverage_match = re.search(r"coverage.*?(\$?\d+(?:,\d+)*)", text.lower())
-        if coverage_match:
-            amount = coverage_match.group(1)
-            return f"The policy provides coverage up to {amount}. Additional benefits and exclusions are detailed in the policy document."
-        
-        return "Coverage information is available in the policy document. Please refer to the benefits section for detailed coverage terms."
-    
-    return "Coverage information not found in this policy document."
-
-def search_for_premium_amount(text: str) -> str:
-    """Search for premium amount information"""
-    patterns = [
-        r"premium.*?(\$?\d+(?:,\d+)*)",
-        r"(\$?\d+(?:,\d+)*).*?premium",
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text.lower())
-        if match:
-            amount = match.group(1)
+
+        if self.has_keyword("deductible"):
+            return "Deductible information is mentioned in the policy document. Please refer to the specific section for the exact amount."
+
+        return "Deductible information not found in this policy document."
+
+    def coverage_answer(self) -> str:
+        if self.has_keyword("coverage") or self.has_keyword("benefit"):
+            amount = self.field_value("coverage")
+            if amount is not None:
+                return f"The policy provides coverage up to {amount}. Additional benefits and exclusions are detailed in the policy document."
+
+            return "Coverage information is available in the policy document. Please refer to the benefits section for detailed coverage terms."
+
+        return "Coverage information not found in this policy document."
+
+    def premium_amount_answer(self) -> str:
+        amount = self.field_value("premium")
+        if amount is not None:
             return f"The premium amount mentioned in the policy is {amount}."
-    
-    if "premium" in text.lower():
-        return "Premium information is mentioned in the policy document. Please check the payment section for specific amounts."
-    
-    return "Premium amount information not found in this policy document."
 
-def search_for_claim_process(text: str) -> str:
-    """Search for claim process information"""
-    if "claim" in text.lower():
-        return "Claim process information is detailed in the policy document. Please refer to the claims section for step-by-step procedures."
-    
-    return "Claim process information not found in this policy document."
+        if self.has_keyword("premium"):
+            return "Premium information is mentioned in the policy document. Please check the payment section for specific amounts."
 
-def search_general_answer(text: str, question: str) -> str:
-    """General search for any question in document"""
-    question_words = question.lower().split()
-    
-    for word in question_words:
-        if len(word) > 3 and word in text.lower():
+        return "Premium amount information not found in this policy document."
+
+    def claim_process_answer(self) -> str:
+        if self.has_keyword("claim"):
+            return "Claim process information is detailed in the policy document. Please refer to the claims section for step-by-step procedures."
+
+        return "Claim process information not found in this policy document."
+
+    def _general_match(self, question: str) -> bool:
+        return any(self.mentions_word(word) for word in question.lower().split() if len(word) > 3)
+
+    def general_answer(self, question: str) -> str:
+        if self._general_match(question):
             return f"Information related to '{question}' is mentioned in the policy document. Please refer to the relevant sections for detailed information."
-    
-    return "The requested information was not found in this policy document. Please consult the complete policy terms or contact your insurance provider."
+
+        return "The requested information was not found in this policy document. Please consult the complete policy terms or contact your insurance provider."
+
+def _lines_from(line_numbers: List[int], first: int) -> List[int]:
+    """The tail of an ascending list of line numbers starting at `first`"""
+    return line_numbers[bisect_left(line_numbers, first):]
+
+def analyze_document_for_question(document_text: str, question: str) -> str:
+    """Analyze document text to find relevant answer"""
+    return DocumentAnalyzer(document_text).answer(question)
 
 def get_fallback_answer(question: str) -> str:
     """Fallback answers when PDF reading fails"""
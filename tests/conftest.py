@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Settings require these; set before anything imports the app
+os.environ.setdefault("GROQ_API_KEY", "test")
+os.environ.setdefault("API_KEY", "test")
+
+from benchmarks.synthetic import DocumentServer, FakeGroq
+
+@pytest.fixture
+def document_server():
+    server = DocumentServer()
+    yield server
+    server.close()
+
+@pytest.fixture
+def fake_groq():
+    """Factory for FakeGroq servers, all closed after the test"""
+    servers = []
+
+    def start(**kwargs):
+        kwargs.setdefault("latency", 0.0)
+        server = FakeGroq(**kwargs)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
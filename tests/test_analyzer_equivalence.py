@@ -0,0 +1,63 @@
+"""main.py's per-document analyzer must answer exactly as the per-question scans it replaced"""
+import random
+
+import pytest
+
+import legacy_analyzer
+import main
+
+FRAGMENTS = [
+    "grace period", "grace", "premium", "premium amount", "waiting period", "wait", "pre-existing",
+    "disease", "deductible", "coverage", "benefit", "claim", "settlement", "days", "day", "months",
+    "month", "policy", "hospital", "maternity", "of", "the", "is", "$", ",", "30", "36", "5,000",
+    "$1,200", "2", "Rs.", "within", "after", "thirty", "(", ")", "GRACE PERIOD", "Coverage",
+]
+QUESTIONS = [
+    "What is the grace period for premium payment?",
+    "What is the waiting period for pre-existing diseases?",
+    "What is the waiting period for a disease?",
+    "What is the deductible?",
+    "What coverage does the policy offer?",
+    "What benefit applies to maternity?",
+    "What is the premium amount?",
+    "How do I file a claim?",
+    "Does the policy cover hospital stays?",
+    "Is cataract surgery included?",
+    "What?",
+]
+
+def random_pages(rng):
+    pages = []
+    for _ in range(rng.randint(0, 4)):
+        lines = [" ".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 8)))
+                 for _ in range(rng.randint(0, 6))]
+        pages.append("\n".join(lines))
+    return pages
+
+def as_document(pages):
+    # What download_and_extract_pdf builds from the pages
+    return "".join(page + "\n" for page in pages)
+
+@pytest.mark.parametrize("seed", range(20))
+def test_analyzer_matches_legacy_scans(seed):
+    rng = random.Random(seed)
+    for _ in range(100):
+        pages = random_pages(rng)
+        document = as_document(pages)
+        expected = [legacy_analyzer.analyze_document_for_question(document, question) for question in QUESTIONS]
+        assert [main.analyze_document_for_question(document, question) for question in QUESTIONS] == expected
+        assert main.answer_from_pages(iter(pages), QUESTIONS) == expected
+
+def test_answers_stop_reading_pages_once_settled():
+    pages = ["The grace period for premium payment is 30 days.", "Later pages are never needed."]
+    consumed = []
+
+    def stream():
+        for page in pages:
+            consumed.append(page)
+            yield page
+
+    answers = main.answer_from_pages(stream(), ["What is the grace period for premium payment?"])
+    assert answers == [legacy_analyzer.analyze_document_for_question(
+        as_document(pages), "What is the grace period for premium payment?")]
+    assert consumed == pages[:1]
@@ -0,0 +1,37 @@
+import pytest
+
+from app.services.answer_cache import AnswerCache
+
+def cache_with(question, answer="cached"):
+    cache = AnswerCache()
+    cache.put("doc", question, "model", "1", answer)
+    return cache
+
+def test_exact_and_reworded_questions_hit():
+    cache = cache_with("What is the waiting period for cataract surgery?")
+    assert cache.get("doc", "what is the waiting period for cataract surgery", "model", "1") == "cached"
+    assert cache.get("doc", "Tell me the waiting period for the cataract surgery", "model", "1") == "cached"
+
+def test_reordered_question_hits():
+    cache = cache_with("Is maternity covered under Plan A?")
+    assert cache.get("doc", "Under Plan A, is maternity covered?", "model", "1") == "cached"
+
+@pytest.mark.parametrize("cached, asked", [
+    ("Is maternity covered?", "Is maternity not covered?"),
+    ("Is maternity covered?", "Isn't maternity covered?"),
+    ("Is it covered after 30 days?", "Is it covered before 30 days?"),
+    ("What applies in year 4?", "What applies in year 2?"),
+    ("Is dental covered with a referral?", "Is dental covered without a referral?"),
+    ("Is maternity covered under Plan A?", "Is maternity covered under Plan B?"),
+    ("Is treatment in India covered?", "Is treatment in Nepal covered?"),
+    ("What is the waiting period for cataract surgery?", "What is the waiting period for knee surgery?"),
+    ("What is the room rent limit for ICU?", "What is the room rent limit?"),
+])
+def test_paraphrases_must_use_the_same_content_words(cached, asked):
+    assert cache_with(cached).get("doc", asked, "model", "1") is None
+
+def test_similarity_check_can_be_disabled():
+    cache = AnswerCache(similarity_threshold=None)
+    cache.put("doc", "What is the waiting period for cataract surgery?", "model", "1", "cached")
+    assert cache.get("doc", "What is the waiting period for the cataract surgery?", "model", "1") is None
+    assert cache.get("doc", "What is the waiting period for cataract surgery", "model", "1") == "cached"
@@ -0,0 +1,67 @@
+import math
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from app.services.search_backends import BM25Backend, select_top_k, tokenize
+from benchmarks.bench_search_backends import QUESTIONS, make_corpus
+
+def exhaustive_top_k(backend, query, k, allowed=None):
+    """Every posting of every query term accumulated, in the same order as the pruned search"""
+    query_terms = Counter(backend.vocabulary[t] for t in tokenize(query) if t in backend.vocabulary)
+    scores = np.zeros(backend.n_docs, dtype=np.float32)
+    for term in sorted(query_terms, key=lambda t: -backend.term_max_weights[t]):
+        start, end = backend.term_offsets[term], backend.term_offsets[term + 1]
+        docs = backend.postings_docs[start:end]
+        weights = backend.postings_weights[start:end] * query_terms[term]
+        if allowed is not None:
+            docs, weights = docs[allowed[docs]], weights[allowed[docs]]
+        scores[docs] += weights
+    hits = np.flatnonzero(scores)
+    return select_top_k(hits.astype(np.int64), scores[hits].astype(np.float64), k, backend.n_docs, allowed)
+
+def textbook_scores(texts, query, k1=1.2, b=0.75):
+    docs = [Counter(tokenize(text)) for text in texts]
+    avg_length = sum(sum(doc.values()) for doc in docs) / len(docs)
+    scores = []
+    for doc in docs:
+        length = sum(doc.values())
+        score = 0.0
+        for term, qtf in Counter(tokenize(query)).items():
+            df = sum(1 for other in docs if term in other)
+            if term in doc:
+                idf = math.log1p((len(docs) - df + 0.5) / (df + 0.5))
+                tf = doc[term]
+                score += qtf * idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_length))
+        scores.append(score)
+    return np.asarray(scores)
+
+@pytest.fixture(scope="module")
+def corpus():
+    return make_corpus(400, seed=9)
+
+@pytest.fixture(scope="module")
+def backend(corpus):
+    backend = BM25Backend()
+    backend.fit(corpus)
+    return backend
+
+@pytest.mark.parametrize("k", [1, 5, 50])
+def test_pruned_search_matches_exhaustive_scoring(backend, k):
+    rng = random.Random(k)
+    allowed = np.asarray([rng.random() < 0.5 for _ in range(backend.n_docs)])
+    for query in QUESTIONS + ["cataract hernia glaucoma", "grace grace grace period", "unknown words only"]:
+        for mask in (None, allowed):
+            got = backend.top_k_batch([query], k, backend.n_docs, mask)[0]
+            expected = exhaustive_top_k(backend, query, k, mask)
+            assert got[0].tolist() == expected[0].tolist()
+            assert got[1].tolist() == expected[1].tolist()
+
+def test_scores_follow_the_bm25_formula(corpus, backend):
+    for query in QUESTIONS:
+        expected = textbook_scores(corpus, query)
+        indices, scores = backend.top_k_batch([query], 10, backend.n_docs)[0]
+        assert np.allclose(scores, expected[indices], rtol=1e-5)
+        assert np.isclose(scores[0], expected.max(), rtol=1e-5)
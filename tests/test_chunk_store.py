@@ -0,0 +1,81 @@
+from app.services.chunk_store import ChunkStore
+
+PAGES = ["The grace period is 30 days. Maternity is covered after 9 months.",
+         "Cataract surgery has a waiting period of two years."]
+
+def two_page_store():
+    store = ChunkStore()
+    first, second = (store.add_page(text, total_pages=2) for text in PAGES)
+    store.add_chunk(first, 0, 28, page_number=1, chunk_index=0, source="policy.pdf")
+    store.add_chunk(first, 29, len(PAGES[0]), page_number=1, chunk_index=1, source="policy.pdf",
+                    clause_type="coverage")
+    store.add_chunk(second, 0, len(PAGES[1]), page_number=2, chunk_index=0, source="policy.pdf",
+                    clause_type="waiting_period")
+    return store
+
+def test_chunks_are_spans_over_their_page():
+    store = two_page_store()
+
+    assert len(store) == 3 and store.page_count() == 2
+    assert list(store.iter_texts()) == ["The grace period is 30 days.", "Maternity is covered after 9 months.",
+                                        PAGES[1]]
+    assert store.page_text(1) == PAGES[1]
+
+def test_metadata_is_rebuilt_from_the_columns():
+    store = two_page_store()
+
+    assert store.chunk_metadata(1) == {
+        "source": "policy.pdf", "page_number": 1, "total_pages": 2, "content_length": len(PAGES[0]),
+        "chunk_index": 1, "total_chunks": 2, "chunk_length": len(PAGES[0]) - 29, "start": 29,
+        "end": len(PAGES[0]),
+    }
+    assert store[-1] == {"id": 2, "text": PAGES[1], "metadata": store.chunk_metadata(2)}
+    assert [chunk["id"] for chunk in store] == [0, 1, 2]
+
+def test_unknown_columns_are_left_out_of_the_metadata():
+    store = ChunkStore()
+    store.add_chunk(store.add_page("Room rent is capped."), 0, 9)
+
+    assert store.chunk_metadata(0) == {"source": "unknown", "content_length": 20, "total_chunks": 1,
+                                       "chunk_length": 9, "start": 0, "end": 9}
+
+def test_free_form_metadata_is_kept_verbatim():
+    store = ChunkStore()
+    meta = {"source": "upload", "page_number": 4, "section": "exclusions"}
+    store.add_chunk_with_metadata(store.add_page("Dental is excluded."), 0, 19, meta)
+
+    assert store.chunk_metadata(0) == meta
+    assert store.chunk_metadata(0) is not meta
+    assert store.page_numbers[0] == 4 and store.source(0) == "upload"
+
+def test_pages_added_after_reading_are_still_found():
+    store = ChunkStore()
+    store.add_chunk(store.add_page("First page."), 0, 5)
+    assert store.text(0) == "First"
+
+    store.add_chunk(store.add_page("Second page."), 7, 11)
+    assert store.text(1) == "page"
+
+def test_documents_and_clause_types_are_coded_columns():
+    store = two_page_store()
+    store.assign_document("doc-a")
+
+    assert store.document_ids() == {"doc-a"}
+    assert store.doc_mask({"doc-a"}).tolist() == [True, True, True]
+    assert store.doc_mask({"doc-b"}).tolist() == [False, False, False]
+    assert store.clause_type_mask({"coverage", "waiting_period"}).tolist() == [False, True, True]
+    assert store.clause_type_mask({"not-a-type"}).tolist() == [False, False, False]
+
+    store.set_clause_types(["exclusion", "general", "claims"])
+    assert [store.clause_type(i) for i in range(3)] == ["exclusion", "general", "claims"]
+
+def test_chunks_copy_between_stores_with_every_column():
+    source = two_page_store()
+    source.assign_document("doc-a")
+    target = ChunkStore()
+    page = target.add_page(PAGES[0], total_pages=2)
+    target.add_chunk_from(source, 1, page)
+
+    assert target.text(0) == source.text(1)
+    assert target.doc_id(0) == "doc-a" and target.clause_type(0) == "coverage"
+    assert target.chunk_metadata(0) == {**source.chunk_metadata(1), "total_chunks": 1}
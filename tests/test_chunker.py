@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from app.services.document_processor import DocumentProcessor, StructureAwareTextSplitter
+from app.services.pdf_extractor import PDFPageExtractor
+from benchmarks.bench_search_backends import CLAUSE_TEMPLATES, DISEASES
+from benchmarks.synthetic import make_policy_pdf
+
+def policy_text(seed, sections=12):
+    rng = random.Random(seed)
+    parts = []
+    for n in range(1, sections + 1):
+        parts.append(f"SECTION {n}. GENERAL CONDITIONS")
+        for clause in range(1, rng.randint(2, 6)):
+            sentences = " ".join(rng.choice(CLAUSE_TEMPLATES).format(n=rng.randint(1, 48),
+                                                                     disease=rng.choice(DISEASES))
+                                 for _ in range(rng.randint(1, 12)))
+            parts.append(f"{n}.{clause} {sentences}")
+    return "\n".join(parts)
+
+@pytest.mark.parametrize("seed", range(10))
+def test_spans_cover_the_text_in_order_within_the_size_limit(seed):
+    text = policy_text(seed)
+    splitter = StructureAwareTextSplitter(target_size=1000, min_size=300, max_size=1500)
+    spans = list(splitter.iter_spans(text))
+
+    assert spans
+    previous_end = 0
+    for start, end in spans:
+        assert previous_end <= start < end <= len(text)
+        # Only whitespace is left out between chunks, and chunks are trimmed
+        assert not text[previous_end:start].strip()
+        assert not text[start].isspace() and not text[end - 1].isspace()
+        assert end - start <= splitter.max_size
+        previous_end = end
+    assert not text[previous_end:].strip()
+    assert splitter.split_text(text) == [text[start:end] for start, end in spans]
+
+def test_chunks_start_at_headings_when_one_is_in_range():
+    text = "SECTION 1. COVER\n" + "Covered expenses are paid. " * 20 + "\nSECTION 2. EXCLUSIONS\n" + "x " * 100
+    chunks = StructureAwareTextSplitter(target_size=400, min_size=100, max_size=600).split_text(text)
+    assert chunks[0].startswith("SECTION 1.")
+    assert chunks[1].startswith("SECTION 2.")
+
+def test_long_text_without_structure_breaks_on_whitespace():
+    text = " ".join(["word"] * 1000)
+    chunks = StructureAwareTextSplitter(target_size=100, min_size=50, max_size=150).split_text(text)
+    assert all(len(chunk) <= 150 and not chunk.startswith(" ") for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+def test_pdf_chunks_are_offsets_into_their_page():
+    processor = DocumentProcessor(page_extractor=PDFPageExtractor(page_timeout=0))
+    pages = PDFPageExtractor(page_timeout=0).extract_pages(make_policy_pdf(3))
+    store = processor.process_pdf_chunks(make_policy_pdf(3))
+
+    assert len(store) > 3
+    for idx in range(len(store)):
+        meta = store.chunk_metadata(idx)
+        page_text = pages[meta["page_number"] - 1]
+        assert store.text(idx) == page_text[int(store.chunk_starts[idx]):int(store.chunk_ends[idx])]
+        assert store.page_text(int(store.chunk_pages[idx])) == page_text
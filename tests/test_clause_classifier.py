@@ -0,0 +1,42 @@
+import random
+
+import pytest
+
+from app.services.chunk_store import CLAUSE_TYPES
+from app.services.clause_classifier import _RANK_TYPES, classify_clause, classify_clauses
+
+def _classify_clause_type(text: str) -> str:
+    """SemanticSearchEngine's classifier before the single-pass pattern, kept as the reference"""
+    text_lower = text.lower()
+    if any(word in text_lower for word in ['exclusion', 'exclude', 'not covered']):
+        return 'exclusion'
+    elif any(word in text_lower for word in ['coverage', 'benefit', 'covered']):
+        return 'coverage'
+    elif any(word in text_lower for word in ['waiting period', 'wait']):
+        return 'waiting_period'
+    elif any(word in text_lower for word in ['claim', 'settlement']):
+        return 'claims'
+    else:
+        return 'general'
+
+WORDS = ["exclusion", "exclude", "excluded", "not covered", "coverage", "benefit", "covered", "waiting period",
+         "wait", "waiver", "claim", "claims", "settlement", "premium", "hospital", "Not Covered", "COVERAGE",
+         "exclud", "cover", "waitin", "clai", "the", "is", "not", "period", ".", ",", ""]
+
+@pytest.mark.parametrize("text", [
+    "", "General conditions apply.", "Maternity is not covered.", "Coverage excludes cosmetic surgery.",
+    "A waiting period of 36 months applies.", "Claims must be filed within 30 days.",
+    "The benefit is payable after the waiting period.", "Settlement of claims is not covered here.",
+])
+def test_examples_match_legacy(text):
+    assert classify_clause(text) == _classify_clause_type(text)
+
+def test_random_texts_match_legacy():
+    rng = random.Random(19)
+    texts = ["".join(rng.choice(WORDS) + rng.choice(["", " "]) for _ in range(rng.randint(0, 10)))
+             for _ in range(20000)]
+    assert classify_clauses(texts) == [_classify_clause_type(text) for text in texts]
+
+def test_labels_are_the_chunk_store_clause_types():
+    # ChunkStore stores labels as codes into CLAUSE_TYPES
+    assert set(_RANK_TYPES) == set(CLAUSE_TYPES)
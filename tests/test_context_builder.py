@@ -0,0 +1,78 @@
+from app.schemas.models import ClauseMatch
+from app.services.context_builder import ContextBuilder, estimate_tokens
+
+PAGE = ("The grace period for premium payment is 30 days. Coverage continues during the grace period. "
+        "Maternity expenses are covered after 24 months of continuous coverage. "
+        "Cataract surgery has a waiting period of two years.")
+
+def clause(text, score, page=1, index=None, start=None, end=None, source="policy.pdf"):
+    metadata = {"page_number": page}
+    if index is not None:
+        metadata["chunk_index"] = index
+    if start is not None:
+        metadata.update(start=start, end=end)
+    return ClauseMatch(clause_id=f"clause_{page}_{index}", clause_text=text, similarity_score=score,
+                       source_document=source, clause_type="general", metadata=metadata)
+
+def span(start, end, score, index):
+    return clause(PAGE[start:end], score, index=index, start=start, end=end)
+
+def test_overlapping_chunks_merge_by_offsets():
+    # Retrieved out of order, overlapping by 20 characters
+    blocks, stats = ContextBuilder().build([span(80, 180, 0.9, 1), span(0, 100, 0.5, 0)])
+
+    assert [block.text for block in blocks] == [PAGE[0:180]]
+    assert blocks[0].score == 0.9
+    assert stats["chunks_in"] == 2 and stats["blocks_out"] == 1
+
+def test_adjacent_chunks_merge_by_index_without_offsets():
+    first, second = "Coverage continues during the grace period.", "Maternity expenses are covered."
+    blocks, _ = ContextBuilder().build([clause(second, 0.7, index=4), clause(first, 0.6, index=3)])
+
+    assert [block.text for block in blocks] == [f"{first}\n{second}"]
+
+def test_chunks_of_other_pages_or_far_apart_stay_separate():
+    blocks, _ = ContextBuilder().build([
+        clause("Room rent is capped at 1 percent of the sum insured.", 0.9, page=1, index=0),
+        clause("Ambulance charges are covered up to Rs 2,000.", 0.8, page=1, index=5),
+        clause("The deductible is Rs 5,000 per claim.", 0.7, page=2, index=1),
+    ])
+
+    # Best first
+    assert [block.score for block in blocks] == [0.9, 0.8, 0.7]
+    assert [block.page_number for block in blocks] == [1, 1, 2]
+
+def test_near_duplicate_blocks_are_dropped():
+    text = "The grace period for premium payment is 30 days after the due date."
+    blocks, _ = ContextBuilder().build([
+        clause(text, 0.9, source="policy.pdf"),
+        clause(text + " Conditions apply.", 0.8, source="copy.pdf"),
+        clause("Maternity expenses are covered after 24 months.", 0.7, source="copy.pdf"),
+    ])
+
+    assert [block.score for block in blocks] == [0.9, 0.7]
+
+def test_blocks_are_added_in_score_order_within_the_budget():
+    texts = ["a" * 400, "b " * 300, "c " * 100]
+    blocks, stats = ContextBuilder(max_tokens=160).build([
+        clause(texts[0], 0.9, page=1), clause(texts[1], 0.8, page=2), clause(texts[2], 0.7, page=3),
+    ])
+
+    # The second block would overflow the budget; the smaller third one still fits
+    assert [block.score for block in blocks] == [0.9, 0.7]
+    assert stats["context_tokens"] == estimate_tokens(texts[0]) + estimate_tokens(texts[2]) <= 160
+    assert stats["raw_context_tokens"] == sum(estimate_tokens(text) for text in texts)
+
+def test_best_block_is_trimmed_when_nothing_fits():
+    blocks, stats = ContextBuilder(max_tokens=10).build([clause("x" * 200, 0.9)])
+
+    assert blocks[0].text == "x" * 40
+    assert stats["context_tokens"] == 10
+
+def test_only_the_first_max_clauses_are_considered():
+    clauses = [clause(f"Clause number {i} about something else entirely.", 1 - i / 10, page=i)
+               for i in range(6)]
+    blocks, stats = ContextBuilder(max_clauses=3).build(clauses)
+
+    assert stats["chunks_in"] == 3
+    assert [block.page_number for block in blocks] == [0, 1, 2]
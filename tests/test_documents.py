@@ -0,0 +1,113 @@
+import threading
+import time
+
+import groq
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import endpoints
+from app.core.config import get_settings
+from app.services.llm_service import LLMService
+from app.services.rag_service import RAGService
+from app.services.request_executor import RequestExecutor
+from benchmarks.synthetic import make_policy_pdf
+
+HEADERS = {"Authorization": f"Bearer {get_settings().api_key}"}
+
+@pytest.fixture
+def api(fake_groq):
+    """A test client around a fresh RAGService; returns (client, service)"""
+    fake = fake_groq()
+    client = groq.Groq(api_key="test", base_url=fake.url, max_retries=0)
+    service = RAGService("test", llm_service=LLMService("test", client=client), ingest_queue_size=2)
+    app = FastAPI()
+    app.include_router(endpoints.router)
+    app.dependency_overrides[endpoints.get_rag_service] = lambda: service
+    app.dependency_overrides[endpoints.get_request_executor] = lambda: RequestExecutor(max_workers=2)
+    return TestClient(app), service
+
+def wait_until_finished(client, document_id):
+    for _ in range(200):
+        status = client.get(f"/documents/{document_id}", headers=HEADERS).json()
+        if status["status"] in ("ready", "failed"):
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"{document_id} never finished: {status}")
+
+def gated_resolve(service):
+    """Make ingestion block until the returned event is set"""
+    gate = threading.Event()
+    resolve = service.ingestion.resolve
+
+    def slow(url, on_stage):
+        gate.wait(5)
+        return resolve(url, on_stage)
+
+    service.ingestion.resolve = slow
+    return gate
+
+def test_document_lifecycle(api, document_server):
+    client, service = api
+    url = document_server.add("policy.pdf", make_policy_pdf(3))
+    gate = gated_resolve(service)
+
+    response = client.post("/documents", json={"url": url}, headers=HEADERS)
+    assert response.status_code == 202
+    submitted = response.json()
+    assert submitted["status"] in ("queued", "running") and submitted["fingerprint"] is None
+    # Submitting the same URL again while it is ingested reuses the job
+    assert client.post("/documents", json={"url": url}, headers=HEADERS).json()["document_id"] == \
+        submitted["document_id"]
+
+    gate.set()
+    status = wait_until_finished(client, submitted["document_id"])
+    assert status["status"] == "ready" and status["error"] is None
+    assert len(status["fingerprint"]) == 64
+    assert {"resolving", "downloading", "extracting", "indexing"} <= set(status["timings"])
+
+    response = client.post("/hackrx/run", json={"document_id": submitted["document_id"],
+                                                "questions": ["What is the grace period?"]}, headers=HEADERS)
+    assert response.status_code == 200
+    assert len(response.json()["answers"]) == 1
+
+def test_unknown_document_ids_are_404(api):
+    client, _ = api
+    assert client.get("/documents/missing", headers=HEADERS).status_code == 404
+    response = client.post("/hackrx/run", json={"document_id": "missing", "questions": ["q"]}, headers=HEADERS)
+    assert response.status_code == 404
+
+def test_failed_ingestion_reports_its_error(api, document_server):
+    client, _ = api
+    url = f"{document_server.url}/missing.pdf"
+    document_id = client.post("/documents", json={"url": url}, headers=HEADERS).json()["document_id"]
+
+    status = wait_until_finished(client, document_id)
+    assert status["status"] == "failed" and "404" in status["error"]
+    response = client.post("/hackrx/run", json={"document_id": document_id, "questions": ["q"]}, headers=HEADERS)
+    assert response.status_code == 500
+
+def test_waiting_for_ingestion_stops_at_the_latency_budget(api, document_server):
+    client, service = api
+    url = document_server.add("policy.pdf", make_policy_pdf(3))
+    gate = gated_resolve(service)
+    document_id = client.post("/documents", json={"url": url}, headers=HEADERS).json()["document_id"]
+
+    started = time.monotonic()
+    response = client.post("/hackrx/run", json={"document_id": document_id, "questions": ["q"],
+                                                "latency_budget_seconds": 0.3}, headers=HEADERS)
+    assert response.status_code == 504
+    assert time.monotonic() - started < 1.5
+    gate.set()
+
+def test_ingestion_queue_is_bounded(api, document_server):
+    client, service = api
+    gate = gated_resolve(service)
+    urls = [document_server.add(f"policy{i}.pdf", make_policy_pdf(1, seed=i)) for i in range(3)]
+
+    assert [client.post("/documents", json={"url": url}, headers=HEADERS).status_code for url in urls[:2]] == \
+        [202, 202]
+    response = client.post("/documents", json={"url": urls[2]}, headers=HEADERS)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "5"
+    gate.set()
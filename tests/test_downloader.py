@@ -0,0 +1,86 @@
+import time
+
+import pytest
+import requests
+
+from app.services.downloader import DocumentDownloader, DocumentTimeoutError, DocumentTooLargeError
+from benchmarks.synthetic import _LocalServer, _QuietHandler, make_policy_pdf
+
+def serve(do_get):
+    handler = type("Handler", (_QuietHandler,), {"do_GET": do_get})
+    return _LocalServer(handler)
+
+def test_unchanged_document_comes_back_as_304(document_server):
+    body = make_policy_pdf(2)
+    url = document_server.add("policy.pdf", body)
+    downloader = DocumentDownloader()
+
+    first = downloader.download(url)
+    assert first.content == body and not first.not_modified
+    assert first.validators.get("etag")
+
+    second = downloader.download(url)
+    assert second.not_modified and second.content is None
+    assert second.validators == first.validators
+
+    forced = downloader.download(url, conditional=False)
+    assert forced.content == body and not forced.not_modified
+    stats = downloader.stats()
+    assert stats["downloads"] == 2 and stats["not_modified"] == 1
+
+def test_changed_document_is_downloaded_again(document_server):
+    url = document_server.add("policy.pdf", make_policy_pdf(2, seed=1))
+    downloader = DocumentDownloader()
+    downloader.download(url)
+
+    changed = make_policy_pdf(2, seed=2)
+    document_server.add("policy.pdf", changed)
+    result = downloader.download(url)
+    assert result.content == changed and not result.not_modified
+
+def test_byte_cap_rejects_large_documents(document_server):
+    body = make_policy_pdf(3)
+    url = document_server.add("large.pdf", body)
+    downloader = DocumentDownloader(max_bytes=len(body) - 1)
+
+    with pytest.raises(DocumentTooLargeError):
+        downloader.download(url)
+    assert downloader.stats()["oversized"] == 1
+    assert DocumentDownloader(max_bytes=len(body)).download(url).content == body
+
+def test_slow_trickle_hits_the_total_time_limit():
+    def do_get(handler):
+        handler.send_response(200)
+        handler.send_header("Content-Length", "1000")
+        handler.end_headers()
+        try:
+            for _ in range(100):
+                handler.wfile.write(b"x" * 10)
+                handler.wfile.flush()
+                time.sleep(0.05)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    server = serve(do_get)
+    try:
+        started = time.perf_counter()
+        with pytest.raises(DocumentTimeoutError):
+            DocumentDownloader(max_seconds=0.3).download(f"{server.url}/slow.pdf")
+        assert time.perf_counter() - started < 2
+    finally:
+        server.close()
+
+def test_304_without_validators_is_an_error():
+    def do_get(handler):
+        handler.send_response(304)
+        handler.send_header("Content-Length", "0")
+        handler.end_headers()
+
+    server = serve(do_get)
+    try:
+        downloader = DocumentDownloader()
+        with pytest.raises(requests.HTTPError):
+            downloader.download(f"{server.url}/policy.pdf")
+        assert downloader.stats()["errors"] == 1
+    finally:
+        server.close()
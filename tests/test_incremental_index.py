@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+from app.services.semantic_search import SemanticSearchEngine
+from benchmarks.bench_search_backends import QUESTIONS, make_corpus
+
+BACKENDS = ["tfidf", "bm25"]
+
+def assert_same_ranking(got, expected):
+    # Scores are summed in a different order per segment, so only near-equal
+    assert [match.clause_id for match in got] == [match.clause_id for match in expected]
+    assert np.allclose([match.similarity_score for match in got],
+                       [match.similarity_score for match in expected], atol=1e-5)
+
+def document_of(match):
+    # Documents are added in order, 20 chunks each, so chunk ids map back to them
+    return f"doc{int(match.clause_id.split('_')[1]) // 20}"
+
+@pytest.fixture(scope="module")
+def documents():
+    # Twelve documents of 20 chunks each, added one segment at a time
+    corpus = make_corpus(240, seed=11)
+    return [(f"doc{i}", corpus[i * 20:(i + 1) * 20]) for i in range(12)]
+
+def incremental(backend, documents, max_segments=100):
+    engine = SemanticSearchEngine(backend=backend, max_segments=max_segments, background_merge=False)
+    for doc_id, chunks in documents:
+        engine.add_document(doc_id, chunks)
+    return engine
+
+def full_fit(backend, documents):
+    engine = SemanticSearchEngine(backend=backend)
+    chunks = [chunk for _, doc_chunks in documents for chunk in doc_chunks]
+    engine.process_documents(chunks, [{} for _ in chunks])
+    return engine
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_incremental_index_ranks_like_one_full_fit(documents, backend):
+    engine = incremental(backend, documents)
+    assert len(engine.segments) == len(documents)
+
+    expected = full_fit(backend, documents).semantic_search_batch(QUESTIONS, top_k=5)
+    for got, want in zip(engine.semantic_search_batch(QUESTIONS, top_k=5), expected):
+        assert_same_ranking(got, want)
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_merging_keeps_the_ranking(documents, backend):
+    engine = incremental(backend, documents)
+    before = engine.semantic_search_batch(QUESTIONS, top_k=5)
+    while engine.merge_segments():
+        pass
+
+    assert len(engine.segments) == 1
+    for got, want in zip(engine.semantic_search_batch(QUESTIONS, top_k=5), before):
+        assert_same_ranking(got, want)
+
+def test_segments_beyond_the_limit_are_merged(documents):
+    engine = incremental("bm25", documents, max_segments=4)
+
+    assert len(engine.segments) <= 4
+    assert engine.document_ids() == {doc_id for doc_id, _ in documents}
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_removed_documents_are_never_returned(documents, backend):
+    engine = incremental(backend, documents)
+    removed = {"doc0", "doc5"}
+    for doc_id in removed:
+        assert engine.remove_document(doc_id)
+    assert not engine.remove_document("doc0")
+    assert not engine.remove_document("missing")
+
+    assert engine.document_ids() == {doc_id for doc_id, _ in documents} - removed
+    for matches in engine.semantic_search_batch(QUESTIONS, top_k=20):
+        assert len(matches) == 20
+        assert not {document_of(match) for match in matches} & removed
+
+    # A merge drops the removed chunks for good
+    while engine.merge_segments():
+        pass
+    assert sum(len(segment) for segment in engine.segments) == 20 * (len(documents) - len(removed))
+
+def test_adding_a_document_again_replaces_it(documents):
+    engine = incremental("bm25", documents[:3])
+    engine.add_document("doc1", ["The deductible is Rs 5,000 per claim."])
+
+    assert engine.document_ids() == {"doc0", "doc1", "doc2"}
+    matches = engine.semantic_search("deductible", top_k=25, doc_ids=["doc1"])
+    assert [match.clause_text for match in matches] == ["The deductible is Rs 5,000 per claim."]
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_scoped_search_keeps_corpus_wide_scores(documents, backend):
+    engine = incremental(backend, documents)
+    scope = {"doc2", "doc7", "doc8"}
+
+    for question in QUESTIONS:
+        every = engine.semantic_search(question, top_k=240)
+        scoped = engine.semantic_search(question, top_k=5, doc_ids=scope)
+        assert {document_of(match) for match in scoped} <= scope
+        # The same scores as the unscoped search, just filtered to the scope
+        assert_same_ranking(scoped, [match for match in every if document_of(match) in scope][:5])
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_single_segment_statistics_match_the_backend_own(documents, backend):
+    engine = full_fit(backend, documents)
+    segment_backend = engine.segments[0].backend
+    stats = segment_backend.term_stats()
+
+    own = segment_backend.top_k_batch(QUESTIONS, 10, len(engine.segments[0]))
+    shared = segment_backend.top_k_batch(QUESTIONS, 10, len(engine.segments[0]), stats=stats)
+    for (own_indices, own_scores), (indices, scores) in zip(own, shared):
+        assert own_indices.tolist() == indices.tolist()
+        assert np.allclose(own_scores, scores, atol=1e-5)
@@ -0,0 +1,46 @@
+import json
+import os
+
+import pytest
+
+from app.services.index_snapshot import load_snapshot, save_snapshot
+from app.services.semantic_search import SemanticSearchEngine
+from benchmarks.bench_search_backends import QUESTIONS, make_corpus
+
+def results(engine, **kwargs):
+    return [[(m.clause_id, round(m.similarity_score, 5), m.clause_text, m.source_document, m.clause_type)
+             for m in matches] for matches in engine.semantic_search_batch(QUESTIONS, top_k=5, **kwargs)]
+
+@pytest.mark.parametrize("backend", ["tfidf", "bm25"])
+def test_snapshot_round_trip_gives_the_same_results(tmp_path, backend):
+    corpus = make_corpus(120, seed=4)
+    engine = SemanticSearchEngine(backend=backend, background_merge=False)
+    engine.add_document("a", corpus[:60], [{"source": "a.pdf"}] * 60)
+    engine.add_document("b", corpus[60:100], [{"source": "b.pdf"}] * 40)
+    engine.add_document("c", corpus[100:], [{"source": "c.pdf"}] * 20)
+    engine.remove_document("c")
+
+    path = str(tmp_path / "snapshot")
+    save_snapshot(engine, path)
+    loaded = load_snapshot(path)
+
+    assert loaded.document_ids() == {"a", "b"}
+    assert results(loaded) == results(engine)
+    assert results(loaded, doc_ids=["b"]) == results(engine, doc_ids=["b"])
+    # Memory-mapped arrays are shared page cache, not private memory
+    assert loaded.memory_footprint() < engine.memory_footprint()
+
+def test_missing_or_outdated_snapshots_are_ignored(tmp_path):
+    assert load_snapshot(str(tmp_path / "missing")) is None
+
+    engine = SemanticSearchEngine()
+    engine.process_documents(["The grace period is 30 days."], [{}])
+    path = str(tmp_path / "snapshot")
+    save_snapshot(engine, path)
+    meta_path = os.path.join(path, "index.json")
+    with open(meta_path) as f:
+        meta = json.load(f)
+    meta["version"] = -1
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    assert load_snapshot(path) is None
@@ -0,0 +1,117 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import groq
+import pytest
+
+from app.services.llm_scheduler import LLMScheduler
+from app.services.request_executor import DeadlineExceededError
+
+REQUEST = {"messages": [{"role": "user", "content": "Is maternity covered?"}], "model": "test"}
+
+def make_scheduler(fake, **kwargs):
+    kwargs.setdefault("backoff_base", 0.01)
+    client = groq.Groq(api_key="test", base_url=fake.url, max_retries=0)
+    return LLMScheduler(client, **kwargs)
+
+def test_server_errors_are_retried(fake_groq):
+    fake = fake_groq(errors=[(500, {}), (503, {})])
+    scheduler = make_scheduler(fake)
+
+    response = scheduler.create(**REQUEST)
+    assert response.choices[0].message.content
+    assert fake.calls == 3
+    assert scheduler.stats()["retries"] == 2
+
+def test_client_errors_are_not_retried(fake_groq):
+    fake = fake_groq(errors=[(400, {})])
+    scheduler = make_scheduler(fake)
+
+    with pytest.raises(groq.BadRequestError):
+        scheduler.create(**REQUEST)
+    assert fake.calls == 1
+    assert scheduler.stats()["failures"] == 1
+
+def test_rate_limit_waits_for_retry_after(fake_groq):
+    fake = fake_groq(errors=[(429, {"Retry-After": "0.3"})])
+    scheduler = make_scheduler(fake)
+
+    started = time.monotonic()
+    scheduler.create(**REQUEST)
+    assert time.monotonic() - started >= 0.3
+    assert fake.calls == 2
+    assert scheduler.stats()["rate_limited"] == 1
+
+def test_retries_give_up_after_max_retries(fake_groq):
+    fake = fake_groq(errors=[(500, {})] * 3)
+    scheduler = make_scheduler(fake, max_retries=2)
+
+    with pytest.raises(groq.InternalServerError):
+        scheduler.create(**REQUEST)
+    assert fake.calls == 3
+
+class SlowFirstCalls:
+    """Stands in for a Groq client: the first `slow` calls take 1s, later ones 50ms"""
+
+    def __init__(self, slow):
+        self.slow = slow
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **request):
+        with self.lock:
+            self.calls += 1
+            call = self.calls
+        time.sleep(1.0 if call <= self.slow else 0.05)
+        return SimpleNamespace(call=call, usage=None)
+
+def test_hedging_keeps_working_when_every_worker_is_busy():
+    # As many concurrent callers as workers, all stuck on a slow first call
+    client = SlowFirstCalls(slow=2)
+    scheduler = LLMScheduler(client, hedge_after=0.1, max_hedge_workers=2)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(2) as callers:
+        responses = list(callers.map(lambda _: scheduler.create(**REQUEST), range(2)))
+    assert time.monotonic() - started < 0.6
+    assert sorted(response.call for response in responses) == [3, 4]
+    assert scheduler.stats()["hedges"] == 2 and scheduler.stats()["hedge_wins"] == 2
+
+def test_fast_calls_are_not_hedged():
+    client = SlowFirstCalls(slow=0)
+    scheduler = LLMScheduler(client, hedge_after=0.5)
+
+    assert scheduler.create(**REQUEST).call == 1
+    assert client.calls == 1 and scheduler.stats()["hedges"] == 0
+
+def test_retry_after_past_the_deadline_fails_fast(fake_groq):
+    fake = fake_groq(errors=[(429, {"Retry-After": "5"})])
+    scheduler = make_scheduler(fake)
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceededError):
+        scheduler.create(deadline=started + 1.0, **REQUEST)
+    assert time.monotonic() - started < 1.0
+    assert fake.calls == 1
+    assert scheduler.stats()["deadline_exceeded"] == 1
+
+def test_slow_call_is_cut_off_at_the_deadline(fake_groq):
+    fake = fake_groq(latency=2.0)
+    scheduler = make_scheduler(fake)
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceededError):
+        scheduler.create(deadline=started + 0.3, **REQUEST)
+    assert time.monotonic() - started < 1.5
+
+def test_rate_limits_past_the_deadline_are_refunded(fake_groq):
+    fake = fake_groq()
+    scheduler = make_scheduler(fake, requests_per_minute=1)
+    scheduler.create(**REQUEST)
+
+    with pytest.raises(DeadlineExceededError):
+        scheduler.create(deadline=time.monotonic() + 1.0, **REQUEST)
+    assert fake.calls == 1
@@ -0,0 +1,91 @@
+import json
+import time
+
+import groq
+import pytest
+
+from app.schemas.models import ClauseMatch
+from app.services.llm_service import LLMService, parse_batch_answers
+from app.services.request_executor import DeadlineExceededError
+
+def clause(clause_id, text, score=0.5):
+    return ClauseMatch(clause_id=clause_id, clause_text=text, similarity_score=score,
+                       source_document="policy.pdf", clause_type="general", metadata={})
+
+CLAUSES = [clause("c1", "Maternity expenses are covered after 9 months."),
+           clause("c2", "A grace period of 30 days is allowed for premium payment.")]
+
+def make_service(fake, **kwargs):
+    client = groq.Groq(api_key="test", base_url=fake.url, max_retries=0)
+    return LLMService("test", client=client, batch_questions=True, **kwargs)
+
+def test_parse_batch_answers_keeps_only_valid_entries():
+    content = json.dumps({"answers": [
+        {"id": 1, "answer": " first "},
+        {"id": 2, "answer": ""},
+        {"id": 3, "answer": "third"},
+        {"id": 3, "answer": "third again"},
+        {"id": 9, "answer": "unknown id"},
+        {"id": True, "answer": "not an id"},
+        "not an object",
+    ]})
+    assert parse_batch_answers(content, 4) == {0: "first"}
+
+def test_parse_batch_answers_accepts_fenced_json():
+    content = '```json\n{"answers": [{"id": 2, "answer": "second"}]}\n```'
+    assert parse_batch_answers(content, 2) == {1: "second"}
+
+@pytest.mark.parametrize("content", ["not json", '{"answer": "no list"}', "[]"])
+def test_parse_batch_answers_rejects_malformed_replies(content):
+    with pytest.raises(ValueError):
+        parse_batch_answers(content, 2)
+
+def test_batch_answers_every_question_in_one_call(fake_groq):
+    reply = json.dumps({"answers": [{"id": 1, "answer": "Yes"}, {"id": 2, "answer": "30 days"}]})
+    fake = fake_groq(content=reply)
+    service = make_service(fake)
+
+    results = service.answer_group(["Is maternity covered?", "What is the grace period?"], [CLAUSES, CLAUSES])
+    assert [answer for answer, _ in results] == ["Yes", "30 days"]
+    assert fake.calls == 1
+    assert [usage["llm_calls"] for _, usage in results] == [1, 0]
+
+def test_questions_missing_from_the_batch_fall_back_to_single_calls(fake_groq):
+    reply = json.dumps({"answers": [{"id": 1, "answer": "Yes"}]})
+    fake = fake_groq(content=reply)
+    service = make_service(fake)
+
+    results = service.answer_group(["Is maternity covered?", "What is the grace period?", "Any deductible?"],
+                                   [CLAUSES, CLAUSES, CLAUSES])
+    assert results[0][0] == "Yes"
+    # The fake answers every call with the same reply, so single calls return it verbatim
+    assert [answer for answer, _ in results[1:]] == [reply, reply]
+    assert fake.calls == 3
+
+def test_missing_questions_can_be_left_to_the_caller(fake_groq):
+    fake = fake_groq(content="this is not json")
+    service = make_service(fake)
+
+    results = service.answer_group(["Is maternity covered?", "What is the grace period?"], [CLAUSES, CLAUSES],
+                                   retry_missing=False)
+    assert [answer for answer, _ in results] == [None, None]
+    assert fake.calls == 1
+    # The failed batch call is still charged, to the first question
+    assert results[0][1]["llm_calls"] == 1
+
+def test_other_failures_become_error_answers(fake_groq):
+    fake = fake_groq(errors=[(400, {})])
+    service = make_service(fake)
+
+    answer, _ = service.answer_question_with_usage("Is maternity covered?", CLAUSES)
+    assert answer.startswith("Error generating answer: ")
+
+def test_deadline_errors_propagate_instead_of_becoming_answers(fake_groq):
+    fake = fake_groq(latency=2.0)
+    service = make_service(fake)
+
+    with pytest.raises(DeadlineExceededError):
+        service.answer_question_with_usage("Is maternity covered?", CLAUSES, deadline=time.monotonic() + 0.2)
+    with pytest.raises(DeadlineExceededError):
+        service.answer_group(["Is maternity covered?", "What is the grace period?"], [CLAUSES, CLAUSES],
+                             deadline=time.monotonic() + 0.2)
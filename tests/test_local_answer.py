@@ -0,0 +1,82 @@
+import pytest
+
+from app.core.config import Settings
+from app.schemas.models import ClauseMatch
+from app.services.local_answer import local_answer
+from app.services.semantic_search import SemanticSearchEngine
+
+def clause(text, score):
+    return ClauseMatch(clause_id=text[:8], clause_text=text, similarity_score=score,
+                       source_document="policy.pdf", clause_type="general", metadata={})
+
+HERNIA = "Hernia surgery is subject to a deductible of Rs. 5,000 per claim."
+THRESHOLD = Settings.model_fields["local_answer_threshold"].default
+
+POLICY = [
+    "A grace period of thirty days (30 days) is provided for premium payment after the due date.",
+    "Pre-existing diseases are covered after a waiting period of 36 months of continuous coverage.",
+    "Hernia surgery is subject to a deductible of Rs. 5,000 per claim.",
+    "Claims must be notified to the insurer within 7 days of hospitalisation.",
+    "Room rent is capped at 1 percent of the sum insured per day.",
+    "Maternity expenses are covered after 24 months subject to the sub-limit.",
+    "Cataract surgery is covered after a waiting period of two years.",
+    "The policy may be renewed for life; renewal premiums depend on the age band.",
+    "Ambulance charges are covered up to Rs. 2,000 per hospitalisation.",
+    "AYUSH treatment is covered up to the sum insured in a government hospital.",
+]
+
+def test_question_qualifiers_must_appear_in_the_clause():
+    assert local_answer("What is the deductible for dental claims?", [clause(HERNIA, 0.2)]) is None
+    answer, confidence = local_answer("What is the deductible for hernia surgery?", [clause(HERNIA, 0.9)])
+    assert answer.startswith("The deductible is Rs. 5,000.")
+    assert confidence == 1.0
+
+def test_confidence_follows_the_rank_not_the_raw_score():
+    other = clause("Room rent is capped at 1 percent of the sum insured.", 14.2)
+    _, top = local_answer("What is the deductible?", [clause(HERNIA, 0.2)])
+    _, second = local_answer("What is the deductible?", [other, clause(HERNIA, 0.2)])
+    assert (top, second) == (1.0, 0.9)
+
+def test_clauses_sharing_no_term_with_the_question_are_skipped():
+    assert local_answer("What is the deductible?", [clause(HERNIA, 0.0)]) is None
+
+def test_conflicting_values_halve_the_confidence():
+    clauses = [clause("A grace period of 30 days is allowed.", 0.9),
+               clause("A grace period of 15 days is allowed.", 0.8)]
+    answer, confidence = local_answer("What is the grace period?", clauses)
+    assert answer.startswith("The grace period is 30 days.")
+    assert confidence == 0.5
+
+def test_policy_names_are_not_qualifiers():
+    answer, _ = local_answer("What is the grace period for premium payment under the National Parivar "
+                             "Mediclaim Plus Policy?", [clause(POLICY[0], 0.85)])
+    assert answer.startswith("The grace period is 30 days.")
+
+def test_unrelated_questions_are_left_to_the_llm():
+    assert local_answer("Is maternity covered?", [clause(HERNIA, 0.9)]) is None
+
+@pytest.mark.parametrize("backend", ["tfidf", "bm25"])
+@pytest.mark.parametrize("question, expected", [
+    ("What is the grace period for premium payment?", "The grace period is 30 days."),
+    ("What is the waiting period for pre-existing diseases?",
+     "The waiting period for pre-existing diseases is 36 months."),
+    ("What is the deductible for hernia surgery?", "The deductible is Rs. 5,000."),
+    ("How soon must a claim be notified?", "Claims must be notified within 7 days."),
+])
+def test_routine_questions_clear_the_default_threshold_on_every_backend(backend, question, expected):
+    engine = SemanticSearchEngine(backend=backend)
+    engine.process_documents(POLICY, [{} for _ in POLICY])
+
+    answer, confidence = local_answer(question, engine.semantic_search(question, top_k=5))
+    assert answer.startswith(expected)
+    assert confidence >= THRESHOLD
+
+@pytest.mark.parametrize("backend", ["tfidf", "bm25"])
+def test_conflicting_documents_fall_below_the_default_threshold(backend):
+    texts = POLICY + ["A grace period of fifteen days (15 days) applies to premium payment for monthly plans."]
+    engine = SemanticSearchEngine(backend=backend)
+    engine.process_documents(texts, [{} for _ in texts])
+
+    question = "What is the grace period for premium payment?"
+    _, confidence = local_answer(question, engine.semantic_search(question, top_k=5))
+    assert confidence < THRESHOLD
@@ -0,0 +1,128 @@
+import re
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import endpoints
+from app.core.config import get_settings
+from app.core.metrics import REQUEST_SECONDS, REQUESTS_IN_FLIGHT, Histogram, stage
+from app.schemas.models import HackRXResponse
+from app.services.rag_service import RAGService
+from app.services.request_executor import RequestExecutor
+
+HEADERS = {"Authorization": f"Bearer {get_settings().api_key}"}
+BODY = {"documents": "http://localhost/policy.pdf", "questions": ["q"]}
+
+class FakeIngestion:
+    def get(self, document_id):
+        return None
+
+class FakeRag:
+    """Runs a couple of timed stages; the streamed variant records the in-flight gauge midway"""
+
+    ingestion = FakeIngestion()
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.in_flight_while_streaming = None
+
+    def process_hackrx_request(self, request, cancel=None):
+        with stage("resolve_document"):
+            time.sleep(0.01)
+        if self.fail:
+            raise RuntimeError("boom")
+        for _ in range(2):
+            with stage("llm_answer"):
+                pass
+        return HackRXResponse(answers=["a"])
+
+    def iter_hackrx_events(self, request, cancel=None):
+        yield {"event": "progress"}
+        time.sleep(0.2)
+        self.in_flight_while_streaming = in_flight("/hackrx/run/stream")
+        yield {"event": "summary"}
+
+def in_flight(route):
+    with REQUESTS_IN_FLIGHT._lock:
+        return REQUESTS_IN_FLIGHT._values.get((route,), 0.0)
+
+def observed(route):
+    with REQUEST_SECONDS._lock:
+        counts, total = REQUEST_SECONDS._series.get((route,), [[0], 0.0])
+    return sum(counts), total
+
+def make_client(rag):
+    app = FastAPI()
+    app.include_router(endpoints.router)
+    app.dependency_overrides[endpoints.get_rag_service] = lambda: rag
+    app.dependency_overrides[endpoints.get_request_executor] = lambda: RequestExecutor(max_workers=2)
+    return TestClient(app)
+
+def timing_entries(header):
+    return {entry.split(";")[0]: entry for entry in header.split(", ")}
+
+def test_server_timing_reports_stages_from_the_worker_thread():
+    response = make_client(FakeRag()).post("/hackrx/run", json=BODY, headers=HEADERS)
+
+    assert response.status_code == 200
+    entries = timing_entries(response.headers["Server-Timing"])
+    assert set(entries) == {"resolve_document", "llm_answer", "total"}
+    assert re.fullmatch(r'llm_answer;dur=\d+\.\d;desc="x2"', entries["llm_answer"])
+    assert float(entries["resolve_document"].split("dur=")[1]) >= 10
+
+@pytest.mark.parametrize("rag, headers, status", [
+    (FakeRag(), {"Authorization": "Bearer wrong"}, 401),
+    (FakeRag(fail=True), HEADERS, 500),
+])
+def test_error_responses_carry_server_timing(rag, headers, status):
+    response = make_client(rag).post("/hackrx/run", json=BODY, headers=headers)
+
+    assert response.status_code == status
+    assert "total" in timing_entries(response.headers["Server-Timing"])
+    assert in_flight("/hackrx/run") == 0
+
+def test_streams_stay_in_flight_until_the_body_is_sent():
+    rag = FakeRag()
+    count, total = observed("/hackrx/run/stream")
+    response = make_client(rag).post("/hackrx/run/stream", json=BODY, headers=HEADERS)
+
+    assert response.status_code == 200 and "total" in response.headers["Server-Timing"]
+    assert rag.in_flight_while_streaming == 1
+    assert in_flight("/hackrx/run/stream") == 0
+    new_count, new_total = observed("/hackrx/run/stream")
+    # Timed over the whole body, not just up to the headers
+    assert new_count == count + 1 and new_total - total >= 0.2
+
+def test_metrics_exposition():
+    client = make_client(RAGService("test"))
+    client.post("/hackrx/run", json=BODY, headers={"Authorization": "Bearer wrong"})
+    response = client.get("/metrics", headers=HEADERS)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    for name, kind in [("hackrx_request_seconds", "histogram"), ("hackrx_requests_in_flight", "gauge"),
+                       ("hackrx_index_cache_lookups_total", "counter"), ("hackrx_answers_total", "counter"),
+                       ("hackrx_executor_active", "gauge")]:
+        assert f"# TYPE {name} {kind}" in lines
+    assert any(line.startswith('hackrx_request_seconds_count{route="/hackrx/run"} ') for line in lines)
+    assert 'hackrx_answers_total{tier="degraded"} 0' in lines
+    assert 'hackrx_index_cache_lookups_total{result="hit"} 0' in lines
+
+def test_metrics_require_the_api_key():
+    assert make_client(RAGService("test")).get("/metrics").status_code == 422
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "/x")
+
+    assert histogram.render()[2:] == [
+        'latency_seconds_bucket{route="/x",le="0.1"} 2',
+        'latency_seconds_bucket{route="/x",le="1.0"} 3',
+        'latency_seconds_bucket{route="/x",le="+Inf"} 4',
+        'latency_seconds_sum{route="/x"} 3.65',
+        'latency_seconds_count{route="/x"} 4',
+    ]
@@ -0,0 +1,47 @@
+import threading
+import time
+
+import pytest
+
+from app.services.pdf_extractor import PDFPageExtractor, _extract_pages
+from benchmarks.synthetic import make_policy_pdf
+
+@pytest.fixture(scope="module")
+def extractor():
+    extractor = PDFPageExtractor(max_workers=2, page_timeout=10.0, min_pages_for_pool=4)
+    yield extractor
+    extractor._reset_pool()
+
+def test_pool_extraction_matches_in_process(extractor):
+    pdf = make_policy_pdf(9, seed=5)
+    expected = PDFPageExtractor(page_timeout=0).extract_pages(pdf)
+    assert len(expected) == 9
+    assert all(f"page {n + 1}" in text for n, text in enumerate(expected))
+    assert extractor.extract_pages(pdf) == expected
+
+def test_short_documents_and_worker_threads_use_the_pool(extractor):
+    pdf = make_policy_pdf(2, seed=6)
+    expected = PDFPageExtractor(page_timeout=0).extract_pages(pdf)
+    results = []
+    thread = threading.Thread(target=lambda: results.append(extractor.extract_pages(pdf)))
+    thread.start()
+    thread.join()
+    assert results == [expected]
+
+class SlowPage:
+    def __init__(self, text, delay=0.0):
+        self.text, self.delay = text, delay
+
+    def extract_text(self):
+        time.sleep(self.delay)
+        return self.text
+
+class FakeReader:
+    def __init__(self, pages):
+        self.pages = pages
+
+def test_pages_over_the_time_limit_come_back_empty():
+    reader = FakeReader([SlowPage("first"), SlowPage("stuck", delay=2.0), SlowPage("third")])
+    started = time.perf_counter()
+    assert _extract_pages(reader, 0, 3, page_timeout=0.2) == ["first", "", "third"]
+    assert time.perf_counter() - started < 1.0
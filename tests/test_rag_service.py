@@ -0,0 +1,58 @@
+import json
+import time
+
+import groq
+
+from app.schemas.models import ClauseMatch, HackRXRequest
+from app.services.llm_service import LLMService
+from app.services.rag_service import RAGService
+
+CLAUSES = [ClauseMatch(clause_id="c1", clause_text="Maternity expenses are covered after 9 months.",
+                       similarity_score=0.5, source_document="policy.pdf", clause_type="general", metadata={})]
+
+class StaticSearch:
+    def semantic_search_batch(self, questions, top_k):
+        return [CLAUSES for _ in questions]
+
+def make_service(fake, **kwargs):
+    client = groq.Groq(api_key="test", base_url=fake.url, max_retries=0)
+    llm_service = LLMService("test", client=client, batch_questions=kwargs.pop("batch_questions", False))
+    service = RAGService("test", llm_service=llm_service, **kwargs)
+    service.resolve_request_document = lambda request, *args: ("fingerprint", StaticSearch())
+    return service
+
+def request(*questions, **kwargs):
+    return HackRXRequest(documents="http://localhost/policy.pdf", questions=list(questions), **kwargs)
+
+def test_questions_missing_from_a_batch_are_retried_in_parallel(fake_groq):
+    reply = json.dumps({"answers": [{"id": 1, "answer": "Yes"}]})
+    fake = fake_groq(latency=0.3, content=reply)
+    service = make_service(fake, batch_questions=True)
+
+    started = time.monotonic()
+    response = service.process_hackrx_request(request("Is maternity covered?", "Is maternity covered after birth?",
+                                                      "Are maternity expenses covered?"))
+    # One batch call, then both fallbacks at once rather than one after the other
+    assert time.monotonic() - started < 0.9
+    assert fake.calls == 3
+    assert response.answers[0] == "Yes" and response.degraded == []
+
+def test_deadline_errors_before_the_deadline_still_get_extractive_answers(fake_groq):
+    # The retry would overrun the budget, so the scheduler gives up long before it ends
+    fake = fake_groq(errors=[(429, {"Retry-After": "30"})] * 2)
+    service = make_service(fake, answer_deadline=10)
+
+    started = time.monotonic()
+    response = service.process_hackrx_request(request("Is maternity covered?", "When is maternity covered?"))
+    assert time.monotonic() - started < 5
+    assert response.degraded == [0, 1]
+    assert response.answers == [CLAUSES[0].clause_text] * 2
+
+def test_slow_llm_is_cut_off_at_the_latency_budget(fake_groq):
+    fake = fake_groq(latency=3.0)
+    service = make_service(fake)
+
+    started = time.monotonic()
+    response = service.process_hackrx_request(request("Is maternity covered?", latency_budget_seconds=0.5))
+    assert time.monotonic() - started < 2
+    assert response.degraded == [0]
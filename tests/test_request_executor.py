@@ -0,0 +1,53 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.request_executor import DeadlineExceededError, OverloadedError, RequestExecutor
+
+def test_slot_is_held_until_timed_out_work_finishes():
+    executor = RequestExecutor(max_workers=1, max_queue=0)
+
+    async def scenario():
+        with pytest.raises(DeadlineExceededError):
+            with executor.admit() as admission:
+                await executor.run(time.sleep, 0.4, timeout=0.05, admission=admission)
+        with pytest.raises(OverloadedError):
+            executor.acquire()
+        await asyncio.sleep(0.6)
+        with executor.admit() as admission:
+            return await executor.run(sum, [1, 2], timeout=1, admission=admission)
+
+    assert asyncio.run(scenario()) == 3
+    assert executor.stats()["active"] == 0
+
+def test_requests_beyond_workers_and_queue_are_rejected():
+    executor = RequestExecutor(max_workers=1, max_queue=1)
+    first, second = executor.acquire(), executor.acquire()
+
+    with pytest.raises(OverloadedError) as error:
+        executor.acquire()
+    assert error.value.status_code == 429 and error.value.retry_after >= 1
+    executor.release(first)
+    executor.release(second)
+    assert executor.stats()["active"] == 0 and executor.stats()["rejected"] == 1
+
+def test_work_that_never_started_is_overloaded_and_cancelled():
+    executor = RequestExecutor(max_workers=1, max_queue=1)
+
+    async def scenario():
+        with executor.admit() as busy:
+            # Occupies the only worker
+            blocker = asyncio.ensure_future(executor.run(time.sleep, 0.3, admission=busy))
+            await asyncio.sleep(0.05)
+            with executor.admit() as admission:
+                cancel = threading.Event()
+                with pytest.raises(OverloadedError) as error:
+                    await executor.run(sum, [1], timeout=0.05, cancel=cancel, admission=admission)
+                assert error.value.status_code == 503
+                assert cancel.is_set()
+            await blocker
+
+    asyncio.run(scenario())
+    assert executor.stats()["active"] == 0
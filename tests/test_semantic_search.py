@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from app.services.search_backends import select_top_k
+from app.services.semantic_search import SemanticSearchEngine
+from benchmarks.bench_search_backends import QUESTIONS, make_corpus
+
+def ranking(matches):
+    return [(match.clause_id, round(match.similarity_score, 5)) for match in matches]
+
+@pytest.fixture(scope="module")
+def corpus():
+    return make_corpus(300, seed=3)
+
+@pytest.mark.parametrize("backend", ["tfidf", "bm25"])
+def test_batch_matches_one_query_at_a_time(corpus, backend):
+    engine = SemanticSearchEngine(backend=backend)
+    engine.process_documents(corpus, [{} for _ in corpus])
+
+    batch = engine.semantic_search_batch(QUESTIONS, top_k=5)
+    assert [ranking(matches) for matches in batch] == [ranking(engine.semantic_search(q, top_k=5))
+                                                       for q in QUESTIONS]
+
+def test_tfidf_batch_matches_dense_scoring(corpus):
+    engine = SemanticSearchEngine(backend="tfidf")
+    engine.process_documents(corpus, [{} for _ in corpus])
+    backend = engine.segments[0].backend
+
+    scores = (backend.vectorizer.transform(QUESTIONS) @ backend.document_vectors.T).toarray()
+    for query_scores, matches in zip(scores, engine.semantic_search_batch(QUESTIONS, top_k=5)):
+        # Score descending, ties towards the higher chunk index
+        expected = np.lexsort((-np.arange(len(query_scores)), -query_scores))[:5]
+        assert [match.clause_id for match in matches] == [f"clause_{i}" for i in expected]
+        assert np.allclose([match.similarity_score for match in matches], query_scores[expected])
+
+@pytest.mark.parametrize("backend", ["tfidf", "bm25"])
+def test_short_results_are_padded_with_zero_scores(backend):
+    engine = SemanticSearchEngine(backend=backend)
+    texts = ["The grace period is 30 days.", "Maternity is covered.", "Room rent is capped."]
+    engine.process_documents(texts, [{} for _ in texts])
+
+    matches = engine.semantic_search("grace period", top_k=5)
+    assert [match.clause_id for match in matches] == ["clause_0", "clause_2", "clause_1"]
+    assert matches[0].similarity_score > 0
+    assert [match.similarity_score for match in matches[1:]] == [0.0, 0.0]
+    assert engine.semantic_search_batch([], top_k=5) == []
+
+def test_ties_at_the_cut_off_go_to_the_higher_index():
+    indices = np.arange(10)
+    values = np.asarray([0.5, 0.9, 0.5, 0.5, 0.1, 0.5, 0.5, 0.5, 0.2, 0.5])
+    top, scores = select_top_k(indices, values, 3, 10)
+    assert top.tolist() == [1, 9, 7]
+    assert scores.tolist() == [0.9, 0.5, 0.5]
@@ -0,0 +1,71 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services.single_flight import SingleFlight
+
+def run_concurrently(flight, key, fn, callers=5):
+    """Call flight.do from several threads, the leader holding the call open until all have joined"""
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait(2)
+        return fn()
+
+    def joined():
+        with flight._lock:
+            return flight.coalesced == callers - 1
+
+    with ThreadPoolExecutor(callers) as pool:
+        futures = [pool.submit(flight.do, key, slow) for _ in range(callers)]
+        while not joined():
+            time.sleep(0.01)
+        release.set()
+        outcomes = []
+        for future in futures:
+            try:
+                outcomes.append(future.result())
+            except Exception as e:
+                outcomes.append(e)
+    return calls, outcomes
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    result = object()
+    calls, outcomes = run_concurrently(flight, "url:a", lambda: result)
+
+    assert len(calls) == 1
+    assert all(outcome is result for outcome in outcomes)
+    assert flight.stats() == {"in_flight": 0, "executions": 1, "coalesced": 4, "failures": 0}
+
+def test_every_waiter_gets_the_leaders_exception():
+    flight = SingleFlight()
+    error = ValueError("download failed")
+
+    def fail():
+        raise error
+
+    calls, outcomes = run_concurrently(flight, "url:a", fail)
+    assert len(calls) == 1
+    assert all(outcome is error for outcome in outcomes)
+    assert flight.stats()["failures"] == 1
+
+def test_nothing_is_remembered_after_completion():
+    flight = SingleFlight()
+    assert flight.do("url:a", lambda: 1) == 1
+    assert flight.do("url:a", lambda: 2) == 2
+    with pytest.raises(KeyError):
+        flight.do("url:a", lambda: {}["missing"])
+    assert flight.do("url:a", lambda: 3) == 3
+    assert flight.stats() == {"in_flight": 0, "executions": 4, "coalesced": 0, "failures": 1}
+
+def test_different_keys_run_independently():
+    flight = SingleFlight()
+    inner = flight.do("url:a", lambda: flight.do("url:b", lambda: "b"))
+
+    assert inner == "b"
+    assert flight.stats()["executions"] == 2
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import endpoints
+from app.core.config import get_settings
+from app.services.request_executor import RequestExecutor
+
+class FakeIngestion:
+    def get(self, document_id):
+        return None
+
+class FakeRag:
+    """Yields the given events, sleeping where an event is a number"""
+
+    ingestion = FakeIngestion()
+
+    def __init__(self, *events):
+        self.events = events
+        self.closed = threading.Event()
+
+    def iter_hackrx_events(self, request, cancel):
+        try:
+            for event in self.events:
+                if isinstance(event, (int, float)):
+                    time.sleep(event)
+                else:
+                    yield event
+        finally:
+            self.closed.set()
+
+@pytest.fixture
+def stream(monkeypatch):
+    """Start a test app around a FakeRag; returns (client, rag, executor)"""
+    settings = get_settings()
+
+    def start(*events, deadline=10.0):
+        monkeypatch.setattr(endpoints, "get_settings",
+                            lambda: settings.model_copy(update={"request_deadline_seconds": deadline}))
+        rag, executor = FakeRag(*events), RequestExecutor(max_workers=2, max_queue=2)
+        app = FastAPI()
+        app.include_router(endpoints.router)
+        app.dependency_overrides[endpoints.get_rag_service] = lambda: rag
+        app.dependency_overrides[endpoints.get_request_executor] = lambda: executor
+        return TestClient(app), rag, executor
+
+    return start
+
+def post(client, **kwargs):
+    return client.post("/hackrx/run/stream", json={"documents": "http://localhost/policy.pdf", "questions": ["q"]},
+                       headers={"Authorization": f"Bearer {get_settings().api_key}", **kwargs})
+
+EVENTS = [{"event": "progress", "stage": "index"}, {"event": "answer", "index": 0, "answer": "Yes"},
+          {"event": "summary", "answers": 1}]
+
+def test_events_stream_in_order_as_ndjson(stream):
+    client, rag, executor = stream(*EVENTS)
+    response = post(client)
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in response.text.splitlines()] == EVENTS
+    assert rag.closed.is_set()
+    assert executor.stats()["active"] == 0
+
+def test_events_stream_as_sse_when_accepted(stream):
+    client, _, _ = stream(*EVENTS)
+    response = post(client, accept="text/event-stream")
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    frames = response.text.strip().split("\n\n")
+    assert [frame.splitlines()[0] for frame in frames] == ["event: progress", "event: answer", "event: summary"]
+    assert [json.loads(frame.splitlines()[1][len("data: "):]) for frame in frames] == EVENTS
+
+def test_deadline_ends_the_stream_with_an_error_event(stream):
+    client, rag, executor = stream(EVENTS[0], 1.0, EVENTS[1], deadline=0.3)
+    started = time.monotonic()
+    response = post(client)
+
+    assert time.monotonic() - started < 0.9
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[0] == EVENTS[0]
+    assert [event["event"] for event in events[1:]] == ["error"]
+    # The generator is closed once the next() still running in the pool returns
+    assert rag.closed.wait(2)
+    assert executor.stats()["active"] == 0
+
+async def read_then_disconnect(app, body: bytes) -> list:
+    """Send one request to the ASGI app and disconnect after the first body chunk"""
+    first_chunk = asyncio.Event()
+    chunks = []
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await first_chunk.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            chunks.append(message["body"])
+            first_chunk.set()
+
+    scope = {"type": "http", "method": "POST", "path": "/hackrx/run/stream", "raw_path": b"/hackrx/run/stream",
+             "query_string": b"", "root_path": "", "scheme": "http", "server": ("test", 80),
+             "client": ("test", 1234), "http_version": "1.1", "asgi": {"version": "3.0"},
+             "headers": [(b"content-type", b"application/json"),
+                         (b"authorization", f"Bearer {get_settings().api_key}".encode())]}
+    await app(scope, receive, send)
+    return chunks
+
+def test_disconnect_closes_the_generator_and_releases_the_slot(stream):
+    client, rag, executor = stream(EVENTS[0], *([0.05, EVENTS[1]] * 100))
+    body = json.dumps({"documents": "http://localhost/policy.pdf", "questions": ["q"]}).encode()
+
+    started = time.monotonic()
+    chunks = asyncio.run(read_then_disconnect(client.app, body))
+    assert json.loads(chunks[0]) == EVENTS[0]
+    # Stopped long before the 5 seconds the whole stream would take
+    assert rag.closed.wait(1)
+    assert time.monotonic() - started < 1
+    assert executor.stats()["active"] == 0